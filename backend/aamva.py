@@ -0,0 +1,364 @@
+"""AAMVA DL/ID card data parser.
+
+Driver licenses and ID cards encode their data in a PDF417 barcode laid out
+by the AAMVA DL/ID Card Design Standard:
+
+    @<LF><RS><CR>ANSI <IIN:6><version:2>[<jurisdiction version:2>]<entries:2>
+    <subfile type:2><offset:4><length:4>  (one designator per subfile)
+    DL<element ID:3><value><LF><element ID:3><value><LF>...<CR>
+
+Version 01 (AAMVA DL/ID-2000) has no jurisdiction version field. Every data
+element is a 3-character ID followed by its value and terminated by the
+data element separator, so a record is parsed by splitting on separators
+in a single pass. Payloads whose control characters were lost on the way
+(some decoders replace them with spaces) fall back to a single regex scan
+over the known element IDs.
+"""
+
+import re
+
+# Element IDs across AAMVA versions 01-10, with display name and category.
+# Names of the elements shown in the UI and reports are kept stable.
+AAMVA_FIELDS = {
+    # Names
+    "DCS": {"name": "Last Name", "category": "personal"},
+    "DAC": {"name": "First Name", "category": "personal"},
+    "DAD": {"name": "Middle Name", "category": "personal"},
+    "DCT": {"name": "Given Names", "category": "personal"},
+    "DAA": {"name": "Full Name", "category": "personal"},
+    "DAB": {"name": "Last Name (v1)", "category": "personal"},
+    "DAE": {"name": "Name Suffix (v1)", "category": "personal"},
+    "DAF": {"name": "Name Prefix (v1)", "category": "personal"},
+    "DCU": {"name": "Name Suffix", "category": "personal"},
+    "DBN": {"name": "Alias Family Name", "category": "personal"},
+    "DBG": {"name": "Alias Given Name", "category": "personal"},
+    "DBS": {"name": "Alias Suffix Name", "category": "personal"},
+    "DBO": {"name": "Last Name (alt)", "category": "personal"},
+    "DBP": {"name": "First Name (alt)", "category": "personal"},
+    "DBQ": {"name": "Middle Name (alt)", "category": "personal"},
+    "DBR": {"name": "Name Suffix (alt)", "category": "personal"},
+    "DDE": {"name": "Family Name Truncation", "category": "personal"},
+    "DDF": {"name": "First Name Truncation", "category": "personal"},
+    "DDG": {"name": "Middle Name Truncation", "category": "personal"},
+    "DBB": {"name": "Date of Birth", "category": "personal"},
+    "DBL": {"name": "Date of Birth (alt)", "category": "personal"},
+    "DBC": {"name": "Sex", "category": "personal"},
+    "DCI": {"name": "Place of Birth", "category": "personal"},
+    "DBK": {"name": "Social Security Number", "category": "personal"},
+    "DBM": {"name": "Social Security Number (alt)", "category": "personal"},
+    "DDH": {"name": "Under 18 Until", "category": "personal"},
+    "DDI": {"name": "Under 19 Until", "category": "personal"},
+    "DDJ": {"name": "Under 21 Until", "category": "personal"},
+    "DDK": {"name": "Organ Donor", "category": "personal"},
+    "DBH": {"name": "Organ Donor (v1)", "category": "personal"},
+    "DDL": {"name": "Veteran", "category": "personal"},
+    # Physical description
+    "DAY": {"name": "Eye Color", "category": "physical"},
+    "DAU": {"name": "Height", "category": "physical"},
+    "DAV": {"name": "Height (cm)", "category": "physical"},
+    "DAW": {"name": "Weight", "category": "physical"},
+    "DAX": {"name": "Weight (kg)", "category": "physical"},
+    "DCE": {"name": "Weight Range", "category": "physical"},
+    "DAZ": {"name": "Hair Color", "category": "physical"},
+    "DCL": {"name": "Race/Ethnicity", "category": "physical"},
+    # Address
+    "DAG": {"name": "Street Address", "category": "address"},
+    "DAH": {"name": "Street Address 2", "category": "address"},
+    "DAI": {"name": "City", "category": "address"},
+    "DAJ": {"name": "State", "category": "address"},
+    "DAK": {"name": "Postal Code", "category": "address"},
+    "DAL": {"name": "Residence Street Address", "category": "address"},
+    "DAM": {"name": "Residence Street Address 2", "category": "address"},
+    "DAN": {"name": "Residence City", "category": "address"},
+    "DAO": {"name": "Residence State", "category": "address"},
+    "DAP": {"name": "Residence Postal Code", "category": "address"},
+    # Document
+    "DAQ": {"name": "ID Number", "category": "document"},
+    "DBA": {"name": "Expiration Date", "category": "document"},
+    "DBD": {"name": "Issue Date", "category": "document"},
+    "DBE": {"name": "Issue Timestamp", "category": "document"},
+    "DBF": {"name": "Number of Duplicates", "category": "document"},
+    "DBI": {"name": "Non-Resident Indicator", "category": "document"},
+    "DBJ": {"name": "Unique Customer Identifier", "category": "document"},
+    "DCF": {"name": "Document Discriminator", "category": "document"},
+    "DCG": {"name": "Country", "category": "document"},
+    "DCA": {"name": "Vehicle Class", "category": "document"},
+    "DCB": {"name": "Restriction Codes", "category": "document"},
+    "DCD": {"name": "Endorsement Codes", "category": "document"},
+    "DAR": {"name": "License Class (v1)", "category": "document"},
+    "DAS": {"name": "Restriction Codes (v1)", "category": "document"},
+    "DAT": {"name": "Endorsement Codes (v1)", "category": "document"},
+    "DCH": {"name": "Federal Commercial Vehicle Codes", "category": "document"},
+    "DCM": {"name": "Vehicle Classification", "category": "document"},
+    "DCN": {"name": "Standard Endorsement Code", "category": "document"},
+    "DCO": {"name": "Standard Restriction Code", "category": "document"},
+    "DCP": {"name": "Vehicle Classification Description", "category": "document"},
+    "DCQ": {"name": "Endorsement Code Description", "category": "document"},
+    "DCR": {"name": "Restriction Code Description", "category": "document"},
+    "DCJ": {"name": "Audit Information", "category": "document"},
+    "DCK": {"name": "Inventory Control Number", "category": "document"},
+    "DDA": {"name": "Compliance Type", "category": "document"},
+    "DDB": {"name": "Card Revision Date", "category": "document"},
+    "DDC": {"name": "HAZMAT Endorsement Expiration Date", "category": "document"},
+    "DDD": {"name": "Limited Duration Document", "category": "document"},
+}
+
+ELEMENT_SEPARATOR = "\n"
+RECORD_SEPARATOR = "\x1e"
+SEGMENT_TERMINATOR = "\r"
+
+# Header after the compliance indicator and separators: file type, IIN,
+# version, jurisdiction version (from version 02) and entry count. Subfile
+# designators start with letters, so a version 01 header leaves the
+# optional group empty.
+HEADER_PATTERN = re.compile(r"(ANSI ?|AAMVA)(\d{6})(\d{2})(\d{2})?(\d{2})")
+SUBFILE_DESIGNATOR = re.compile(r"([A-Z]{2})(\d{4})(\d{4})")
+
+SEPARATORS = re.compile(r"[\n\r\x1e]")
+
+# Fallback for payloads whose separators were lost. IDs are only recognised
+# at a token boundary (or glued to the subfile type) so values such as
+# "HOLIDAY DR" are not split inside a word; KNOWN_ELEMENT_ANYWHERE covers
+# payloads with no boundaries at all. Words starting with an ID ("DAKOTA")
+# remain ambiguous without separators.
+_KNOWN_IDS = "|".join(sorted(AAMVA_FIELDS))
+KNOWN_ELEMENT = re.compile(rf"(?:^|(?<=\s)|(?<=DL)|(?<=ID))(?:{_KNOWN_IDS})")
+KNOWN_ELEMENT_ANYWHERE = re.compile(_KNOWN_IDS)
+
+# Subfile type at the start of a record ("DLDAQ...", "IDDAQ...")
+SUBFILE_PREFIX = re.compile(r"(^|[\n\r\x1e])(?:DL|ID)(?=[A-Z]{3})")
+
+
+def parse_header(raw):
+    """Parse the file header; returns a dict or None if there is none"""
+    match = HEADER_PATTERN.search(raw, 0, 64)
+    if match is None:
+        return None
+
+    jurisdiction_version = match.group(4)
+    subfiles = []
+    position = match.end()
+    for _ in range(int(match.group(5))):
+        designator = SUBFILE_DESIGNATOR.match(raw, position)
+        if designator is None:
+            break
+        subfiles.append({
+            "type": designator.group(1),
+            "offset": int(designator.group(2)),
+            "length": int(designator.group(3)),
+        })
+        position = designator.end()
+
+    return {
+        "iin": match.group(2),
+        "version": int(match.group(3)),
+        "jurisdiction_version": int(jurisdiction_version) if jurisdiction_version else None,
+        "subfiles": subfiles,
+        "end": position,
+    }
+
+
+def _subfile_body(raw, subfile, search_from):
+    """Return a subfile's data after its 2-character type, or None.
+
+    Many jurisdictions encode offsets and lengths that are off by a few
+    bytes, so the type is searched for when it is not at the given offset
+    and the data runs to the segment terminator rather than for ``length``.
+    """
+    subfile_type = subfile["type"]
+    start = subfile["offset"]
+    if raw[start:start + 2] != subfile_type:
+        start = raw.find(subfile_type, search_from)
+        if start < 0:
+            return None
+    end = raw.find(SEGMENT_TERMINATOR, start)
+    return raw[start + 2:end if end >= 0 else len(raw)]
+
+
+def _split_elements(body, fields):
+    """Collect the elements of separator-delimited data"""
+    if RECORD_SEPARATOR in body or SEGMENT_TERMINATOR in body:
+        elements = SEPARATORS.split(body)
+    else:
+        elements = body.split(ELEMENT_SEPARATOR)
+    for element in elements:
+        element = element.strip()
+        code = element[:3]
+        if len(code) == 3 and code.isalpha() and code.isupper() and code not in fields:
+            fields[code] = element[3:].strip()
+
+
+def _scan_known_elements(text, fields):
+    """Collect elements from data without separators: each known element ID
+    starts a value that runs to the next one."""
+    matches = list(KNOWN_ELEMENT.finditer(text))
+    if len(matches) < 2:
+        matches = list(KNOWN_ELEMENT_ANYWHERE.finditer(text))
+    for current, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        fields.setdefault(current.group(), text[current.end():end].strip())
+
+
+def parse_fields(raw):
+    """Extract ``(fields, header)`` from an AAMVA payload in one pass.
+
+    ``fields`` maps element IDs to their stripped, untruncated values; the
+    first occurrence of an element wins. Jurisdiction-specific elements
+    (``Z??`` subfiles) are kept under their own IDs. ``header`` is the
+    result of :func:`parse_header`, or None.
+    """
+    fields = {}
+    header = parse_header(raw)
+    body = raw[header["end"]:] if header else raw
+
+    if ELEMENT_SEPARATOR in body or SEGMENT_TERMINATOR in body:
+        if header is not None:
+            for subfile in header["subfiles"]:
+                data = _subfile_body(raw, subfile, header["end"])
+                if data is not None:
+                    _split_elements(data, fields)
+        if not fields:
+            # No usable designators: split the whole record instead
+            _split_elements(SUBFILE_PREFIX.sub(r"\1", body), fields)
+        if any(code in AAMVA_FIELDS for code in fields):
+            return fields, header
+        fields = {}
+
+    _scan_known_elements(body, fields)
+    return fields, header
+
+
+def group_fields(fields):
+    """Group known elements by category under their display names"""
+    groups = {"personal": {}, "physical": {}, "address": {}, "document": {}}
+    for code, value in fields.items():
+        field_info = AAMVA_FIELDS.get(code)
+        if field_info is not None:
+            groups[field_info["category"]][field_info["name"]] = value
+    return groups
+
+
+def normalize_date(value):
+    """Return an AAMVA date as MMDDCCYY.
+
+    US cards from version 02 on use MMDDCCYY, while Canadian cards and
+    version 01 use CCYYMMDD. No month exceeds 12 and every CCYY starts with
+    19 or 20, so the order can be told from the value itself.
+    """
+    if not value or len(value) < 8 or not value[:8].isdigit():
+        return value
+    if int(value[:2]) > 12:
+        return value[4:6] + value[6:8] + value[0:4]
+    return value[:8]
+
+
+MONTHS = ["", "January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+
+def format_date_readable(date_str):
+    """Convert MMDDYYYY to Month Day, Year format (e.g., October 17, 2002)"""
+    if not date_str or len(date_str) < 8:
+        return date_str
+    try:
+        month_num = int(date_str[0:2])
+        day = int(date_str[2:4])
+    except ValueError:
+        return date_str
+    month_name = MONTHS[month_num] if 1 <= month_num <= 12 else date_str[0:2]
+    return f"{month_name} {day}, {date_str[4:8]}"
+
+
+def format_date(date_str):
+    """Convert MMDDYYYY to YYYY-MM-DD"""
+    if not date_str or len(date_str) < 8:
+        return date_str
+    return f"{date_str[4:8]}-{date_str[0:2]}-{date_str[2:4]}"
+
+
+def format_sex(sex_code):
+    """Convert sex code to Male/Female"""
+    if not sex_code:
+        return sex_code
+    code = sex_code.strip()
+    if code in ("1", "M"):
+        return "Male"
+    if code in ("2", "F"):
+        return "Female"
+    return code
+
+
+def format_height(height_str):
+    """Convert height format (e.g., '067 in' to '5\'7\"')"""
+    if not height_str:
+        return height_str
+    try:
+        inches = int(height_str.replace("in", "").strip())
+    except ValueError:
+        return height_str
+    return f"{inches // 12}'{inches % 12}\""
+
+
+def _first_present(fields, *codes):
+    """Value of the first of ``codes`` present, covering IDs renamed across versions"""
+    for code in codes:
+        value = fields.get(code)
+        if value:
+            return value
+    return ""
+
+
+def _split_names(fields):
+    """(last, first, middle), falling back to the combined name elements"""
+    last = _first_present(fields, "DCS", "DAB", "DBO")
+    first = _first_present(fields, "DAC", "DBP")
+    middle = _first_present(fields, "DAD", "DBQ")
+
+    given = fields.get("DCT", "")
+    if given and not first:
+        # Version 02 given names: "FIRST,MIDDLE" (some issuers use a space)
+        parts = given.replace(",", " ").split(None, 1)
+        first = parts[0]
+        middle = middle or (parts[1].strip() if len(parts) > 1 else "")
+
+    full = fields.get("DAA", "")
+    if full and "," in full and not (first and last):
+        # Version 01 full name: "LAST,FIRST,MIDDLE"
+        parts = [part.strip() for part in full.split(",")]
+        last = last or parts[0]
+        first = first or (parts[1] if len(parts) > 1 else "")
+        middle = middle or " ".join(parts[2:])
+    return last, first, middle
+
+
+def _readable_date(value):
+    return format_date_readable(normalize_date(value))
+
+
+def user_data(fields):
+    """The formatted ``user`` view of parsed fields shown in the UI and reports"""
+    last, first, middle = _split_names(fields)
+    return {
+        "last": last,
+        "first": first,
+        "middle": middle,
+        "dob": _readable_date(_first_present(fields, "DBB", "DBL")),
+        "eyes": fields.get("DAY", ""),
+        "sex": format_sex(fields.get("DBC", "")),
+        "height": format_height(_first_present(fields, "DAU", "DAV")),
+        "weight": _first_present(fields, "DAW", "DAX"),
+        "race": fields.get("DCL", ""),
+        "street": _first_present(fields, "DAG", "DAL"),
+        "city": _first_present(fields, "DAI", "DAN"),
+        "state": _first_present(fields, "DAJ", "DAO"),
+        "postal": _first_present(fields, "DAK", "DAP"),
+        "country": fields.get("DCG", ""),
+        "id": fields.get("DAQ", ""),
+        "issued": _readable_date(fields.get("DBD", "")),
+        "expires": _readable_date(fields.get("DBA", "")),
+        "restrictions": _first_present(fields, "DCB", "DAS"),
+        "endorsements": _first_present(fields, "DCD", "DAT"),
+        "vehicle_class": _first_present(fields, "DCA", "DAR"),
+        "vehicle_classification": fields.get("DCM", ""),
+        "card_revision": _readable_date(fields.get("DDB", "")),
+    }
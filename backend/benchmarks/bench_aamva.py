@@ -0,0 +1,120 @@
+"""Benchmark the AAMVA parser against the previous implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_aamva [--payloads 2000] [--repeat 5] [--json]
+
+Both parsers see the same synthetic corpora: typical cards, and cards with a
+large jurisdiction subfile, where the cost of the legacy per-character scan
+shows. Besides timings, the report counts values the legacy parser got
+wrong (it kept only the first word of each value).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from aamva import parse_fields  # noqa: E402
+from benchmarks.synthetic import license_corpus  # noqa: E402
+
+# Element IDs known to the previous implementation
+LEGACY_FIELDS = {
+    "DCS", "DAC", "DAD", "DBB", "DBC", "DAY", "DAU", "DAW", "DAG", "DAI", "DAJ",
+    "DAK", "DAQ", "DBA", "DBD", "DCG", "DCA", "DCB", "DCD", "DCL", "DCM", "DDB",
+}
+
+
+def legacy_parse_fields(raw_data):
+    """The field scan of the previous ``PDF417Decoder.parse_aamva_data``"""
+    fields = {}
+    i = 0
+    while i < len(raw_data):
+        if i + 2 < len(raw_data):
+            code = raw_data[i:i + 3]
+            if code in LEGACY_FIELDS:
+                i += 3
+                value_start = i
+                while i < len(raw_data) - 2:
+                    if raw_data[i:i + 3] in LEGACY_FIELDS:
+                        break
+                    i += 1
+                value = raw_data[value_start:i].strip()
+                if value:
+                    value = value.split()[0]
+                fields[code] = value
+            else:
+                i += 1
+        else:
+            i += 1
+    return fields
+
+
+def time_parser(parse, corpus, repeat):
+    """Best-of-``repeat`` wall time for parsing the whole corpus, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in corpus:
+            parse(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def count_mismatches(corpus):
+    """Values where the legacy parser disagrees with the new one"""
+    truncated = 0
+    for payload in corpus:
+        legacy = legacy_parse_fields(payload)
+        current, _ = parse_fields(payload)
+        truncated += sum(1 for code, value in legacy.items() if current.get(code) != value)
+    return truncated
+
+
+def compare(corpus, repeat):
+    legacy = time_parser(legacy_parse_fields, corpus, repeat)
+    current = time_parser(parse_fields, corpus, repeat)
+    return {
+        "payloads": len(corpus),
+        "mean_payload_bytes": round(sum(len(p) for p in corpus) / len(corpus), 1),
+        "legacy_us_per_payload": round(legacy / len(corpus) * 1e6, 2),
+        "current_us_per_payload": round(current / len(corpus) * 1e6, 2),
+        "speedup": round(legacy / current, 1) if current else None,
+        "legacy_mismatched_values": count_mismatches(corpus),
+    }
+
+
+def run(payloads, repeat, seed):
+    return {
+        "typical": compare(license_corpus(payloads, seed=seed), repeat),
+        "large_jurisdiction_subfile": compare(
+            license_corpus(max(1, payloads // 10), seed=seed, jurisdiction_elements=200), repeat
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args.payloads, args.repeat, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for name, stats in result.items():
+        print(f"{name}: {stats['payloads']} payloads, {stats['mean_payload_bytes']} bytes on average")
+        print(f"  legacy:  {stats['legacy_us_per_payload']:>9.2f} us/payload")
+        print(f"  current: {stats['current_us_per_payload']:>9.2f} us/payload  ({stats['speedup']}x)")
+        print(f"  values the legacy parser got wrong: {stats['legacy_mismatched_values']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Benchmark barcode and PDF417 decoding on a synthetic corpus.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_decode [--images 60] [--kinds barcode,pdf417]
+        [--seed 0] [--json] [--output result.json] [--baseline baseline.json]
+
+Generates Code 128 and AAMVA PDF417 photos at several sizes, rotations,
+blur, noise, contrast and JPEG quality levels (``benchmarks.synthetic``,
+PDF417 rendering needs the optional ``pdf417gen`` package), then runs
+``BarcodeDecoder.decode_barcode`` and ``PDF417Decoder.decode_pdf417`` over
+them one image at a time. For each kind, overall and per condition and
+size, it reports:
+
+- ``decode_rate``: share of images where something was decoded
+- ``correct_rate``: share of images where the expected value was decoded
+- ``throughput``: images decoded per second by one worker
+- ``mean_ms``, ``p50_ms``, ``p95_ms``, ``p99_ms``: decode latency
+- ``peak_rss_mb`` (overall only): peak resident memory of the process that
+  decoded the corpus. Each kind is decoded in a fresh process, so the figure
+  covers decoder imports and decoding, not corpus generation.
+
+``--output`` writes the result as JSON. ``--baseline`` compares the run with
+a saved result and exits with status 1 when a metric regressed by more than
+``--tolerance`` (relative) or a rate dropped by more than ``--rate-tolerance``.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from benchmarks.synthetic import decode_corpus  # noqa: E402
+
+KINDS = ("barcode", "pdf417")
+# Lower is better for these metrics, higher for the rest
+LOWER_IS_BETTER = ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+COMPARED = ("throughput", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+RATES = ("decode_rate", "correct_rate")
+
+
+def percentile(values, q):
+    """Linearly interpolated ``q``-th percentile (0-100) of sorted ``values``"""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * q / 100.0
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(samples):
+    """Statistics of ``[(seconds, decoded, correct), ...]``"""
+    latencies = sorted(seconds * 1000.0 for seconds, _, _ in samples)
+    total = sum(latencies) / 1000.0
+    count = len(samples)
+    return {
+        "images": count,
+        "decode_rate": round(sum(decoded for _, decoded, _ in samples) / count, 4),
+        "correct_rate": round(sum(correct for _, _, correct in samples) / count, 4),
+        "throughput": round(count / total, 2) if total else 0.0,
+        "mean_ms": round(sum(latencies) / count, 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def _decoded_values(kind, result):
+    if not result.ok:
+        return []
+    if kind == "pdf417":
+        return [code.data for code in result.codes]
+    return [barcode.data for barcode in result.barcodes]
+
+
+def measure(kind, corpus):
+    """Decode ``corpus`` and summarize; runs in a fresh process per kind"""
+    from decoders import BarcodeDecoder, PDF417Decoder
+
+    decode = PDF417Decoder.decode_pdf417 if kind == "pdf417" else BarcodeDecoder.decode_barcode
+    # The first decode pays for lazy imports and library setup
+    started = time.perf_counter()
+    decode(corpus[0][3])
+    warmup_ms = (time.perf_counter() - started) * 1000.0
+
+    groups = defaultdict(list)
+    for condition, size, expected, encoded in corpus:
+        started = time.perf_counter()
+        result = decode(encoded)
+        seconds = time.perf_counter() - started
+        values = _decoded_values(kind, result)
+        sample = (seconds, bool(values), expected in values)
+        for group in ("all", f"condition:{condition}", f"size:{size}"):
+            groups[group].append(sample)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024.0 * 1024.0) if sys.platform == "darwin" else peak_rss / 1024.0
+    return {
+        "overall": {
+            **summarize(groups["all"]),
+            "warmup_ms": round(warmup_ms, 3),
+            "peak_rss_mb": round(peak_rss_mb, 1),
+        },
+        "conditions": {
+            group.split(":", 1)[1]: summarize(samples)
+            for group, samples in groups.items() if group.startswith("condition:")
+        },
+        "sizes": {
+            group.split(":", 1)[1]: summarize(samples)
+            for group, samples in groups.items() if group.startswith("size:")
+        },
+    }
+
+
+def environment():
+    import cv2
+
+    from config import DECODER_CONFIG_VERSION
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "decoder_config": DECODER_CONFIG_VERSION,
+    }
+
+
+def run(kinds, images, seed):
+    result = {
+        "corpus": {"images": images, "seed": seed},
+        "environment": environment(),
+        "kinds": {},
+    }
+    for kind in kinds:
+        try:
+            corpus = decode_corpus(kind, images, seed=seed)
+        except ImportError as e:
+            # pdf417gen is only needed here, so it is not a backend requirement
+            result["kinds"][kind] = {"skipped": f"cannot render {kind} corpus: {e}"}
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result["kinds"][kind] = executor.submit(measure, kind, corpus).result()
+    return result
+
+
+def compare(result, baseline, tolerance, rate_tolerance):
+    """Rows of ``(kind, metric, baseline, current, change, regressed)``"""
+    rows = []
+    for kind, entry in result["kinds"].items():
+        base = baseline.get("kinds", {}).get(kind)
+        if "overall" not in entry or not base or "overall" not in base:
+            continue
+        current, previous = entry["overall"], base["overall"]
+        for metric in RATES:
+            change = current[metric] - previous[metric]
+            rows.append((kind, metric, previous[metric], current[metric], change, change < -rate_tolerance))
+        for metric in COMPARED:
+            if not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            worse = change if metric in LOWER_IS_BETTER else -change
+            rows.append((kind, metric, previous[metric], current[metric], change, worse > tolerance))
+    return rows
+
+
+def print_result(result):
+    print(f"{'kind':<8} {'group':<24} {'n':>4} {'rate':>6} {'correct':>8} {'img/s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, entry in result["kinds"].items():
+        if "skipped" in entry:
+            print(f"{kind:<8} skipped: {entry['skipped']}")
+            continue
+        groups = [("all", entry["overall"])]
+        groups += [(f"condition {name}", stats) for name, stats in entry["conditions"].items()]
+        groups += [(f"size {name}", stats) for name, stats in entry["sizes"].items()]
+        for name, stats in groups:
+            print(
+                f"{kind:<8} {name:<24} {stats['images']:>4} {stats['decode_rate']:>6.2f} "
+                f"{stats['correct_rate']:>8.2f} {stats['throughput']:>7.2f} {stats['p50_ms']:>8.1f} "
+                f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+            )
+        overall = entry["overall"]
+        print(f"{kind:<8} warm-up {overall['warmup_ms']:.1f} ms, peak RSS {overall['peak_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=60, help="images per kind")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma-separated: barcode, pdf417")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    parser.add_argument("--baseline", help="compare with a result saved by --output")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative change in latency, throughput or memory counted as a regression")
+    parser.add_argument("--rate-tolerance", type=float, default=0.02,
+                        help="drop in decode or correct rate counted as a regression")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+
+    result = run(kinds, args.images, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_result(result)
+
+    if not args.baseline:
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("corpus") != result["corpus"]:
+        print(f"\nwarning: baseline corpus {baseline.get('corpus')} differs from {result['corpus']}")
+    if baseline.get("environment") != result["environment"]:
+        print("warning: baseline was recorded in a different environment")
+    rows = compare(result, baseline, args.tolerance, args.rate_tolerance)
+    print(f"\n{'kind':<8} {'metric':<14} {'baseline':>10} {'current':>10} {'change':>9}")
+    for kind, metric, previous, current, change, regressed in rows:
+        shown = f"{change:+.2f}" if metric in RATES else f"{change:+.1%}"
+        print(f"{kind:<8} {metric:<14} {previous:>10} {current:>10} {shown:>9}{'  REGRESSED' if regressed else ''}")
+    if any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark the fixed and adaptive barcode preprocessing chains.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_preprocess [--images 60] [--seed 0] [--json]
+
+Decodes a synthetic corpus of Code 128 photos (clean, noisy, low contrast,
+blurred, dim and noisy, tilted; see ``benchmarks.synthetic``) with both
+chains and reports, overall and per capture condition:
+
+- ``preprocess_ms``: time to preprocess one image
+- ``preprocessed_rate``: share of images read from the preprocessed frame
+  alone (the pipeline's ``preprocessed`` stage)
+- ``pipeline_rate`` / ``pipeline_ms``: share of images decoded, and time per
+  image, by the full barcode pipeline (BARCODE_STAGES)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import cv2  # noqa: E402
+
+import decoders  # noqa: E402
+from benchmarks.synthetic import barcode_corpus  # noqa: E402
+from decoders import BarcodeDecoder  # noqa: E402
+from preprocessing import preprocess  # noqa: E402
+
+MODES = ("fixed", "adaptive")
+
+
+def _decoded(objects, expected):
+    return any(obj.data.decode("utf-8", "replace") == expected for obj in objects)
+
+
+def measure(mode, corpus):
+    """Per-condition totals for one chain"""
+    decoders.PREPROCESS_MODE = mode
+    totals = defaultdict(lambda: defaultdict(float))
+    for condition, expected, image, encoded in corpus:
+        started = time.perf_counter()
+        gray = preprocess(image, mode)
+        preprocess_s = time.perf_counter() - started
+        preprocessed_hit = _decoded(BarcodeDecoder._scan(gray), expected)
+
+        started = time.perf_counter()
+        result = BarcodeDecoder.decode_barcode(encoded)
+        pipeline_s = time.perf_counter() - started
+        pipeline_hit = result.ok and any(barcode.data == expected for barcode in result.barcodes)
+
+        for key in (condition, "all"):
+            entry = totals[key]
+            entry["images"] += 1
+            entry["preprocess_ms"] += preprocess_s * 1000.0
+            entry["preprocessed_rate"] += preprocessed_hit
+            entry["pipeline_rate"] += pipeline_hit
+            entry["pipeline_ms"] += pipeline_s * 1000.0
+    return {
+        key: {
+            name: (int(value) if name == "images" else round(value / entry["images"], 3))
+            for name, value in entry.items()
+        }
+        for key, entry in totals.items()
+    }
+
+
+def run(images, seed):
+    # The pipeline decodes uploads, so it gets the same photos as PNG bytes
+    corpus = [
+        (condition, expected, image, cv2.imencode(".png", image)[1].tobytes())
+        for condition, expected, image in barcode_corpus(images, seed=seed)
+    ]
+    # Warm up OpenCV and the decoder before timing anything
+    for mode in MODES:
+        preprocess(corpus[0][2], mode)
+    BarcodeDecoder.decode_barcode(corpus[0][3])
+    return {"images": images, "seed": seed, **{mode: measure(mode, corpus) for mode in MODES}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args.images, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    conditions = list(result["fixed"])
+    print(f"{'condition':<14} {'chain':<9} {'prep ms':>8} {'prep rate':>10} {'rate':>6} {'ms/img':>8}")
+    for condition in sorted(conditions, key=lambda name: name == "all"):
+        for mode in MODES:
+            entry = result[mode][condition]
+            print(
+                f"{condition:<14} {mode:<9} {entry['preprocess_ms']:>8.2f} "
+                f"{entry['preprocessed_rate']:>10.2f} {entry['pipeline_rate']:>6.2f} "
+                f"{entry['pipeline_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark per-report overhead of PDF generation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_report [--reports 100] [--json]
+
+Renders a data-only report (a barcode plus a synthetic driver license) into
+memory, either compiling a fresh ReportTemplate for every report, as every
+report did before templates were shared, or reusing the process-wide one.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from aamva import parse_fields  # noqa: E402
+from benchmarks.synthetic import license_corpus  # noqa: E402
+from models import AAMVARecord, Barcode, BarcodeScan, PDF417Code, PDF417Scan, ScanEntry  # noqa: E402
+from pdf_generator import PDFReportGenerator, ReportTemplate  # noqa: E402
+from sessions import empty_session_data  # noqa: E402
+
+
+def sample_session(seed=0):
+    payload = license_corpus(1, seed=seed)[0]
+    fields, _ = parse_fields(payload)
+    data = empty_session_data()
+    data["barcode"] = ScanEntry(BarcodeScan([Barcode("CODE128", "0123456789")]))
+    data["pdf417"] = ScanEntry(PDF417Scan([PDF417Code(payload, AAMVARecord(fields))]))
+    return data
+
+
+def time_reports(session_data, reports, make_template):
+    """Mean milliseconds per report"""
+    started = time.perf_counter()
+    for _ in range(reports):
+        result = PDFReportGenerator(io.BytesIO(), template=make_template()).generate_report(session_data)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+    return (time.perf_counter() - started) / reports * 1000.0
+
+
+def time_setup(repeat):
+    """Mean milliseconds to compile a template"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        ReportTemplate()
+    return (time.perf_counter() - started) / repeat * 1000.0
+
+
+def run(reports):
+    session_data = sample_session()
+    # Warm up ReportLab's own caches (font metrics, imports) first
+    time_reports(session_data, 3, ReportTemplate.shared)
+
+    per_report = time_reports(session_data, reports, ReportTemplate)
+    shared = time_reports(session_data, reports, ReportTemplate.shared)
+    return {
+        "reports": reports,
+        "template_setup_ms": round(time_setup(reports), 3),
+        "fresh_template_ms_per_report": round(per_report, 3),
+        "shared_template_ms_per_report": round(shared, 3),
+        "saved_ms_per_report": round(per_report - shared, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args.reports)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"template setup:  {result['template_setup_ms']:>8.3f} ms")
+    print(f"fresh template:  {result['fresh_template_ms_per_report']:>8.3f} ms/report")
+    print(f"shared template: {result['shared_template_ms_per_report']:>8.3f} ms/report")
+
+
+if __name__ == "__main__":
+    main()
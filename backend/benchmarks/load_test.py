@@ -0,0 +1,386 @@
+"""Load test the API with synthetic scans, in-process or against uvicorn.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test [--target inprocess|uvicorn] [--url URL]
+        [--concurrency 8] [--duration 20] [--mix barcode=4,pdf417=2,card=2,report=1]
+        [--workers 1,2,4] [--uvicorn-workers 1] [--json] [--output result.json]
+
+Each of ``--concurrency`` simulated clients has its own session. A client
+first uploads a card and a barcode so its reports have content, then sends
+requests back to back for ``--duration`` seconds, picking each endpoint by
+the ``--mix`` weights:
+
+- ``barcode``: POST /upload/barcode with a Code 128 photo
+- ``pdf417``: POST /upload/pdf417 with an AAMVA PDF417 photo (needs the
+  optional ``pdf417gen`` package to render; left out of the mix without it)
+- ``card``: POST /upload/card with a card front and back
+- ``report``: GET /generate-pdf for the client's session
+
+Every upload gets random trailing bytes, which decoders ignore, so the
+decode result cache does not serve the load (``--cache-hits`` reuses
+identical uploads instead).
+
+Targets:
+
+- ``inprocess`` (default): the app is called through httpx's ASGI
+  transport, with no network or server process. The load generator then
+  shares the event loop with the app, so use it for relative comparisons.
+- ``uvicorn``: a local ``uvicorn main:app`` is started for each run
+  (``--uvicorn-workers`` processes; with more than one, sessions use a
+  temporary SQLite database so all processes share them).
+- ``--url``: an already running server; ``--workers`` is ignored.
+
+``--workers`` runs the test once per decode worker pool size
+(``DECODE_WORKERS``) to show how throughput scales. For each run and
+endpoint it reports requests per second, error rate (non-2xx responses,
+503 rejections listed separately) and p50/p95/p99 latency. Everything runs
+offline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import httpx  # noqa: E402
+
+from benchmarks.bench_decode import percentile  # noqa: E402
+from benchmarks.synthetic import code128_image, degrade, pdf417_image, random_license  # noqa: E402
+
+ENDPOINTS = {
+    "barcode": ("POST", "/upload/barcode"),
+    "pdf417": ("POST", "/upload/pdf417"),
+    "card": ("POST", "/upload/card"),
+    "report": ("GET", "/generate-pdf"),
+}
+DEFAULT_MIX = "barcode=4,pdf417=2,card=2,report=1"
+# Distinct images generated per upload kind
+IMAGES_PER_KIND = 8
+REQUEST_TIMEOUT = 120.0
+
+
+def parse_mix(text):
+    """``"barcode=4,report=1"`` -> ``{"barcode": 4.0, "report": 1.0}``"""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("the mix needs at least one endpoint with a positive weight")
+    return mix
+
+
+def _jpeg(image, quality=85):
+    import cv2
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def _card_photo(rng):
+    """A card-sized photo with some texture; only its header is inspected"""
+    import cv2
+    import numpy as np
+
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    small = np_rng.uniform(40, 220, size=(16, 25, 3)).astype(np.uint8)
+    return cv2.resize(small, (1000, 630), interpolation=cv2.INTER_CUBIC)
+
+
+def build_payloads(seed=0):
+    """Synthetic upload images per kind; ``pdf417`` is missing without pdf417gen"""
+    rng = random.Random(seed)
+    payloads = {
+        "barcode": [
+            _jpeg(degrade(code128_image(f"LOAD-{rng.randint(10 ** 7, 10 ** 8 - 1)}"), rng, noise=6.0))
+            for _ in range(IMAGES_PER_KIND)
+        ],
+        "card": [_jpeg(_card_photo(rng)) for _ in range(IMAGES_PER_KIND)],
+    }
+    try:
+        payloads["pdf417"] = [
+            _jpeg(degrade(pdf417_image(random_license(rng)[0]), rng, noise=6.0))
+            for _ in range(IMAGES_PER_KIND)
+        ]
+    except ImportError:
+        pass
+    return payloads
+
+
+class LoadClient:
+    """One simulated client: a session and the requests it sends"""
+
+    def __init__(self, http, session_id, payloads, rng, cache_hits=False):
+        self.http = http
+        self.headers = {"X-Session-ID": session_id}
+        self.payloads = payloads
+        self.rng = rng
+        self.cache_hits = cache_hits
+
+    def _image(self, kind):
+        content = self.rng.choice(self.payloads[kind])
+        if self.cache_hits:
+            return content
+        # Bytes after the end of the image change its content hash only
+        return content + os.urandom(16)
+
+    async def send(self, kind):
+        """Send one request; returns the status code, or 0 if it failed"""
+        method, path = ENDPOINTS[kind]
+        files = None
+        if kind == "card":
+            files = {
+                "front": ("front.jpg", self._image("card"), "image/jpeg"),
+                "back": ("back.jpg", self._image("card"), "image/jpeg"),
+            }
+        elif kind in ("barcode", "pdf417"):
+            files = {"file": (f"{kind}.jpg", self._image(kind), "image/jpeg")}
+        try:
+            response = await self.http.request(method, path, files=files, headers=self.headers)
+            await response.aread()
+            return response.status_code
+        except httpx.HTTPError:
+            return 0
+
+    async def run(self, mix, deadline, samples):
+        kinds, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            kind = self.rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            status = await self.send(kind)
+            samples[kind].append((time.perf_counter() - started, status))
+
+
+def summarize(samples, elapsed):
+    """Statistics of ``[(seconds, status), ...]`` over ``elapsed`` seconds"""
+    count = len(samples)
+    if not count:
+        return {"requests": 0}
+    latencies = sorted(seconds * 1000.0 for seconds, _ in samples)
+    statuses = defaultdict(int)
+    for _, status in samples:
+        statuses[str(status)] += 1
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": count,
+        "rps": round(count / elapsed, 2),
+        "error_rate": round(errors / count, 4),
+        "rejected": statuses.get("503", 0),
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+async def run_load(http, payloads, mix, concurrency, duration, seed=0, cache_hits=False):
+    """Drive ``http`` with ``concurrency`` clients for ``duration`` seconds"""
+    rng = random.Random(seed)
+    clients = [
+        LoadClient(http, f"load-{seed}-{index:04d}-{rng.getrandbits(32):08x}", payloads,
+                   random.Random(rng.random()), cache_hits)
+        for index in range(concurrency)
+    ]
+    # Give every session something to report on; this also starts the
+    # worker processes before anything is timed
+    await asyncio.gather(*(client.send("card") for client in clients))
+    await asyncio.gather(*(client.send("barcode") for client in clients))
+
+    samples = defaultdict(list)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client.run(mix, deadline, samples) for client in clients))
+    elapsed = time.perf_counter() - started
+
+    await asyncio.gather(*(
+        http.post("/reset", headers=client.headers) for client in clients
+    ), return_exceptions=True)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "total": summarize([sample for kind in samples for sample in samples[kind]], elapsed),
+        "endpoints": {kind: summarize(samples[kind], elapsed) for kind in mix},
+    }
+
+
+@asynccontextmanager
+async def inprocess_target(workers):
+    """An httpx client calling the app directly, with ``workers`` decode workers"""
+    import main
+    from workers import WorkerPool
+
+    if workers:
+        previous = main.decode_pool
+        main.decode_pool = WorkerPool(
+            "decode",
+            workers=workers,
+            max_queue=previous.max_queue,
+            timeout=previous.timeout,
+            use_processes=previous.use_processes,
+        )
+        previous.shutdown(wait=False)
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", timeout=REQUEST_TIMEOUT
+        ) as http:
+            yield http
+    finally:
+        main.decode_pool.shutdown(wait=False)
+        main.report_pool.shutdown(wait=False)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_healthy(url, process, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=2.0) as http:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                if (await http.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"uvicorn did not become healthy within {timeout:g}s")
+
+
+@asynccontextmanager
+async def uvicorn_target(workers, uvicorn_workers):
+    """A local uvicorn server with ``workers`` decode workers per process"""
+    port = _free_port()
+    env = dict(os.environ)
+    if workers:
+        env["DECODE_WORKERS"] = str(workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        if uvicorn_workers > 1 and "SESSION_BACKEND" not in env:
+            env["SESSION_BACKEND"] = "sqlite"
+            env["SESSION_DB_PATH"] = os.path.join(tmp, "sessions.db")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(uvicorn_workers), "--log-level", "warning"],
+            cwd=BACKEND_ROOT,
+            env=env,
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            await _wait_until_healthy(url, process)
+            async with httpx.AsyncClient(base_url=url, timeout=REQUEST_TIMEOUT) as http:
+                yield http
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+@asynccontextmanager
+async def url_target(url):
+    async with httpx.AsyncClient(base_url=url, timeout=REQUEST_TIMEOUT) as http:
+        yield http
+
+
+async def run(args, mix, payloads):
+    runs = []
+    worker_counts = [None] if args.url else (args.workers or [None])
+    for workers in worker_counts:
+        if args.url:
+            target = url_target(args.url)
+        elif args.target == "uvicorn":
+            target = uvicorn_target(workers, args.uvicorn_workers)
+        else:
+            target = inprocess_target(workers)
+        async with target as http:
+            result = await run_load(
+                http, payloads, mix, args.concurrency, args.duration, args.seed, args.cache_hits
+            )
+        runs.append({"workers": workers, **result})
+    return runs
+
+
+def print_runs(runs):
+    print(f"{'workers':>7} {'endpoint':<9} {'requests':>8} {'req/s':>8} {'errors':>7} {'503':>5} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for entry in runs:
+        workers = entry["workers"] or "-"
+        for name, stats in [*entry["endpoints"].items(), ("total", entry["total"])]:
+            if not stats["requests"]:
+                print(f"{workers:>7} {name:<9} {0:>8}")
+                continue
+            print(
+                f"{workers:>7} {name:<9} {stats['requests']:>8} {stats['rps']:>8.2f} "
+                f"{stats['error_rate']:>7.1%} {stats['rejected']:>5} {stats['p50_ms']:>8.1f} "
+                f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--url", help="load test a running server instead")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. barcode=4,report=1")
+    parser.add_argument("--workers", help="comma-separated decode worker counts to compare, e.g. 1,2,4")
+    parser.add_argument("--uvicorn-workers", type=int, default=1, help="server processes (uvicorn target)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-hits", action="store_true", help="reuse identical uploads")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    args.workers = [int(n) for n in args.workers.split(",")] if args.workers else None
+
+    payloads = build_payloads(args.seed)
+    if "pdf417" in mix and "pdf417" not in payloads:
+        print("pdf417gen is not installed; leaving /upload/pdf417 out of the mix", file=sys.stderr)
+        del mix["pdf417"]
+        if not mix:
+            parser.error("nothing left in the mix")
+
+    runs = asyncio.run(run(args, mix, payloads))
+    result = {
+        "target": args.url or args.target,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        "cache_hits": args.cache_hits,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_runs(runs)
+
+
+if __name__ == "__main__":
+    main()
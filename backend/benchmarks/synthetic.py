@@ -0,0 +1,278 @@
+"""Synthetic inputs for benchmarks and tests.
+
+Everything here is generated from a seed, so runs are reproducible and no
+real personal data is needed.
+"""
+
+import random
+
+FIRST_NAMES = ["JOHN", "MARY", "JOSE", "LI", "AISHA", "OLIVIA", "NOAH", "MARIE CLAIRE"]
+LAST_NAMES = ["SMITH", "GARCIA", "NGUYEN", "O'BRIEN", "VAN DER BERG", "KOWALSKI"]
+STREETS = ["MAIN ST", "DAKOTA AVE", "OLD MILL RD", "MARTIN LUTHER KING JR BLVD", "ELM CT"]
+CITIES = [("SPRINGFIELD", "IL", "USA"), ("SAN ANTONIO", "TX", "USA"), ("TORONTO", "ON", "CAN")]
+
+
+def aamva_payload(subfiles, version=8, jurisdiction_version=0, iin="636000"):
+    """Encode ``subfiles`` (``[(type, [(element_id, value), ...]), ...]``)
+    as an AAMVA payload with correct header offsets and lengths."""
+    header = "@\n\x1e\rANSI " + iin + f"{version:02d}"
+    if version >= 2:
+        header += f"{jurisdiction_version:02d}"
+    header += f"{len(subfiles):02d}"
+
+    bodies = [
+        subfile_type + "\n".join(code + value for code, value in elements) + "\r"
+        for subfile_type, elements in subfiles
+    ]
+    offset = len(header) + 10 * len(subfiles)
+    designators = ""
+    for (subfile_type, _), body in zip(subfiles, bodies):
+        designators += f"{subfile_type}{offset:04d}{len(body):04d}"
+        offset += len(body)
+    return header + designators + "".join(bodies)
+
+
+def _date(rng, start_year, end_year, canadian):
+    year = rng.randint(start_year, end_year)
+    month = rng.randint(1, 12)
+    day = rng.randint(1, 28)
+    return f"{year}{month:02d}{day:02d}" if canadian else f"{month:02d}{day:02d}{year}"
+
+
+def random_license(rng, version=None, jurisdiction_elements=None):
+    """One synthetic DL payload; returns ``(payload, elements)``.
+
+    ``jurisdiction_elements`` sets the size of the jurisdiction subfile
+    (by default half the payloads carry a one-element subfile).
+    """
+    version = version or rng.choice([1, 3, 8, 9, 10])
+    city, state, country = rng.choice(CITIES)
+    canadian = country == "CAN" or version == 1
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    middle = rng.choice(["", "A", "LEE", "ANNE MARIE"])
+    street = f"{rng.randint(1, 99999)} {rng.choice(STREETS)}"
+
+    elements = [("DAQ", f"{state}{rng.randint(10 ** 7, 10 ** 8 - 1)}")]
+    if version == 1:
+        elements.append(("DAA", ",".join(part for part in (last, first, middle) if part)))
+        elements.append(("DAR", "C"))
+    else:
+        elements += [("DCS", last), ("DAC", first), ("DAD", middle or "NONE"), ("DCA", "C")]
+    elements += [
+        ("DCB", rng.choice(["NONE", "B", "B C"])),
+        ("DCD", "NONE"),
+        ("DBA", _date(rng, 2026, 2034, canadian)),
+        ("DBB", _date(rng, 1940, 2008, canadian)),
+        ("DBD", _date(rng, 2018, 2025, canadian)),
+        ("DBC", rng.choice(["1", "2"])),
+        ("DAY", rng.choice(["BRO", "BLU", "GRN", "HAZ"])),
+        ("DAU", f"{rng.randint(58, 78):03d} in"),
+        ("DAG", street),
+        ("DAI", city),
+        ("DAJ", state),
+        ("DAK", f"{rng.randint(10000, 99999)}0000  "),
+        ("DCF", f"{rng.randint(10 ** 15, 10 ** 16 - 1)}"),
+        ("DCG", country),
+        ("DDE", "N"),
+        ("DDF", "N"),
+        ("DDG", "N"),
+    ]
+    if version >= 8:
+        elements += [("DAW", f"{rng.randint(100, 300)}"), ("DDB", _date(rng, 2010, 2020, canadian))]
+
+    subfiles = [("DL", elements)]
+    if jurisdiction_elements is None:
+        jurisdiction_elements = 1 if rng.random() < 0.5 else 0
+    if jurisdiction_elements:
+        subfile_type = "Z" + state[0]
+        subfiles.append((subfile_type, [
+            (subfile_type + chr(ord("A") + i % 26), f"JURISDICTION DATA {i}")
+            for i in range(jurisdiction_elements)
+        ]))
+    return aamva_payload(subfiles, version=version), elements
+
+
+def license_corpus(count, seed=0, jurisdiction_elements=None):
+    """``count`` synthetic DL payloads"""
+    rng = random.Random(seed)
+    return [random_license(rng, jurisdiction_elements=jurisdiction_elements)[0] for _ in range(count)]
+
+
+# Code 128 symbol patterns: bar/space module widths of values 0-105, then stop
+CODE128_PATTERNS = (
+    "212222 222122 222221 121223 121322 131222 122213 122312 132212 221213 "
+    "221312 231212 112232 122132 122231 113222 123122 123221 223211 221132 "
+    "221231 213212 223112 312131 311222 321122 321221 312212 322112 322211 "
+    "212123 212321 232121 111323 131123 131321 112313 132113 132311 211313 "
+    "231113 231311 112133 112331 132131 113123 113321 133121 313121 211331 "
+    "231131 213113 213311 213131 311123 311321 331121 312113 312311 332111 "
+    "314111 221411 431111 111224 111422 121124 121421 141122 141221 112214 "
+    "112412 122114 122411 142112 142211 241211 221114 413111 241112 134111 "
+    "111242 121142 121241 114212 124112 124211 411212 421112 421211 212141 "
+    "214121 412121 111143 111341 131141 114113 114311 411113 411311 113141 "
+    "114131 311141 411131 211412 211214 211232 2331112"
+).split()
+CODE128_START_B = 104
+CODE128_STOP = 106
+
+
+def code128_modules(data):
+    """Bar/space widths of ``data`` (printable ASCII) as Code 128 set B"""
+    values = [CODE128_START_B] + [ord(char) - 32 for char in data]
+    if any(value < 0 or value > 94 for value in values[1:]):
+        raise ValueError("Code 128 set B encodes printable ASCII only")
+    checksum = (values[0] + sum(i * value for i, value in enumerate(values[1:], start=1))) % 103
+    return "".join(CODE128_PATTERNS[value] for value in values + [checksum, CODE128_STOP])
+
+
+def code128_image(data, module_px=3, height=120, quiet_modules=12):
+    """Grayscale (uint8) image of a Code 128 barcode with quiet zones"""
+    import numpy as np
+
+    row = [255] * quiet_modules * module_px
+    for index, width in enumerate(code128_modules(data)):
+        row += [0 if index % 2 == 0 else 255] * int(width) * module_px
+    row += [255] * quiet_modules * module_px
+    image = np.tile(np.array(row, dtype=np.uint8), (height, 1))
+    margin = np.full((quiet_modules * module_px, image.shape[1]), 255, dtype=np.uint8)
+    return np.vstack([margin, image, margin])
+
+
+def degrade(image, rng, canvas=(1200, 1600), blur=0.0, noise=0.0, contrast=1.0, angle=0.0):
+    """Place ``image`` on a textured canvas and simulate a poor photo.
+
+    ``blur`` is the Gaussian sigma in pixels, ``noise`` the standard
+    deviation of additive noise, ``contrast`` scales the distance from mid
+    gray and ``angle`` rotates the barcode in degrees. Returns BGR uint8.
+    """
+    import cv2
+    import numpy as np
+
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    height, width = canvas
+    # Smooth background texture, like a desk or a document
+    background = cv2.resize(
+        np_rng.uniform(150, 230, size=(height // 40 + 1, width // 40 + 1)).astype(np.float32),
+        (width, height), interpolation=cv2.INTER_CUBIC,
+    )
+    if angle:
+        h, w = image.shape
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        image = cv2.warpAffine(image, matrix, (w, h), borderValue=255)
+    h, w = image.shape
+    y = rng.randint(0, max(0, height - h))
+    x = rng.randint(0, max(0, width - w))
+    photo = background.copy()
+    photo[y:y + h, x:x + w] = image[:height - y, :width - x]
+
+    photo = 128.0 + (photo - 128.0) * contrast
+    if blur:
+        photo = cv2.GaussianBlur(photo, (0, 0), blur)
+    if noise:
+        photo += np_rng.normal(0.0, noise, size=photo.shape)
+    gray = np.clip(photo, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+# Capture conditions of the synthetic barcode corpus: (name, degrade kwargs)
+BARCODE_CONDITIONS = (
+    ("clean", {}),
+    ("noisy", {"noise": 18.0}),
+    ("low_contrast", {"contrast": 0.25}),
+    ("blurred", {"blur": 1.6}),
+    ("dim_noisy", {"contrast": 0.35, "noise": 10.0}),
+    ("tilted", {"angle": 4.0, "noise": 6.0}),
+)
+
+
+def barcode_corpus(count, seed=0, canvas=(1200, 1600)):
+    """``count`` synthetic barcode photos: ``[(condition, expected, bgr_image), ...]``
+
+    Conditions cycle through ``BARCODE_CONDITIONS`` so every condition is
+    equally represented.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        condition, kwargs = BARCODE_CONDITIONS[index % len(BARCODE_CONDITIONS)]
+        expected = f"SCAN-{rng.randint(10 ** 7, 10 ** 8 - 1)}"
+        barcode = code128_image(expected, module_px=rng.choice([2, 3, 4]))
+        corpus.append((condition, expected, degrade(barcode, rng, canvas=canvas, **kwargs)))
+    return corpus
+
+
+def pdf417_image(payload, module_px=2, columns=12, security_level=4):
+    """Grayscale (uint8) image of a PDF417 symbol; requires ``pdf417gen``"""
+    import numpy as np
+    from pdf417gen import encode, render_image
+
+    codes = encode(payload, columns=columns, security_level=security_level)
+    image = render_image(codes, scale=module_px, ratio=3, padding=10 * module_px)
+    return np.array(image.convert("L"))
+
+
+def rotate_bound(image, angle):
+    """Rotate a grayscale image by ``angle`` degrees, growing it to fit"""
+    import cv2
+
+    h, w = image.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_w, new_h = int(h * sin + w * cos), int(h * cos + w * sin)
+    matrix[0, 2] += new_w / 2 - w / 2
+    matrix[1, 2] += new_h / 2 - h / 2
+    return cv2.warpAffine(image, matrix, (new_w, new_h), borderValue=255)
+
+
+# Capture conditions of the decode benchmark corpus: (name, options).
+# ``angle`` rotates the symbol (growing its bounds), ``jpeg_quality`` is the
+# quality the photo is saved at; the rest are ``degrade`` arguments.
+CAPTURE_CONDITIONS = (
+    ("clean", {}),
+    ("rotated", {"angle": 12.0}),
+    ("blurred", {"blur": 1.2}),
+    ("noisy", {"noise": 15.0}),
+    ("low_contrast", {"contrast": 0.3}),
+    ("jpeg_q30", {"jpeg_quality": 30}),
+)
+# Symbol sizes: (name, pixels per module, photo canvas (height, width))
+CAPTURE_SIZES = (
+    ("small", 1, (600, 800)),
+    ("medium", 2, (1200, 1600)),
+    ("large", 4, (2400, 3200)),
+)
+DEFAULT_JPEG_QUALITY = 85
+
+
+def decode_corpus(kind, count, seed=0):
+    """``count`` synthetic photos for ``kind`` (``barcode`` or ``pdf417``) as
+    ``[(condition, size, expected, jpeg_bytes), ...]``.
+
+    Barcodes are Code 128 and PDF417 symbols carry AAMVA license payloads.
+    Conditions cycle through ``CAPTURE_CONDITIONS``; sizes cycle through
+    ``CAPTURE_SIZES`` independently, so every pairing occurs.
+    """
+    import cv2
+
+    rng = random.Random(f"{kind}-{seed}")
+    corpus = []
+    for index in range(count):
+        condition, options = CAPTURE_CONDITIONS[index % len(CAPTURE_CONDITIONS)]
+        size, module_px, canvas = CAPTURE_SIZES[(index // len(CAPTURE_CONDITIONS)) % len(CAPTURE_SIZES)]
+        options = dict(options)
+        angle = options.pop("angle", 0.0)
+        jpeg_quality = options.pop("jpeg_quality", DEFAULT_JPEG_QUALITY)
+
+        if kind == "pdf417":
+            expected = random_license(rng)[0]
+            symbol = pdf417_image(expected, module_px=module_px)
+        else:
+            expected = f"SCAN-{rng.randint(10 ** 7, 10 ** 8 - 1)}"
+            # A one pixel module is below what a phone photo resolves
+            symbol = code128_image(expected, module_px=module_px + 1)
+        if angle:
+            symbol = rotate_bound(symbol, angle)
+        photo = degrade(symbol, rng, canvas=canvas, **options)
+        encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])[1].tobytes()
+        corpus.append((condition, size, expected, encoded))
+    return corpus
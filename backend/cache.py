@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def content_key(content, kind, version):
+    """Cache key for decoding ``content`` with a given decoder and config version"""
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{kind}-{version}-{digest}"
+
+
+class ResultCache:
+    """LRU cache of decode results keyed by upload content.
+
+    Entries live in memory, bounded by ``max_entries`` and ``ttl`` seconds.
+    When ``disk_dir`` is set, results are also written there as JSON so they
+    survive restarts and can be shared between worker processes; a memory
+    miss falls back to the disk tier before reporting a miss. Values that
+    are not plain JSON data are converted with ``to_json_data`` on the way
+    to disk and rebuilt with ``from_json_data`` when read back.
+
+    ``get`` and ``put`` block on file I/O when the disk tier is enabled;
+    code running on the event loop uses ``get_async`` and ``put_async``,
+    which answer memory hits directly and do the file I/O in a thread.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, disk_dir=None, max_disk_entries=10000,
+                 to_json_data=None, from_json_data=None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.to_json_data = to_json_data
+        self.from_json_data = from_json_data
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def get(self, key):
+        """Return the cached result for ``key`` or None"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        return self._disk_lookup(key, self._disk_get(key))
+
+    async def get_async(self, key):
+        """``get`` that reads the disk tier in a worker thread"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        disk_value = None
+        if self.disk_dir is not None:
+            disk_value = await asyncio.to_thread(self._disk_get, key)
+        return self._disk_lookup(key, disk_value)
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._disk_put(key, value)
+
+    async def put_async(self, key, value):
+        """``put`` that writes the disk tier in a worker thread"""
+        self._remember(key, value)
+        if self.disk_dir is not None:
+            await asyncio.to_thread(self._disk_put, key, value)
+
+    def _memory_get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self._expired(stored_at):
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _disk_lookup(self, key, value):
+        # Memory is only updated here, on the caller's thread, so the disk
+        # reads of get_async never touch the LRU from a worker thread
+        if value is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            if self._expired(path.stat().st_mtime):
+                path.unlink(missing_ok=True)
+                self.expirations += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return self.from_json_data(data) if self.from_json_data else data
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _disk_put(self, key, value):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_json_data(value) if self.to_json_data else value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries once the tier grows past its bound"""
+        try:
+            files = sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:max(0, len(files) - self.max_disk_entries)]:
+            path.unlink(missing_ok=True)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk": str(self.disk_dir) if self.disk_dir else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ReportCache:
+    """Content-addressed on-disk cache of generated PDF reports.
+
+    Keys are derived from the data a report is rendered from, so identical
+    selections of unchanged scans reuse the same file. At most
+    ``max_entries`` reports are kept; the least recently used go first.
+    """
+
+    def __init__(self, disk_dir, max_entries=200):
+        self.disk_dir = Path(disk_dir)
+        self.max_entries = max_entries
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(report_json, version):
+        """Cache key for a report rendered from ``report_json`` bytes"""
+        digest = hashlib.sha256(report_json).hexdigest()
+        return f"report-{version}-{digest}"
+
+    def _path(self, key):
+        return self.disk_dir / f"{key}.pdf"
+
+    def get(self, key):
+        """The cached report's bytes, or None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._writes += 1
+        if self._writes % 16 == 0:
+            self._prune()
+
+    def _prune(self):
+        try:
+            files = sorted(self.disk_dir.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:max(0, len(files) - self.max_entries)]:
+            path.unlink(missing_ok=True)
+
+    def stats(self):
+        return {"disk": str(self.disk_dir), "hits": self.hits, "misses": self.misses}
@@ -1,3 +1,4 @@
+import hashlib
 import os
 from pathlib import Path
 
@@ -16,3 +17,134 @@ CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost
 # File Upload Configuration
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+# Maximum images in one /batch/decode request, counting archive members
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 500))
+# Largest /batch/decode request body; other uploads are capped at
+# MAX_FILE_SIZE per file before Starlette parses the multipart body
+BATCH_MAX_REQUEST_SIZE = int(os.getenv("BATCH_MAX_REQUEST_SIZE", 200 * 1024 * 1024))
+# Total uncompressed bytes of all images in one /batch/decode request,
+# counting archive members as they are extracted
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", 256 * 1024 * 1024))
+# Largest camera frame accepted by the /ws/scan WebSocket; frames are meant
+# to be low-resolution video stills, not full photos
+FRAME_MAX_BYTES = int(os.getenv("FRAME_MAX_BYTES", 2 * 1024 * 1024))
+# Maximum sessions in one /reports/bulk export
+BULK_MAX_SESSIONS = int(os.getenv("BULK_MAX_SESSIONS", 1000))
+# Bulk export reads other clients' sessions, so it needs this token as
+# "Authorization: Bearer <token>"; unset disables the endpoint
+BULK_EXPORT_TOKEN = os.getenv("BULK_EXPORT_TOKEN", "")
+# Seconds allowed for rendering a merged bulk PDF (one job for all subjects)
+BULK_REPORT_TIMEOUT = float(os.getenv("BULK_REPORT_TIMEOUT", 900))
+# Reject images with more pixels than this before decoding them
+# (decompression bombs: a small file can expand to gigabytes)
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+# Decode larger images at 1/2, 1/4 or 1/8 scale so the longest side stays
+# at or above this size; 0 disables early downsampling
+DECODE_MAX_DIM = int(os.getenv("DECODE_MAX_DIM", 1600))
+
+# Decode Worker Pool Configuration
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", os.cpu_count() or 1))
+DECODE_MAX_QUEUE = int(os.getenv("DECODE_MAX_QUEUE", 16))
+DECODE_TIMEOUT = float(os.getenv("DECODE_TIMEOUT", 30))
+DECODE_USE_PROCESSES = os.getenv("DECODE_USE_PROCESSES", "true").lower() in ("1", "true", "yes")
+# Start decode and report workers, import their libraries and run one tiny
+# decode per decoder at startup; /ready reports ready once this is done
+WARM_UP = os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes")
+
+# Barcode Decode Pipeline Configuration
+# Comma-separated stage names in the order they are tried; omit a stage to
+# disable it. Available: localized, raw, preprocessed, upscaled, rotated,
+# deskewed.
+BARCODE_STAGES = [
+    stage.strip()
+    for stage in os.getenv(
+        "BARCODE_STAGES", "localized,raw,preprocessed,upscaled,rotated,deskewed"
+    ).split(",")
+    if stage.strip()
+]
+# Re-order stages by observed cost per successful decode
+BARCODE_ADAPTIVE_STAGES = os.getenv("BARCODE_ADAPTIVE_STAGES", "false").lower() in ("1", "true", "yes")
+# "lossless" rotates the shared preprocessed frame with transposes/flips;
+# "legacy" uses interpolated warpAffine rotation and re-preprocesses per angle
+ROTATION_MODE = os.getenv("ROTATION_MODE", "lossless").lower()
+# "adaptive" measures sharpness, contrast and noise and applies only the
+# preprocessing a frame needs; "fixed" always runs the full original chain
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "adaptive").lower()
+# Images whose longest side is at least this many pixels are first decoded
+# from localized candidate regions before falling back to the full frame
+LOCALIZE_MIN_DIM = int(os.getenv("LOCALIZE_MIN_DIM", 1200))
+LOCALIZE_MAX_ROIS = int(os.getenv("LOCALIZE_MAX_ROIS", 3))
+# Skip the 2x upscale stage when the upscaled frame would exceed this size
+UPSCALE_MAX_DIM = int(os.getenv("UPSCALE_MAX_DIM", 3000))
+# Consensus voting: a value is accepted once this many frames or
+# preprocessing variants read it and it holds this share of the read weight
+# for its symbology
+CONSENSUS_MIN_VOTES = int(os.getenv("CONSENSUS_MIN_VOTES", 2))
+CONSENSUS_MIN_SHARE = float(os.getenv("CONSENSUS_MIN_SHARE", 0.6))
+# Decode barcode uploads by voting across the pipeline's preprocessing
+# variants instead of taking the first stage that reads anything
+BARCODE_CONSENSUS = os.getenv("BARCODE_CONSENSUS", "false").lower() in ("1", "true", "yes")
+
+# Decode Result Cache Configuration
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 512))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 3600))
+# Optional directory for a persistent, cross-process cache tier
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR") or None
+
+# Bump DECODER_VERSION whenever decoder output changes. Together with the
+# decoder settings above it forms the cache key version, so results produced
+# by other code or another configuration are never served from the cache.
+DECODER_VERSION = "3"
+DECODER_CONFIG_VERSION = hashlib.sha1(repr((
+    DECODER_VERSION,
+    DECODE_MAX_DIM,
+    BARCODE_STAGES,
+    ROTATION_MODE,
+    PREPROCESS_MODE,
+    LOCALIZE_MIN_DIM,
+    LOCALIZE_MAX_ROIS,
+    UPSCALE_MAX_DIM,
+    CONSENSUS_MIN_VOTES,
+    CONSENSUS_MIN_SHARE,
+    BARCODE_CONSENSUS,
+)).encode()).hexdigest()[:12]
+
+# Keep a copy of barcode/PDF417 uploads on disk. Decoding works from memory,
+# so this is only needed for auditing; checkbook and card images are always
+# saved because reports embed them.
+PERSIST_UPLOADS = os.getenv("PERSIST_UPLOADS", "true").lower() in ("1", "true", "yes")
+
+# Session Configuration
+# "memory" keeps sessions in the worker process (single worker only);
+# "sqlite" shares them between workers through SESSION_DB_PATH
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", str(BASE_DIR / "sessions.db"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", 24 * 3600))
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", 300))
+
+# Report Generation Configuration
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+REPORT_MAX_QUEUE = int(os.getenv("REPORT_MAX_QUEUE", 8))
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", 120))
+# Finished report jobs kept for download before the oldest are evicted
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", 100))
+# Seconds before a report job still pending in the sqlite backend (e.g. its
+# worker died) is marked failed; 0 disables the check
+REPORT_JOB_STALE_AFTER = float(os.getenv("REPORT_JOB_STALE_AFTER", 900))
+# Optional directory caching generated reports by the data they were
+# rendered from; unset disables the cache
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR") or None
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 200))
+# Bump when report rendering changes so cached reports are not reused
+REPORT_VERSION = "1"
+
+# Request tracing: requests taking at least TRACE_SLOW_MS are kept, up to
+# TRACE_BUFFER_SIZE of the most recent, for lookup on /traces
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 1000))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 100))
+
+# Reports embed JPEG thumbnails of checkbook/card uploads rather than the
+# originals. They are rendered once per distinct image (by content hash)
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", str(BASE_DIR / "derivatives"))
+THUMBNAIL_MAX_DIM = int(os.getenv("THUMBNAIL_MAX_DIM", 1200))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 80))
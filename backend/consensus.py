@@ -0,0 +1,135 @@
+"""Consensus voting over repeated reads of the same scene.
+
+A single decode can misread a damaged or blurred linear barcode, and zbar
+reports every read the same way. Decoding several camera frames, or the
+same image through several preprocessing variants, and only accepting a
+value that most of them agree on filters those misreads out. Voting stops
+as soon as a value is agreed on, so clean scans need no more decodes than
+the threshold requires.
+"""
+
+from models import Barcode, BarcodeScan, PDF417Scan
+
+# zbar quality (agreeing scan lines) at which a read counts fully
+QUALITY_SATURATION = 4
+
+
+def read_weight(quality=None, polygon=None):
+    """Evidence one zbar read contributes to a vote, between 0.25 and 1.
+
+    For linear codes zbar's ``quality`` is the number of scan lines that
+    decoded the same value, so more lines mean a steadier read. An outline
+    (``polygon``) of fewer than four points was traced from part of the
+    symbol only and counts half.
+    """
+    lines = min(max(int(quality or 1), 1), QUALITY_SATURATION)
+    weight = 0.5 + 0.5 * (lines - 1) / (QUALITY_SATURATION - 1)
+    if polygon is not None and len(polygon) < 4:
+        weight *= 0.5
+    return round(weight, 4)
+
+
+def read_key(item):
+    """``(symbology, value)`` of a ``Barcode`` or ``PDF417Code``"""
+    return getattr(item, "type", "PDF417"), item.data
+
+
+def scan_reads(result):
+    """The individual reads of a decode result"""
+    if isinstance(result, BarcodeScan):
+        return result.barcodes
+    if isinstance(result, PDF417Scan):
+        return result.codes
+    return ()
+
+
+class Candidate:
+    """Votes collected for one value"""
+
+    __slots__ = ("key", "item", "votes", "weight")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.votes = 0
+        self.weight = 0.0
+
+
+class ConsensusVoter:
+    """Tally reads from several frames or preprocessing variants by value.
+
+    Every observation (one frame, or one variant of an image) votes at most
+    once per value, weighted by its best read of it. Values of the same
+    symbology compete: a value wins once it has ``min_votes`` votes and at
+    least ``min_share`` of its symbology's total weight, so a misread that
+    turns up now and then keeps an otherwise clear winner from being
+    accepted until it is outvoted. Different symbologies are decided
+    independently.
+    """
+
+    def __init__(self, min_votes=2, min_share=0.6):
+        self.min_votes = max(1, int(min_votes))
+        self.min_share = min_share
+        self.observations = 0
+        self._candidates = {}
+
+    def add(self, items):
+        """Record one observation's reads (``Barcode``/``PDF417Code`` objects)"""
+        self.observations += 1
+        best = {}
+        for item in items:
+            key = read_key(item)
+            weight = getattr(item, "confidence", None) or 1.0
+            if key not in best or weight > best[key][1]:
+                best[key] = (item, weight)
+        for key, (item, weight) in best.items():
+            candidate = self._candidates.get(key)
+            if candidate is None:
+                candidate = self._candidates[key] = Candidate(key, item)
+            candidate.item = item
+            candidate.votes += 1
+            candidate.weight += weight
+
+    def share(self, candidate):
+        """Fraction of its symbology's read weight held by ``candidate``"""
+        total = sum(c.weight for c in self._candidates.values() if c.key[0] == candidate.key[0])
+        return candidate.weight / total if total else 0.0
+
+    def confidence(self, candidate):
+        """Agreement share, discounted while the value has been seen only a few times"""
+        return round(self.share(candidate) * (1.0 - 0.5 ** candidate.votes), 4)
+
+    def leaders(self):
+        """The strongest candidate of each symbology"""
+        leaders = {}
+        for candidate in self._candidates.values():
+            symbology = candidate.key[0]
+            current = leaders.get(symbology)
+            if current is None or (candidate.votes, candidate.weight) > (current.votes, current.weight):
+                leaders[symbology] = candidate
+        return list(leaders.values())
+
+    def winners(self):
+        """Leaders that meet the agreement threshold"""
+        return [
+            candidate for candidate in self.leaders()
+            if candidate.votes >= self.min_votes and self.share(candidate) >= self.min_share
+        ]
+
+    @property
+    def decided(self):
+        return bool(self.winners())
+
+    def barcodes(self, candidates):
+        """``Barcode`` results for ``candidates`` with their consensus confidence"""
+        decided = set(id(candidate) for candidate in self.winners())
+        return [
+            Barcode(
+                candidate.item.type,
+                candidate.item.data,
+                "consensus" if id(candidate) in decided else "detected",
+                confidence=self.confidence(candidate),
+                votes=candidate.votes,
+            )
+            for candidate in candidates
+        ]
@@ -1,304 +1,494 @@
-from pyzbar import pyzbar
 from PIL import Image
 import io
 from pathlib import Path
 import contextlib
 import os
+from config import (
+    BARCODE_STAGES,
+    BARCODE_ADAPTIVE_STAGES,
+    ROTATION_MODE,
+    PREPROCESS_MODE,
+    LOCALIZE_MIN_DIM,
+    LOCALIZE_MAX_ROIS,
+    UPSCALE_MAX_DIM,
+    DECODE_MAX_DIM,
+    CONSENSUS_MIN_VOTES,
+    CONSENSUS_MIN_SHARE,
+)
+from pipeline import DecodeStage, DecodePipeline
+from consensus import ConsensusVoter, read_weight
+from preprocessing import preprocess
+from metrics import stage_timer, timed
+import aamva
+from aamva import AAMVA_FIELDS  # noqa: F401
+from models import (
+    AAMVARecord,
+    Barcode,
+    BarcodeScan,
+    DecodeFailure,
+    ImageInfo,
+    PDF417Code,
+    PDF417Scan,
+)
 
-AAMVA_FIELDS = {
-    "DCS": {"name": "Last Name", "category": "personal"},
-    "DAC": {"name": "First Name", "category": "personal"},
-    "DAD": {"name": "Middle Name", "category": "personal"},
-    "DBB": {"name": "Date of Birth", "category": "personal"},
-    "DBC": {"name": "Sex", "category": "personal"},
-    "DAY": {"name": "Eye Color", "category": "physical"},
-    "DAU": {"name": "Height", "category": "physical"},
-    "DAW": {"name": "Weight", "category": "physical"},
-    "DAG": {"name": "Street Address", "category": "address"},
-    "DAI": {"name": "City", "category": "address"},
-    "DAJ": {"name": "State", "category": "address"},
-    "DAK": {"name": "Postal Code", "category": "address"},
-    "DAQ": {"name": "ID Number", "category": "document"},
-    "DBA": {"name": "Expiration Date", "category": "document"},
-    "DBD": {"name": "Issue Date", "category": "document"},
-    "DCG": {"name": "Country", "category": "document"},
-    "DCA": {"name": "Vehicle Class", "category": "document"},
-    "DCB": {"name": "Restriction Codes", "category": "document"},
-    "DCD": {"name": "Endorsement Codes", "category": "document"},
-    "DCL": {"name": "Race/Ethnicity", "category": "physical"},
-    "DCM": {"name": "Vehicle Classification", "category": "document"},
-    "DDB": {"name": "Card Revision Date", "category": "document"},
-}
+# Decode misses that depend only on the image, as opposed to runtime errors
+NO_BARCODE_ERROR = "No barcode detected in image"
+NO_PDF417_ERROR = "No PDF417 code detected in image"
+
+def read_image_bytes(source):
+    """Return the encoded image bytes for ``source``.
+
+    ``source`` is either the upload itself (bytes, bytearray or memoryview)
+    or a path to a file on disk.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+def _reduction_factor(data, max_dim):
+    """Return ``(factor, has_alpha)`` from the image header.
+
+    ``factor`` is the largest of 2/4/8 that keeps the longest side at or
+    above ``max_dim``; ``has_alpha`` tells whether the image may contain
+    transparent pixels.
+    """
+    if not max_dim:
+        return 1, False
+    try:
+        with Image.open(io.BytesIO(data)) as header:
+            longest = max(header.size)
+            has_alpha = header.mode in ("RGBA", "LA", "PA") or "transparency" in header.info
+    except Exception:
+        return 1, False
+    factor = 1
+    for candidate in (2, 4, 8):
+        if longest / candidate >= max_dim:
+            factor = candidate
+    return factor, has_alpha
+
+@timed("image_decode")
+def decode_image(source, grayscale=False, max_dim=DECODE_MAX_DIM):
+    """Decode ``source`` into a NumPy array ready for OpenCV.
+
+    Returns a BGR image, or a single-channel image when ``grayscale`` is
+    set; 16-bit images are scaled to 8 bits. Images much larger than
+    ``max_dim`` are decoded at a reduced scale, which for JPEG skips most of
+    the decoding work. Formats OpenCV cannot decode (e.g. GIF) fall back to
+    Pillow.
+
+    In color mode transparent pixels are composited onto white. OpenCV's
+    reduced-scale modes drop the alpha channel, so transparent images are
+    decoded at full size, composited, then downscaled. Grayscale decodes
+    drop alpha, leaving transparent pixels at their stored value (usually
+    black).
+    """
+    import cv2
+    import numpy as np
+    data = read_image_bytes(source)
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    factor, has_alpha = _reduction_factor(data, max_dim)
+    # Transparent color images are composited before they are downscaled
+    resize_factor = factor if has_alpha and not grayscale else 1
+    
+    if grayscale:
+        flags = {
+            1: cv2.IMREAD_GRAYSCALE,
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+        }[factor]
+    else:
+        # Reduced modes drop the alpha channel, so only full-size decodes
+        # keep it for compositing.
+        flags = {
+            1: cv2.IMREAD_UNCHANGED,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }[factor // resize_factor]
+    image = cv2.imdecode(buffer, flags)
+    
+    if image is None:
+        pil_image = Image.open(io.BytesIO(data)).convert("L" if grayscale else "RGBA")
+        if factor > 1:
+            pil_image = pil_image.reduce(factor)
+            resize_factor = 1
+        image = np.asarray(pil_image)
+        if not grayscale:
+            image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA)
+    
+    if grayscale:
+        return image
+    
+    if image.dtype != np.uint8:
+        # 16-bit PNG/TIFF
+        image = cv2.convertScaleAbs(image, alpha=255.0 / 65535.0)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+        composited = image[:, :, :3].astype(np.float32) * alpha + 255.0 * (1.0 - alpha)
+        image = composited.astype(np.uint8)
+    if resize_factor > 1:
+        h, w = image.shape[:2]
+        size = (max(1, w // resize_factor), max(1, h // resize_factor))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+@contextlib.contextmanager
+def suppress_c_stderr():
+    """Silence warnings that zbar prints straight to the C-level stderr"""
+    try:
+        devnull_fd = os.open(os.devnull, os.O_RDWR)
+        orig_stderr_fd = os.dup(2)
+        os.dup2(devnull_fd, 2)
+        try:
+            yield
+        finally:
+            os.dup2(orig_stderr_fd, 2)
+            os.close(orig_stderr_fd)
+            os.close(devnull_fd)
+    except Exception:
+        yield
+
+class BarcodeDecodeContext:
+    """Per-image state shared between decode stages.
+
+    Intermediate images (e.g. the preprocessed grayscale frame) are computed
+    on first use and reused by any later stage that needs them.
+    """
+
+    def __init__(self, cv_image):
+        self.image = cv_image
+        # Candidate regions (x, y, w, h) chosen by the localization stage,
+        # or None when the stage did not run.
+        self.rois = None
+        self._cache = {}
+
+    def cached(self, key, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
 
 class BarcodeDecoder:
     """Decode 1D and 2D barcodes using pyzbar"""
     
+    _pipeline = None
+    
     @staticmethod
+    @timed("preprocess")
     def _preprocess_image(cv_image):
-        """Apply advanced preprocessing for better barcode detection"""
+        """Denoised, contrast-enhanced grayscale (see preprocessing.py and PREPROCESS_MODE)"""
+        return preprocess(cv_image, PREPROCESS_MODE)
+    
+    @staticmethod
+    @timed("pyzbar")
+    def _scan(image):
+        # Imported on first use: loading libzbar (ctypes library lookup)
+        # is paid by warm-up, not by server startup
+        from pyzbar import pyzbar
+        with suppress_c_stderr():
+            return pyzbar.decode(image)
+    
+    @staticmethod
+    def _stage_raw(ctx):
+        """Original image, no preprocessing"""
+        return BarcodeDecoder._scan(ctx.image)
+    
+    @staticmethod
+    def _preprocessed(ctx):
+        """Preprocessed grayscale frame, computed once per image"""
+        return ctx.cached("preprocessed", lambda: BarcodeDecoder._preprocess_image(ctx.image))
+    
+    @staticmethod
+    def _stage_preprocessed(ctx):
+        """Denoised and contrast-enhanced grayscale"""
+        return BarcodeDecoder._scan(BarcodeDecoder._preprocessed(ctx))
+    
+    @staticmethod
+    def _locate_regions(image, max_dim=1024, max_regions=3, padding=0.1):
+        """Find candidate barcode regions on a downscaled copy.
+
+        Barcodes show up as areas with strong gradients in one direction, so
+        the difference between horizontal and vertical gradient magnitudes
+        is blurred, thresholded and closed into blobs. Returns up to
+        ``max_regions`` padded (x, y, w, h) boxes in full-resolution
+        coordinates, largest first.
+        """
         import cv2
-        import numpy as np  # noqa: F401 - imported for OpenCV operations
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+        import numpy as np
+        h, w = image.shape[:2]
+        scale = min(1.0, max_dim / float(max(h, w)))
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
         
-        # Apply bilateral filter to reduce noise while preserving edges
-        gray = cv2.bilateralFilter(gray, 9, 75, 75)
+        grad_x = cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=-1)
+        grad_y = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=-1)
+        gradient = cv2.convertScaleAbs(np.abs(np.abs(grad_x) - np.abs(grad_y)))
         
-        # Apply histogram equalization
-        gray = cv2.equalizeHist(gray)
+        blurred = cv2.blur(gradient, (9, 9))
+        _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 7))
+        closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        closed = cv2.erode(closed, None, iterations=4)
+        closed = cv2.dilate(closed, None, iterations=4)
         
-        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gray = clahe.apply(gray)
+        contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = 0.002 * small.shape[0] * small.shape[1]
+        contours = [c for c in contours if cv2.contourArea(c) >= min_area]
+        contours.sort(key=cv2.contourArea, reverse=True)
         
-        # Apply morphological operations to enhance barcode patterns
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        gray = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-        gray = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel)
+        regions = []
+        for contour in contours[:max_regions]:
+            x, y, bw, bh = cv2.boundingRect(contour)
+            pad_x, pad_y = int(bw * padding) + 2, int(bh * padding) + 2
+            x0 = max(0, int((x - pad_x) / scale))
+            y0 = max(0, int((y - pad_y) / scale))
+            x1 = min(w, int((x + bw + pad_x) / scale))
+            y1 = min(h, int((y + bh + pad_y) / scale))
+            regions.append((x0, y0, x1 - x0, y1 - y0))
+        return regions
+    
+    @staticmethod
+    def _stage_localized(ctx):
+        """Decode candidate regions of a large photo instead of the full frame"""
+        h, w = ctx.image.shape[:2]
+        if max(h, w) < LOCALIZE_MIN_DIM:
+            return []
+        
+        ctx.rois = BarcodeDecoder._locate_regions(ctx.image, max_regions=LOCALIZE_MAX_ROIS)
+        for x, y, rw, rh in ctx.rois:
+            crop = ctx.image[y:y + rh, x:x + rw]
+            decoded = BarcodeDecoder._scan(crop)
+            if not decoded:
+                decoded = BarcodeDecoder._scan(BarcodeDecoder._preprocess_image(crop))
+            if decoded:
+                return decoded
+        return []
+    
+    @staticmethod
+    def _stage_upscaled(ctx):
+        """2x upscale for small or low-resolution barcodes"""
+        import cv2
+        # Upscaling a large photo only burns memory (a 12MP frame becomes a
+        # 48MP buffer) without making its barcode any easier to read.
+        if max(ctx.image.shape[:2]) * 2 > UPSCALE_MAX_DIM:
+            return []
+        upscaled = cv2.resize(ctx.image, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        return BarcodeDecoder._scan(BarcodeDecoder._preprocess_image(upscaled))
+    
+    @staticmethod
+    def _stage_rotated(ctx):
+        """Preprocessed image rotated by 90, 180 and 270 degrees"""
+        import cv2
+        if ROTATION_MODE == "legacy":
+            # Original behaviour: interpolated rotation on the (w, h) canvas,
+            # re-running preprocessing for every angle.
+            for angle in [90, 180, 270]:
+                h, w = ctx.image.shape[:2]
+                center = (w // 2, h // 2)
+                matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+                rotated = cv2.warpAffine(ctx.image, matrix, (w, h))
+                decoded = BarcodeDecoder._scan(BarcodeDecoder._preprocess_image(rotated))
+                if decoded:
+                    return decoded
+            return []
         
-        return gray
+        # Right-angle rotations are pure transposes/flips: no interpolation,
+        # no cropping of non-square frames, and the preprocessed frame is
+        # shared instead of being rebuilt per angle.
+        gray = BarcodeDecoder._preprocessed(ctx)
+        for rotate_code in (cv2.ROTATE_90_COUNTERCLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_CLOCKWISE):
+            decoded = BarcodeDecoder._scan(cv2.rotate(gray, rotate_code))
+            if decoded:
+                return decoded
+        return []
+    
+    @staticmethod
+    def _dominant_angle(image, max_dim=512, min_coherence=0.3):
+        """Estimate the dominant gradient orientation in degrees.
+
+        Uses the structure tensor of a downscaled copy: for a 1D barcode the
+        gradients run across the bars, so rotating the image by the returned
+        angle lines the bars up with the scan lines. Returns None when the
+        orientation is too weak to be meaningful.
+        """
+        import cv2
+        import numpy as np
+        h, w = image.shape[:2]
+        scale = min(1.0, max_dim / float(max(h, w)))
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        gray = image.astype(np.float32)
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        sxx = float(np.sum(gx * gx))
+        syy = float(np.sum(gy * gy))
+        sxy = float(np.sum(gx * gy))
+        if sxx + syy <= 0:
+            return None
+        
+        coherence = np.hypot(sxx - syy, 2 * sxy) / (sxx + syy)
+        if coherence < min_coherence:
+            return None
+        return float(np.degrees(0.5 * np.arctan2(2 * sxy, sxx - syy)))
+    
+    @staticmethod
+    def _rotate_expanded(image, angle):
+        """Rotate by an arbitrary angle, growing the canvas so nothing is cropped"""
+        import cv2
+        h, w = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_w = int(h * sin + w * cos)
+        new_h = int(h * cos + w * sin)
+        matrix[0, 2] += new_w / 2 - w / 2
+        matrix[1, 2] += new_h / 2 - h / 2
+        return cv2.warpAffine(image, matrix, (new_w, new_h), borderMode=cv2.BORDER_REPLICATE)
+    
+    @staticmethod
+    def _stage_deskewed(ctx):
+        """Preprocessed image rotated to the detected barcode orientation"""
+        # Estimate on the unprocessed frame: CLAHE and morphology amplify
+        # background texture that would skew the orientation.
+        angle = BarcodeDecoder._dominant_angle(ctx.image)
+        # Axis-aligned codes are already covered by the raw/rotated stages.
+        if angle is None or min(abs(angle), 90 - abs(angle)) < 5:
+            return []
+        gray = BarcodeDecoder._preprocessed(ctx)
+        return BarcodeDecoder._scan(BarcodeDecoder._rotate_expanded(gray, angle))
+    
+    @staticmethod
+    def build_pipeline(order=None, adaptive=False):
+        """Build the barcode decode cascade.
+
+        Costs are rough per-stage estimates in milliseconds for a typical
+        phone photo and only matter until real timings are recorded.
+        """
+        stages = [
+            DecodeStage("localized", BarcodeDecoder._stage_localized, cost=40),
+            DecodeStage("raw", BarcodeDecoder._stage_raw, cost=15),
+            DecodeStage("preprocessed", BarcodeDecoder._stage_preprocessed, cost=60),
+            DecodeStage("upscaled", BarcodeDecoder._stage_upscaled, cost=250),
+            DecodeStage("rotated", BarcodeDecoder._stage_rotated, cost=30),
+            DecodeStage("deskewed", BarcodeDecoder._stage_deskewed, cost=25),
+        ]
+        return DecodePipeline(stages, order=order, adaptive=adaptive)
+    
+    @staticmethod
+    def get_pipeline():
+        """Process-wide pipeline configured from BARCODE_STAGES/BARCODE_ADAPTIVE_STAGES"""
+        if BarcodeDecoder._pipeline is None:
+            BarcodeDecoder._pipeline = BarcodeDecoder.build_pipeline(
+                order=BARCODE_STAGES, adaptive=BARCODE_ADAPTIVE_STAGES
+            )
+        return BarcodeDecoder._pipeline
     
     @staticmethod
-    def decode_barcode(image_path):
-        """Decode barcode from image file with multi-scale detection"""
+    def decode_barcode(source):
+        """Decode barcode from image bytes or file with multi-scale detection"""
         try:
             # Lazy import cv2 and numpy here so that the rest of the app can run
             # even if OpenCV/NumPy binaries are not correctly installed. If the
             # import fails, report a clear error instead of crashing the server.
             try:
-                import cv2  # type: ignore
+                import cv2  # type: ignore  # noqa: F401
                 import numpy as np  # type: ignore  # noqa: F401
             except Exception as import_err:
-                return {"error": f"OpenCV/NumPy import error: {import_err}"}
+                return DecodeFailure(f"OpenCV/NumPy import error: {import_err}")
 
-            image = Image.open(image_path)
-            # Convert RGBA to RGB if needed
-            if image.mode in ('RGBA', 'LA', 'P'):
-                rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                rgb_image.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = rgb_image
-            
-            # Convert PIL to OpenCV format
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            @contextlib.contextmanager
-            def suppress_c_stderr():
-                try:
-                    devnull_fd = os.open(os.devnull, os.O_RDWR)
-                    orig_stderr_fd = os.dup(2)
-                    os.dup2(devnull_fd, 2)
-                    try:
-                        yield
-                    finally:
-                        os.dup2(orig_stderr_fd, 2)
-                        os.close(orig_stderr_fd)
-                        os.close(devnull_fd)
-                except Exception:
-                    yield
-            
-            decoded_objects = []
-            
-            # Try original image
-            with suppress_c_stderr():
-                decoded_objects.extend(pyzbar.decode(cv_image))
-            
-            if not decoded_objects:
-                # Try preprocessed image
-                gray = BarcodeDecoder._preprocess_image(cv_image)
-                with suppress_c_stderr():
-                    decoded_objects.extend(pyzbar.decode(gray))
-            
-            if not decoded_objects:
-                # Try upscaled image
-                upscaled = cv2.resize(cv_image, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-                gray = BarcodeDecoder._preprocess_image(upscaled)
-                with suppress_c_stderr():
-                    decoded_objects.extend(pyzbar.decode(gray))
+            cv_image = decode_image(source)
             
-            if not decoded_objects:
-                # Try rotated images
-                for angle in [90, 180, 270]:
-                    h, w = cv_image.shape[:2]
-                    center = (w // 2, h // 2)
-                    matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-                    rotated = cv2.warpAffine(cv_image, matrix, (w, h))
-                    gray = BarcodeDecoder._preprocess_image(rotated)
-                    with suppress_c_stderr():
-                        decoded_objects.extend(pyzbar.decode(gray))
-                    if decoded_objects:
-                        break
+            ctx = BarcodeDecodeContext(cv_image)
+            decoded_objects, stage, timings = BarcodeDecoder.get_pipeline().run(ctx)
             
+            rois = [list(roi) for roi in ctx.rois] if ctx.rois is not None else None
             if not decoded_objects:
-                return {"error": "No barcode detected in image"}
+                return DecodeFailure(NO_BARCODE_ERROR, timings_ms=timings, rois=rois)
             
-            results = []
-            for obj in decoded_objects:
-                results.append({
-                    "type": obj.type,
-                    "data": obj.data.decode('utf-8'),
-                    "quality": "detected"
-                })
-            
-            return {"success": True, "barcodes": results}
+            barcodes = [BarcodeDecoder._barcode(obj) for obj in decoded_objects]
+            return BarcodeScan(barcodes, stage=stage, timings_ms=timings, rois=rois)
         
         except Exception as e:
-            return {"error": f"Barcode decode error: {str(e)}"}
-
-class PDF417Decoder:
-    """Decode PDF417 codes with AAMVA format parsing"""
+            return DecodeFailure(f"Barcode decode error: {str(e)}")
     
     @staticmethod
-    def format_date_readable(date_str):
-        """Convert MMDDYYYY to Month Day, Year format (e.g., October 17, 2002)"""
-        if not date_str or len(date_str) < 8:
-            return date_str
-        try:
-            month_num = int(date_str[0:2])
-            day = int(date_str[2:4])
-            year = date_str[4:8]
-            
-            months = ["", "January", "February", "March", "April", "May", "June",
-                     "July", "August", "September", "October", "November", "December"]
-            
-            month_name = months[month_num] if 1 <= month_num <= 12 else date_str[0:2]
-            return f"{month_name} {day}, {year}"
-        except:
-            return date_str
+    def _barcode(obj):
+        """``Barcode`` for a pyzbar result, weighted by its scan-line quality and outline"""
+        confidence = read_weight(getattr(obj, "quality", None), getattr(obj, "polygon", None))
+        return Barcode(obj.type, obj.data.decode('utf-8'), confidence=confidence)
     
     @staticmethod
-    def format_sex(sex_code):
-        """Convert sex code to Male/Female"""
-        if not sex_code:
-            return sex_code
-        try:
-            code = sex_code.strip()
-            if code == "1":
-                return "Male"
-            elif code == "2":
-                return "Female"
-            else:
-                return code
-        except:
-            return sex_code
-    
-    @staticmethod
-    def format_date(date_str):
-        """Convert MMDDYYYY to YYYY-MM-DD"""
-        if not date_str or len(date_str) < 8:
-            return date_str
+    def decode_barcode_consensus(source, min_votes=CONSENSUS_MIN_VOTES, min_share=CONSENSUS_MIN_SHARE):
+        """Decode a barcode by voting across the pipeline's preprocessing variants.
+        
+        Stages run in pipeline order and each one's reads are a vote (see
+        ``consensus.ConsensusVoter``); decoding stops at the stage where a
+        value reaches agreement. If no value does, the best reads so far are
+        returned with quality "detected" and their lower confidence.
+        """
         try:
-            month = date_str[0:2]
-            day = date_str[2:4]
-            year = date_str[4:8]
-            return f"{year}-{month}-{day}"
-        except:
-            return date_str
+            try:
+                import cv2  # type: ignore  # noqa: F401
+                import numpy as np  # type: ignore  # noqa: F401
+            except Exception as import_err:
+                return DecodeFailure(f"OpenCV/NumPy import error: {import_err}")
+            
+            ctx = BarcodeDecodeContext(decode_image(source))
+            voter = ConsensusVoter(min_votes, min_share)
+            timings = {}
+            stage = None
+            for name, objects, ms in BarcodeDecoder.get_pipeline().iter_run(ctx):
+                timings[name] = ms
+                voter.add([BarcodeDecoder._barcode(obj) for obj in objects])
+                if objects:
+                    stage = name
+                if voter.decided:
+                    break
+            
+            rois = [list(roi) for roi in ctx.rois] if ctx.rois is not None else None
+            candidates = voter.winners() or voter.leaders()
+            if not candidates:
+                return DecodeFailure(NO_BARCODE_ERROR, timings_ms=timings, rois=rois)
+            return BarcodeScan(voter.barcodes(candidates), stage=stage, timings_ms=timings, rois=rois)
+        
+        except Exception as e:
+            return DecodeFailure(f"Barcode decode error: {str(e)}")
+
+class PDF417Decoder:
+    """Decode PDF417 codes with AAMVA format parsing"""
     
-    @staticmethod
-    def format_height(height_str):
-        """Convert height format (e.g., '067 in' to '5\'7\"')"""
-        if not height_str:
-            return height_str
-        try:
-            # Remove 'in' and spaces
-            height_str = height_str.replace('in', '').strip()
-            # Convert to integer
-            inches = int(height_str)
-            feet = inches // 12
-            remaining_inches = inches % 12
-            return f"{feet}'{remaining_inches}\""
-        except:
-            return height_str
+    # Formatting helpers live in aamva.py next to the parser
+    format_date_readable = staticmethod(aamva.format_date_readable)
+    format_sex = staticmethod(aamva.format_sex)
+    format_date = staticmethod(aamva.format_date)
+    format_height = staticmethod(aamva.format_height)
     
     @staticmethod
     def extract_user_data(parsed_data):
-        """Extract and format user data in the required XML structure"""
-        try:
-            raw_fields = parsed_data.get("raw_fields", {})
-            
-            user_data = {
-                "last": raw_fields.get("DCS", ""),
-                "first": raw_fields.get("DAC", ""),
-                "dob": PDF417Decoder.format_date_readable(raw_fields.get("DBB", "")),
-                "eyes": raw_fields.get("DAY", ""),
-                "sex": PDF417Decoder.format_sex(raw_fields.get("DBC", "")),
-                "height": PDF417Decoder.format_height(raw_fields.get("DAU", "")),
-                "weight": raw_fields.get("DAW", ""),
-                "street": raw_fields.get("DAG", ""),
-                "city": raw_fields.get("DAI", ""),
-                "state": raw_fields.get("DAJ", ""),
-                "postal": raw_fields.get("DAK", ""),
-                "country": raw_fields.get("DCG", ""),
-                "id": raw_fields.get("DAQ", ""),
-                "issued": PDF417Decoder.format_date_readable(raw_fields.get("DBD", "")),
-                "expires": PDF417Decoder.format_date_readable(raw_fields.get("DBA", "")),
-            }
-            
-            return user_data
-        except Exception as e:
-            return {"error": str(e)}
+        """Formatted user data from ``{"raw_fields": ...}``"""
+        return aamva.user_data(parsed_data.get("raw_fields", {}))
     
     @staticmethod
     def parse_aamva_data(raw_data):
-        """Parse AAMVA format data from PDF417"""
-        try:
-            fields = {}
-            i = 0
-            
-            while i < len(raw_data):
-                if i + 2 < len(raw_data):
-                    code = raw_data[i:i+3]
-                    if code in AAMVA_FIELDS:
-                        i += 3
-                        # Find the next valid AAMVA code
-                        value_start = i
-                        while i < len(raw_data) - 2:
-                            potential_code = raw_data[i:i+3]
-                            if potential_code in AAMVA_FIELDS:
-                                break
-                            i += 1
-                        
-                        # Get value up to next valid code
-                        value = raw_data[value_start:i].strip()
-                        
-                        # This handles cases where invalid codes are concatenated
-                        if value:
-                            # Split by common delimiters to get just the main value
-                            value = value.split()[0]  # Take only first word/token
-                        
-                        fields[code] = value
-                    else:
-                        i += 1
-                else:
-                    i += 1
-            
-            user_data = PDF417Decoder.extract_user_data({"raw_fields": fields})
-            
-            # Structure the parsed data
-            structured_data = {
-                "personal": {},
-                "physical": {},
-                "address": {},
-                "document": {},
-                "raw_fields": fields,
-                "user": user_data  # Add formatted user data
+        """Parse AAMVA format data from PDF417 (see aamva.parse_fields)"""
+        fields, header = aamva.parse_fields(raw_data)
+        if header is not None:
+            header = {
+                "iin": header["iin"],
+                "version": header["version"],
+                "jurisdiction_version": header["jurisdiction_version"],
             }
-            
-            for code, value in fields.items():
-                if code == "DDD":
-                    continue
-                if code in AAMVA_FIELDS:
-                    field_info = AAMVA_FIELDS[code]
-                    category = field_info["category"]
-                    name = field_info["name"]
-                    structured_data[category][name] = value
-            
-            return structured_data
-        except Exception as e:
-            return {"error": f"AAMVA parsing error: {str(e)}"}
+        return AAMVARecord(fields, header)
     
     @staticmethod
-    def decode_pdf417(image_path):
-        """Decode PDF417 from image file"""
+    def decode_pdf417(source):
+        """Decode PDF417 from image bytes or file"""
         try:
             # Lazy import pdf417decoder and its cv2 dependency so that the
             # server can start even if those binaries are not correctly
@@ -307,22 +497,21 @@ class PDF417Decoder:
                 from pdf417decoder.Decoder import PDF417Decoder as PDF417DecoderLib  # type: ignore
                 import cv2  # type: ignore  # noqa: F401
             except Exception as import_err:
-                return {"error": f"PDF417/OpenCV import error: {import_err}"}
+                return DecodeFailure(f"PDF417/OpenCV import error: {import_err}")
 
-            image = Image.open(image_path)
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # pdf417decoder thresholds a grayscale copy of whatever it is
+            # given, so decode straight to grayscale and skip the RGB pass.
+            image = Image.fromarray(decode_image(source, grayscale=True))
             
             try:
                 decoder = PDF417DecoderLib(image)
-                cnt = decoder.decode()
+                with stage_timer("pdf417decoder"):
+                    cnt = decoder.decode()
                 
                 if cnt <= 0:
-                    return {"error": "No PDF417 code detected in image"}
+                    return DecodeFailure(NO_PDF417_ERROR)
                 
-                results = []
+                codes = []
                 for i in range(cnt):
                     try:
                         # Try to get barcode data as string
@@ -336,47 +525,31 @@ class PDF417Decoder:
                             text = ""
                     
                     if text.startswith("@") or "DL" in text:
-                        parsed_data = PDF417Decoder.parse_aamva_data(text)
-                        results.append({
-                            "data": text,
-                            "type": "PDF417",
-                            "format": "AAMVA",
-                            "parsed": parsed_data
-                        })
+                        codes.append(PDF417Code(text, PDF417Decoder.parse_aamva_data(text)))
                     else:
-                        results.append({
-                            "data": text,
-                            "type": "PDF417",
-                            "format": "raw"
-                        })
+                        codes.append(PDF417Code(text))
                 
-                return {"success": True, "pdf417_data": results}
+                return PDF417Scan(codes)
             
             except Exception as e:
-                return {"error": f"PDF417 decode error: {str(e)}"}
+                return DecodeFailure(f"PDF417 decode error: {str(e)}")
         
         except Exception as e:
-            return {"error": f"PDF417 processing error: {str(e)}"}
+            return DecodeFailure(f"PDF417 processing error: {str(e)}")
 
 class ImageProcessor:
     """Process card and checkbook images"""
     
     @staticmethod
-    def process_image(image_path, image_type="card"):
-        """Process and validate image"""
+    def process_image(source, image_type="card"):
+        """Process and validate image bytes or file (reads the header only)"""
         try:
-            image = Image.open(image_path)
-            
-            # Get image info
-            info = {
-                "type": image_type,
-                "format": image.format,
-                "size": image.size,
-                "mode": image.mode,
-                "path": str(image_path)
-            }
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                image = Image.open(io.BytesIO(source))
+            else:
+                image = Image.open(source)
             
-            return {"success": True, "image_info": info}
+            return ImageInfo(image_type, image.format, image.size, image.mode)
         
         except Exception as e:
-            return {"error": str(e)}
+            return DecodeFailure(str(e))
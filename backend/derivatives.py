@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from metrics import timed
+
+
+def content_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@timed("thumbnail")
+def render_thumbnail(source, output_path, max_dim=1200, quality=80):
+    """Write a JPEG copy of ``source`` (bytes or path) no larger than ``max_dim``.
+
+    JPEG sources are decoded directly at reduced scale (``Image.draft``), EXIF
+    orientation is applied and transparency is flattened onto white. The file
+    is written atomically, so a concurrent reader never sees a partial image.
+    Module-level so it can run in a worker process.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.draft("RGB", (max_dim, max_dim))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            image.save(tmp_path, "JPEG", quality=quality, optimize=True)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    return str(output_path)
+
+
+class DerivativeStore:
+    """Report-resolution JPEG thumbnails of uploaded images.
+
+    Thumbnails are keyed by the SHA-256 of the original upload plus the size
+    and quality settings, so the same image uploaded by several sessions (or
+    again after a reset) is only converted once. Files unused for ``ttl``
+    seconds are removed by ``prune``.
+    """
+
+    def __init__(self, root, max_dim=1200, quality=80, ttl=24 * 3600):
+        self.root = Path(root)
+        self.max_dim = max_dim
+        self.quality = quality
+        self.ttl = ttl
+
+    def path_for(self, digest):
+        name = f"{digest}_{self.max_dim}q{self.quality}.jpg"
+        return self.root / digest[:2] / name
+
+    def thumbnail_path(self, content):
+        """Where the thumbnail for ``content`` is (or will be) stored"""
+        return self.path_for(content_digest(content))
+
+    def prune(self):
+        """Remove thumbnails unused for ``ttl`` seconds; returns how many"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for path in self.root.glob("*/*.jpg"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def ensure_thumbnail(thumbnail_path, source, max_dim=1200, quality=80):
+    """Return ``thumbnail_path``, rendering it from ``source`` if missing.
+
+    An existing thumbnail has its modification time refreshed so pruning
+    keeps thumbnails that are still being embedded in reports.
+    """
+    path = Path(thumbnail_path)
+    try:
+        os.utime(path)
+        return str(path)
+    except OSError:
+        return render_thumbnail(source, path, max_dim=max_dim, quality=quality)
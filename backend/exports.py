@@ -0,0 +1,52 @@
+import zipfile
+from pathlib import PurePosixPath
+
+
+class ZipStream:
+    """Write a zip archive incrementally and hand out its bytes as it grows.
+
+    ``add`` and ``close`` return the bytes produced since the previous call,
+    so an archive of many files can be streamed to a client without holding
+    it in memory or writing it to disk. Members are stored uncompressed:
+    PDFs are already compressed, deflating them again costs time for little
+    gain.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._names = set()
+        # ZipFile treats an object without tell() as an unseekable stream and
+        # writes each member's sizes after its data.
+        self._zip = zipfile.ZipFile(self, mode="w", compression=zipfile.ZIP_STORED)
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def unique_name(self, filename):
+        """``filename``, or ``stem_2.ext``, ``stem_3.ext``... if already used"""
+        path = PurePosixPath(filename)
+        name, counter = filename, 1
+        while name in self._names:
+            counter += 1
+            name = f"{path.stem}_{counter}{path.suffix}"
+        self._names.add(name)
+        return name
+
+    def add(self, filename, content):
+        """Add a member (renamed if the name is taken); returns new archive bytes"""
+        self._zip.writestr(self.unique_name(filename), content)
+        return self._drain()
+
+    def close(self):
+        """Finish the archive; returns its remaining bytes"""
+        self._zip.close()
+        return self._drain()
@@ -0,0 +1,250 @@
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ReportJob:
+    """State of one background report generation"""
+
+    def __init__(self, session_id, filename, output_dir):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.filename = filename
+        # Stored under the job ID, so concurrent reports for people with the
+        # same name never overwrite each other.
+        self.output_path = os.path.join(str(output_dir), f"report_{self.id}.pdf")
+        self.status = "pending"
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    @classmethod
+    def restore(cls, job_id, session_id, filename, output_path, status, error, created, finished):
+        """Rebuild a job from its stored fields"""
+        job = cls.__new__(cls)
+        job.id = job_id
+        job.session_id = session_id
+        job.filename = filename
+        job.output_path = output_path
+        job.status = status
+        job.error = error
+        job.created = created
+        job.finished = finished
+        return job
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "created": self.created,
+            "finished": self.finished,
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class ReportJobStore:
+    """Bounded registry of report jobs, in process memory.
+
+    At most ``max_jobs`` jobs are kept; when full, the oldest finished job is
+    evicted and its report file deleted. Pending jobs are never evicted, so a
+    store full of pending jobs refuses new ones. Jobs are only visible to the
+    process that created them, so this store is only valid with a single
+    worker; ``SQLiteReportJobStore`` shares them between workers.
+    """
+
+    def __init__(self, max_jobs=100):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+
+    def create(self, session_id, filename, output_dir):
+        """Register a new job, or return None when no slot can be freed"""
+        while len(self._jobs) >= self.max_jobs:
+            if not self._evict_one():
+                return None
+        job = ReportJob(session_id, filename, output_dir)
+        self._jobs[job.id] = job
+        return job
+
+    def _evict_one(self):
+        for job_id, job in self._jobs.items():
+            if job.done:
+                del self._jobs[job_id]
+                self._remove_file(job)
+                return True
+        return False
+
+    @staticmethod
+    def _remove_file(job):
+        try:
+            os.remove(job.output_path)
+        except OSError:
+            pass
+
+    def get(self, job_id, session_id):
+        """Look up a job, only for the session that created it"""
+        job = self._jobs.get(job_id)
+        if job is None or job.session_id != session_id:
+            return None
+        return job
+
+    def finish(self, job, error=None):
+        job.status = "failed" if error else "done"
+        job.error = error
+        job.finished = time.time()
+
+    def discard_session(self, session_id):
+        """Forget every job of a session (its files go with the session directory)"""
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.session_id == session_id]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        pending = sum(1 for job in self._jobs.values() if not job.done)
+        return {"jobs": len(self._jobs), "pending": pending, "max_jobs": self.max_jobs}
+
+
+_JOB_COLUMNS = "id, session_id, filename, output_path, status, error, created, finished"
+
+
+class SQLiteReportJobStore(ReportJobStore):
+    """Report jobs stored in SQLite so several uvicorn workers can share them.
+
+    A job queued by one worker can be polled and downloaded through any
+    other; the report file itself is written to the session's upload
+    directory, which all workers share. Like ``SQLiteSessionStore``, each
+    operation opens its own connection, and job creation runs in an
+    immediate transaction so concurrent requests respect ``max_jobs``.
+
+    A job is rendered by the worker that queued it, so if that worker dies
+    the row would stay pending and hold a ``max_jobs`` slot forever. Jobs
+    still pending ``stale_after`` seconds after creation are marked failed.
+    """
+
+    STALE_ERROR = "Report job was abandoned before it finished"
+
+    def __init__(self, path, max_jobs=100, stale_after=900):
+        self.max_jobs = max_jobs
+        self.stale_after = stale_after
+        self.path = str(path)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_jobs ("
+                "id TEXT PRIMARY KEY, session_id TEXT NOT NULL, filename TEXT NOT NULL, "
+                "output_path TEXT NOT NULL, status TEXT NOT NULL, error TEXT, "
+                "created REAL NOT NULL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS report_jobs_session ON report_jobs (session_id)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _fail_stale(self, conn):
+        """Mark jobs pending for longer than ``stale_after`` as failed"""
+        if not self.stale_after:
+            return
+        now = time.time()
+        conn.execute(
+            "UPDATE report_jobs SET status = 'failed', error = ?, finished = ? "
+            "WHERE status = 'pending' AND created < ?",
+            (self.STALE_ERROR, now, now - self.stale_after),
+        )
+
+    def create(self, session_id, filename, output_dir):
+        job = ReportJob(session_id, filename, output_dir)
+        evicted = []
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._fail_stale(conn)
+            count = conn.execute("SELECT COUNT(*) FROM report_jobs").fetchone()[0]
+            while count >= self.max_jobs:
+                row = conn.execute(
+                    "SELECT id, output_path FROM report_jobs WHERE status IN ('done', 'failed') "
+                    "ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                conn.execute("DELETE FROM report_jobs WHERE id = ?", (row[0],))
+                evicted.append(row[1])
+                count -= 1
+            conn.execute(
+                f"INSERT INTO report_jobs ({_JOB_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.session_id, job.filename, job.output_path, job.status, job.error,
+                 job.created, job.finished),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        for output_path in evicted:
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+        return job
+
+    def get(self, job_id, session_id):
+        conn = self._connect()
+        try:
+            self._fail_stale(conn)
+            row = conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM report_jobs WHERE id = ? AND session_id = ?",
+                (job_id, session_id),
+            ).fetchone()
+        finally:
+            conn.close()
+        return ReportJob.restore(*row) if row else None
+
+    def finish(self, job, error=None):
+        super().finish(job, error)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                (job.status, job.error, job.finished, job.id),
+            )
+        finally:
+            conn.close()
+
+    def discard_session(self, session_id):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM report_jobs WHERE session_id = ?", (session_id,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            self._fail_stale(conn)
+            jobs, pending = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(status = 'pending'), 0) FROM report_jobs"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {"jobs": jobs, "pending": pending, "max_jobs": self.max_jobs}
+
+
+def create_report_job_store(backend, max_jobs, sqlite_path=None, stale_after=900):
+    """Build the job store matching the session backend"""
+    if backend == "memory":
+        return ReportJobStore(max_jobs=max_jobs)
+    if backend == "sqlite":
+        return SQLiteReportJobStore(sqlite_path, max_jobs=max_jobs, stale_after=stale_after)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -1,18 +1,104 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Body, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import hmac
+import importlib
 import os
 import shutil
+import time
 from pathlib import Path
+from typing import List, Optional
 import json
-from datetime import datetime
-from decoders import BarcodeDecoder, PDF417Decoder, ImageProcessor
-from pdf_generator import PDFReportGenerator
+from decoders import BarcodeDecoder, PDF417Decoder, ImageProcessor, NO_BARCODE_ERROR, NO_PDF417_ERROR
+from config import (
+    DECODE_WORKERS,
+    DECODE_MAX_QUEUE,
+    DECODE_TIMEOUT,
+    DECODE_USE_PROCESSES,
+    WARM_UP,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_DIR,
+    DECODER_CONFIG_VERSION,
+    PERSIST_UPLOADS,
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_TTL,
+    SESSION_CLEANUP_INTERVAL,
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_REQUEST_SIZE,
+    BATCH_MAX_TOTAL_BYTES,
+    MAX_FILE_SIZE,
+    BULK_MAX_SESSIONS,
+    BULK_EXPORT_TOKEN,
+    BULK_REPORT_TIMEOUT,
+    FRAME_MAX_BYTES,
+    BARCODE_CONSENSUS,
+    CONSENSUS_MIN_VOTES,
+    CONSENSUS_MIN_SHARE,
+    REPORT_WORKERS,
+    REPORT_MAX_QUEUE,
+    REPORT_TIMEOUT,
+    REPORT_MAX_JOBS,
+    REPORT_JOB_STALE_AFTER,
+    REPORT_CACHE_DIR,
+    REPORT_CACHE_SIZE,
+    REPORT_VERSION,
+    THUMBNAIL_DIR,
+    THUMBNAIL_MAX_DIM,
+    THUMBNAIL_QUALITY,
+    TRACE_BUFFER_SIZE,
+    TRACE_SLOW_MS,
+)
+from workers import WorkerPool, PoolError, PoolSaturatedError, LatestValue
+from jobs import create_report_job_store
+from pipeline import StageStats
+from cache import ResultCache, ReportCache, content_key
+from uploads import (
+    BodySizeLimit,
+    ByteBudget,
+    MULTIPART_OVERHEAD,
+    UploadRejected,
+    expand_archive,
+    ingest_upload,
+    inspect_image,
+    read_upload,
+)
+from models import BarcodeScan, PDF417Scan, ScanEntry, result_from_dict
+from derivatives import DerivativeStore, ensure_thumbnail
+from exports import ZipStream
+from consensus import ConsensusVoter, scan_reads
+from metrics import REGISTRY, CallbackMetric, DECODES, HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, timed
+from warmup import init_decode_worker, init_report_worker
+from tracing import TRACE_HEADER, TraceBuffer, start_trace, end_trace, new_trace_id, is_valid_trace_id
+from sessions import (
+    SESSION_HEADER,
+    SESSION_COOKIE,
+    SCAN_KINDS,
+    create_session_store,
+    is_valid_session_id,
+    new_session_id,
+    session_to_json,
+)
+from urllib.parse import quote
 import uuid
 
 app = FastAPI()
 
+# Reject oversized bodies before Starlette parses (and spools) them. Added
+# before CORS so the 413 still carries CORS headers.
+app.add_middleware(
+    BodySizeLimit,
+    max_size=MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+    limits={
+        "/upload/card": 2 * MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/batch/decode": BATCH_MAX_REQUEST_SIZE,
+    },
+)
+
 # CORS middleware for React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -20,284 +106,1055 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "ETag", SESSION_HEADER, TRACE_HEADER, "Server-Timing"],
 )
 
-# Create uploads directory
+# Uploads directory; session_upload_dir creates it on demand
 UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-# Session storage (in-memory for now)
-session_data = {
-    "barcode": None,
-    "pdf417": None,
-    "checkbook": None,
-    "card_front": None,
-    "card_back": None,
-    "timestamps": {}
-}
+
+# Decoding is CPU-bound, so it runs in a bounded worker pool instead of on
+# the event loop. Requests beyond the queue depth get a 503. Every worker
+# imports the decoder libraries and runs a tiny decode when it starts.
+decode_pool = WorkerPool(
+    "decode",
+    workers=DECODE_WORKERS,
+    max_queue=DECODE_MAX_QUEUE,
+    timeout=DECODE_TIMEOUT,
+    use_processes=DECODE_USE_PROCESSES,
+    initializer=init_decode_worker if WARM_UP else None,
+)
+
+# With BARCODE_CONSENSUS, barcode uploads vote across preprocessing variants
+# instead of taking the first stage that reads anything.
+if BARCODE_CONSENSUS:
+    decode_barcode_upload = BarcodeDecoder.decode_barcode_consensus
+else:
+    decode_barcode_upload = BarcodeDecoder.decode_barcode
+
+# ReportLab rendering gets its own pool so report generation never takes
+# decode workers away from scan uploads.
+report_pool = WorkerPool(
+    "report",
+    workers=REPORT_WORKERS,
+    max_queue=REPORT_MAX_QUEUE,
+    timeout=REPORT_TIMEOUT,
+    use_processes=DECODE_USE_PROCESSES,
+    initializer=init_report_worker if WARM_UP else None,
+)
+# Report jobs live next to the sessions, so with the sqlite backend any
+# worker can answer polls for a job another worker queued
+report_jobs = create_report_job_store(
+    SESSION_BACKEND, REPORT_MAX_JOBS, SESSION_DB_PATH, stale_after=REPORT_JOB_STALE_AFTER
+)
+report_cache = ReportCache(REPORT_CACHE_DIR, max_entries=REPORT_CACHE_SIZE) if REPORT_CACHE_DIR else None
+
+# Report-resolution thumbnails of checkbook/card uploads, shared between
+# sessions by content hash and pruned along with expired sessions
+derivative_store = DerivativeStore(
+    THUMBNAIL_DIR, max_dim=THUMBNAIL_MAX_DIM, quality=THUMBNAIL_QUALITY, ttl=SESSION_TTL
+)
+
+# Per-stage barcode decode statistics, aggregated from the timings each
+# worker reports back with its result.
+barcode_stage_stats = StageStats()
+
+# Clients often re-upload the same image, so decode results are cached by
+# content hash and decoder configuration.
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    ttl=RESULT_CACHE_TTL,
+    disk_dir=RESULT_CACHE_DIR,
+    to_json_data=lambda result: result.to_dict(),
+    from_json_data=result_from_dict,
+)
+decodes_in_flight = {}
+
+# Per-client sessions. Each client sends its session ID in the X-Session-ID
+# header (or the session_id cookie); uploads live in UPLOAD_DIR/<session_id>.
+session_store = create_session_store(SESSION_BACKEND, SESSION_TTL, SESSION_DB_PATH)
+session_cleanup_task = None
+
+# Startup warm-up state reported by /ready
+warmup = {"status": "pending" if WARM_UP else "ready", "seconds": None, "error": None}
+warmup_task = None
+
+# Recent requests slower than TRACE_SLOW_MS, with their phase breakdown
+slow_traces = TraceBuffer(max_entries=TRACE_BUFFER_SIZE, slow_ms=TRACE_SLOW_MS)
+
+# Prometheus metrics for state already tracked by the pools, caches and
+# stores; read when /metrics is scraped
+POOL_COUNTERS = ("submitted", "completed", "failed", "rejected", "timed_out")
+POOL_GAUGES = ("in_flight", "running", "queued", "waiting")
+
+def pool_metrics(fields):
+    return lambda: [
+        ((pool.name, field), pool.stats()[field])
+        for pool in (decode_pool, report_pool)
+        for field in fields
+    ]
+
+def stage_metrics(field):
+    return lambda: [((name,), entry[field]) for name, entry in barcode_stage_stats.snapshot().items()]
+
+REGISTRY.register(CallbackMetric(
+    "scanner_pool_jobs_total", "Worker pool jobs by outcome", "counter",
+    pool_metrics(POOL_COUNTERS), ("pool", "state"),
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_pool_jobs", "Worker pool jobs currently running, queued or waiting", "gauge",
+    pool_metrics(POOL_GAUGES), ("pool", "state"),
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_barcode_stage_attempts_total", "Barcode pipeline stage attempts", "counter",
+    stage_metrics("attempts"), ("stage",),
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_barcode_stage_hits_total", "Barcode pipeline stage attempts that decoded the image", "counter",
+    stage_metrics("hits"), ("stage",),
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_result_cache_lookups_total", "Decode result cache lookups by outcome", "counter",
+    lambda: [((field,), result_cache.stats()[field]) for field in ("hits", "disk_hits", "misses")],
+    ("outcome",),
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_sessions_active", "Sessions in the session store", "gauge",
+    lambda: [((), session_store.count())],
+))
+REGISTRY.register(CallbackMetric(
+    "scanner_report_jobs", "Report jobs kept, and those still pending", "gauge",
+    lambda: [((field,), report_jobs.stats()[field]) for field in ("jobs", "pending")],
+    ("state",),
+))
+
+@app.middleware("http")
+async def attach_session(request: Request, call_next):
+    """Resolve the client's session ID, issuing a new one if needed"""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not is_valid_session_id(session_id):
+        session_id = new_session_id()
+    request.state.session_id = session_id
+    
+    response = await call_next(request)
+    response.headers[SESSION_HEADER] = session_id
+    if request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(
+            SESSION_COOKIE, session_id, max_age=int(SESSION_TTL), httponly=True, samesite="lax"
+        )
+    return response
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Trace each request and record its latency by route template.
+    
+    The trace's phases go back in a Server-Timing header, with the trace ID
+    in X-Trace-ID (a valid client-supplied ID is kept). Phases of a
+    streamed body happen after the headers are sent and are not included.
+    """
+    trace_id = request.headers.get(TRACE_HEADER)
+    if not is_valid_trace_id(trace_id):
+        trace_id = new_trace_id()
+    trace, token = start_trace(trace_id, request.method, request.url.path)
+    HTTP_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        trace.finish(status)
+        response.headers[TRACE_HEADER] = trace_id
+        response.headers["Server-Timing"] = trace.server_timing()
+        return response
+    finally:
+        end_trace(token)
+        HTTP_IN_FLIGHT.dec()
+        if trace.duration is None:
+            trace.finish(status)
+        slow_traces.add(trace)
+        # The template (/reports/{job_id}), not the path, keeps the number
+        # of label values bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status),
+        )
+
+def session_upload_dir(session_id):
+    """Upload directory for one session, created on demand"""
+    path = UPLOAD_DIR / session_id
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def purge_expired_sessions():
+    """Drop idle sessions and their uploads; returns the removed session IDs"""
+    expired = session_store.purge_expired()
+    for session_id in expired:
+        shutil.rmtree(UPLOAD_DIR / session_id, ignore_errors=True)
+    return expired
+
+async def expire_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_CLEANUP_INTERVAL)
+        try:
+            for session_id in await run_in_threadpool(purge_expired_sessions):
+                await run_in_threadpool(report_jobs.discard_session, session_id)
+            await run_in_threadpool(derivative_store.prune)
+        except Exception:
+            # A failed sweep (e.g. a locked SQLite file) is retried next time.
+            pass
+
+async def warm_up():
+    """Start every worker so the first requests do not pay for it.
+    
+    ReportLab is imported here first (report filenames need it), before
+    any worker process is forked, so forked workers inherit it.
+    """
+    warmup["status"] = "warming_up"
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(importlib.import_module, "pdf_generator")
+        await asyncio.gather(decode_pool.warm_up(), report_pool.warm_up())
+    except Exception as e:
+        warmup["status"] = "failed"
+        warmup["error"] = str(e) or e.__class__.__name__
+        return
+    warmup["status"] = "ready"
+    warmup["seconds"] = round(time.perf_counter() - started, 3)
+
+@app.on_event("startup")
+async def start_session_cleanup():
+    global session_cleanup_task
+    session_cleanup_task = asyncio.create_task(expire_sessions_periodically())
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Runs in the background: the server accepts connections (and answers
+    # /health) right away, while /ready waits for the warm-up
+    global warmup_task
+    if WARM_UP:
+        warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    if session_cleanup_task is not None:
+        session_cleanup_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    decode_pool.shutdown(wait=False)
+    report_pool.shutdown(wait=False)
+
+def pool_error_response(error):
+    """Map a worker pool error onto an HTTP error response"""
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"error": str(error)},
+        headers=error.headers,
+    )
+
+async def cached_decode(kind, decode, content, wait=False):
+    """Decode an upload through the result cache.
+
+    Returns ``(result, cached)``. Only successful decodes and definitive
+    "nothing detected" misses are cached; runtime errors are retried.
+    With ``wait`` set, a full decode pool delays the job instead of
+    rejecting it.
+    """
+    key = content_key(content, kind, DECODER_CONFIG_VERSION)
+    result = await result_cache.get_async(key)
+    if result is not None:
+        count_decode(kind, result, True)
+        return result, True
+    
+    # Identical uploads arriving together (retries, duplicate batch items)
+    # share one decode instead of all missing the cache at once.
+    pending = decodes_in_flight.get(key)
+    if pending is not None:
+        result = await asyncio.shield(pending)
+        count_decode(kind, result, True)
+        return result, True
+    
+    task = asyncio.ensure_future(decode_pool.submit(decode, content, wait=wait))
+    decodes_in_flight[key] = task
+    try:
+        result = await asyncio.shield(task)
+    finally:
+        if decodes_in_flight.get(key) is task:
+            del decodes_in_flight[key]
+    
+    count_decode(kind, result, False)
+    if result.ok or result.error in (NO_BARCODE_ERROR, NO_PDF417_ERROR):
+        await result_cache.put_async(key, result)
+    return result, False
+
+def count_decode(kind, result, cached):
+    if result.ok:
+        outcome = "success"
+    elif result.error in (NO_BARCODE_ERROR, NO_PDF417_ERROR):
+        outcome = "miss"
+    else:
+        outcome = "error"
+    DECODES.inc(kind, outcome, "true" if cached else "false")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the startup warm-up has finished, 503 until then"""
+    if warmup["status"] != "ready":
+        return JSONResponse(status_code=503, content=warmup, headers={"Retry-After": "1"})
+    return warmup
+
+@app.get("/stats")
+async def get_stats():
+    """Worker pool, decode stage, cache, session and report job statistics"""
+    return {
+        "decode_pool": decode_pool.stats(),
+        "report_pool": report_pool.stats(),
+        "report_jobs": await run_in_threadpool(report_jobs.stats),
+        "report_cache": report_cache.stats() if report_cache else None,
+        "barcode_stages": barcode_stage_stats.snapshot(),
+        "result_cache": result_cache.stats(),
+        "sessions": {"backend": SESSION_BACKEND, "active": await run_in_threadpool(session_store.count)},
+    }
+
+@app.get("/traces")
+async def get_slow_traces(limit: int = 20):
+    """Recent requests slower than TRACE_SLOW_MS, newest first"""
+    return {
+        "slow_ms": slow_traces.slow_ms,
+        "traces": [trace.to_dict() for trace in slow_traces.recent(max(0, limit))],
+    }
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Phase breakdown of one slow request, by the ID from its X-Trace-ID header"""
+    trace = slow_traces.get(trace_id)
+    if trace is None:
+        return JSONResponse(status_code=404, content={"error": "Trace not found (only slow requests are kept)"})
+    return trace.to_dict()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency histograms and counters in the Prometheus text format"""
+    # Gauges such as active sessions query the (possibly SQLite) stores
+    body = await run_in_threadpool(REGISTRY.render)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value covers ``etag``"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
 @app.get("/session")
-async def get_session():
-    """Get current session data"""
-    return session_data
+async def get_session(request: Request):
+    """Get current session data.
+    
+    The body comes pre-serialized from the session store; a poll carrying
+    the current ETag in If-None-Match gets an empty 304.
+    """
+    body, etag = await run_in_threadpool(session_store.get_json, request.state.session_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.post("/reset")
-async def reset_session():
-    """Reset all session data and clear uploads"""
-    global session_data
+async def reset_session(request: Request):
+    """Reset this client's session data and clear its uploads"""
+    session_id = request.state.session_id
     
-    # Clear upload directory and ensure it exists afterwards
-    if UPLOAD_DIR.exists():
-        shutil.rmtree(UPLOAD_DIR)
+    # Clear this session's uploads and ensure the upload root still exists
+    shutil.rmtree(UPLOAD_DIR / session_id, ignore_errors=True)
     UPLOAD_DIR.mkdir(exist_ok=True)
     
     # Reset session data
-    session_data = {
-        "barcode": None,
-        "pdf417": None,
-        "checkbook": None,
-        "card_front": None,
-        "card_back": None,
-        "timestamps": {}
-    }
+    await run_in_threadpool(session_store.reset, session_id)
+    await run_in_threadpool(report_jobs.discard_session, session_id)
     
     return {"message": "Session reset successfully"}
 
+@timed("upload_write")
+def save_upload(file_path, content):
+    """Write an upload to disk"""
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+@timed("session_update")
+def store_entry(session_id, kind, entry):
+    """Save a scan entry in the client's session"""
+    return session_store.set_item(session_id, kind, entry)
+
 @app.post("/upload/barcode")
-async def upload_barcode(file: UploadFile = File(...)):
+async def upload_barcode(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload and decode barcode image"""
     try:
-        # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"barcode_{file_id}.png"
+        content, extension = await ingest_upload(file)
         
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Decode barcode straight from the upload bytes
+        result, cached = await cached_decode("barcode", decode_barcode_upload, content)
+        if not cached:
+            barcode_stage_stats.record_timings(result.timings_ms or {}, result.stage)
         
-        # Decode barcode
-        result = BarcodeDecoder.decode_barcode(file_path)
+        if not result.ok:
+            return JSONResponse(status_code=400, content=result.to_dict())
         
-        if "error" in result:
-            return JSONResponse(status_code=400, content=result)
+        # Optionally keep the original, written after the response is sent
+        file_path = None
+        if PERSIST_UPLOADS:
+            upload_dir = session_upload_dir(request.state.session_id)
+            file_path = upload_dir / f"barcode_{uuid.uuid4()}{extension}"
+            background_tasks.add_task(save_upload, file_path, content)
         
         # Store in session
-        session_data["barcode"] = {
-            **result,
-            "path": str(file_path),
-            "filename": file.filename
-        }
-        session_data["timestamps"]["barcode"] = datetime.now().isoformat()
+        entry = await run_in_threadpool(store_entry, request.state.session_id, "barcode", ScanEntry(
+            result, str(file_path) if file_path else None, file.filename
+        ))
         
-        return {"success": True, "data": session_data["barcode"]}
+        return {"success": True, "data": entry.to_dict(), "cached": cached}
     
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except PoolError as e:
+        return pool_error_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/upload/pdf417")
-async def upload_pdf417(file: UploadFile = File(...)):
+async def upload_pdf417(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload and decode PDF417 image"""
     try:
-        # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"pdf417_{file_id}.png"
+        content, extension = await ingest_upload(file)
         
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Decode PDF417 straight from the upload bytes
+        result, cached = await cached_decode("pdf417", PDF417Decoder.decode_pdf417, content)
         
-        # Decode PDF417
-        result = PDF417Decoder.decode_pdf417(file_path)
+        if not result.ok:
+            return JSONResponse(status_code=400, content=result.to_dict())
         
-        if "error" in result:
-            return JSONResponse(status_code=400, content=result)
+        # Optionally keep the original, written after the response is sent
+        file_path = None
+        if PERSIST_UPLOADS:
+            upload_dir = session_upload_dir(request.state.session_id)
+            file_path = upload_dir / f"pdf417_{uuid.uuid4()}{extension}"
+            background_tasks.add_task(save_upload, file_path, content)
         
         # Store in session
-        session_data["pdf417"] = {
-            **result,
-            "path": str(file_path),
-            "filename": file.filename
-        }
-        session_data["timestamps"]["pdf417"] = datetime.now().isoformat()
+        entry = await run_in_threadpool(store_entry, request.state.session_id, "pdf417", ScanEntry(
+            result, str(file_path) if file_path else None, file.filename
+        ))
         
-        return {"success": True, "data": session_data["pdf417"]}
+        return {"success": True, "data": entry.to_dict(), "cached": cached}
     
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except PoolError as e:
+        return pool_error_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+async def render_upload_thumbnail(thumbnail_path, content):
+    """Render a report thumbnail after the upload response has been sent.
+    
+    Failures are ignored: the report generator renders missing thumbnails
+    itself, or falls back to the original image.
+    """
+    try:
+        await report_pool.submit(
+            ensure_thumbnail, str(thumbnail_path), content, THUMBNAIL_MAX_DIM, THUMBNAIL_QUALITY,
+            wait=True,
+        )
+    except Exception:
+        pass
+
+async def store_image_upload(upload, kind, session_id, background_tasks):
+    """Validate and save a checkbook/card image, returning its session entry
+    (or the ``DecodeFailure`` if the image cannot be read).
+
+    Only the image header is parsed, so this runs inline rather than paying
+    to ship the whole upload to a decode worker. The file is always written
+    because reports embed it; the write happens off the event loop and the
+    report thumbnail is rendered in the background.
+    """
+    content, extension = await ingest_upload(upload)
+    
+    result = ImageProcessor.process_image(content, kind)
+    if not result.ok:
+        return result
+    
+    file_path = session_upload_dir(session_id) / f"{kind}_{uuid.uuid4()}{extension}"
+    await run_in_threadpool(save_upload, file_path, content)
+    
+    thumbnail_path = derivative_store.thumbnail_path(content)
+    background_tasks.add_task(render_upload_thumbnail, thumbnail_path, content)
+    
+    return await run_in_threadpool(store_entry, session_id, kind, ScanEntry(
+        result, str(file_path), upload.filename, str(thumbnail_path)
+    ))
+
 @app.post("/upload/checkbook")
-async def upload_checkbook(file: UploadFile = File(...)):
+async def upload_checkbook(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload checkbook scan"""
     try:
-        # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"checkbook_{file_id}.png"
+        entry = await store_image_upload(file, "checkbook", request.state.session_id, background_tasks)
         
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        if not entry.ok:
+            return JSONResponse(status_code=400, content=entry.to_dict())
         
-        # Process image
-        result = ImageProcessor.process_image(file_path, "checkbook")
-        
-        if "error" in result:
-            return JSONResponse(status_code=400, content=result)
-        
-        # Store in session
-        session_data["checkbook"] = {
-            **result.get("image_info", {}),
-            "path": str(file_path),
-            "filename": file.filename
-        }
-        session_data["timestamps"]["checkbook"] = datetime.now().isoformat()
-        
-        return {"success": True, "data": session_data["checkbook"]}
+        return {"success": True, "data": entry.to_dict()}
     
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/upload/card")
-async def upload_card(front: UploadFile = File(None), back: UploadFile = File(None)):
+async def upload_card(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    front: UploadFile = File(None),
+    back: UploadFile = File(None),
+):
     """Upload card front and/or back"""
     try:
         results = {}
         
         # Process front
         if front:
-            file_id = str(uuid.uuid4())
-            file_path = UPLOAD_DIR / f"card_front_{file_id}.png"
-            
-            with open(file_path, "wb") as f:
-                content = await front.read()
-                f.write(content)
-            
-            result = ImageProcessor.process_image(file_path, "card_front")
-            
-            if "error" not in result:
-                session_data["card_front"] = {
-                    **result.get("image_info", {}),
-                    "path": str(file_path),
-                    "filename": front.filename
-                }
-                session_data["timestamps"]["card_front"] = datetime.now().isoformat()
-                results["front"] = session_data["card_front"]
+            entry = await store_image_upload(front, "card_front", request.state.session_id, background_tasks)
+            if entry.ok:
+                results["front"] = entry.to_dict()
         
         # Process back
         if back:
-            file_id = str(uuid.uuid4())
-            file_path = UPLOAD_DIR / f"card_back_{file_id}.png"
-            
-            with open(file_path, "wb") as f:
-                content = await back.read()
-                f.write(content)
-            
-            result = ImageProcessor.process_image(file_path, "card_back")
-            
-            if "error" not in result:
-                session_data["card_back"] = {
-                    **result.get("image_info", {}),
-                    "path": str(file_path),
-                    "filename": back.filename
-                }
-                session_data["timestamps"]["card_back"] = datetime.now().isoformat()
-                results["back"] = session_data["card_back"]
+            entry = await store_image_upload(back, "card_back", request.state.session_id, background_tasks)
+            if entry.ok:
+                results["back"] = entry.to_dict()
         
         if not results:
             return JSONResponse(status_code=400, content={"error": "No files provided"})
         
         return {"success": True, "data": results}
     
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-@app.get("/generate-pdf")
-async def generate_pdf():
-    """Generate and download combined PDF report"""
+BATCH_DECODERS = {
+    "barcode": decode_barcode_upload,
+    "pdf417": PDF417Decoder.decode_pdf417,
+}
+
+async def decode_batch_item(index, name, content, kind):
+    """Decode one batch image; errors are reported in the item, not raised"""
+    started = time.perf_counter()
+    item = {"index": index, "name": name}
     try:
-        filename = "scan_report.pdf"
-        
-        if session_data.get("pdf417"):
-            pdf417_data = session_data["pdf417"]
-            for data in pdf417_data.get("pdf417_data", []):
-                if data.get("parsed") and data["parsed"].get("user"):
-                    user = data["parsed"]["user"]
-                    # Use original casing from PDF417, trim outer spaces and
-                    # replace inner spaces with underscores so the filename is
-                    # Firstname_Lastname.pdf.
-                    first_name = user.get("first", "").strip().replace(" ", "_")
-                    last_name = user.get("last", "").strip().replace(" ", "_")
-                    
-                    if first_name and last_name:
-                        filename = f"{first_name}_{last_name}.pdf"
-                        break
-        
-        output_path = UPLOAD_DIR / filename
-        generator = PDFReportGenerator(str(output_path))
-        result = generator.generate_report(session_data)
+        if content is None:
+            raise UploadRejected("File too large", status_code=413)
+        inspect_image(content)
         
-        if "error" in result:
-            return JSONResponse(status_code=500, content=result)
-        
-        return FileResponse(
-            path=output_path,
-            filename=filename,
-            media_type="application/pdf"
+        # "auto" tries PDF417 (the common case for ID scans) then 1D barcodes
+        kinds = ("pdf417", "barcode") if kind == "auto" else (kind,)
+        for item_kind in kinds:
+            result, cached = await cached_decode(
+                item_kind, BATCH_DECODERS[item_kind], content, wait=True
+            )
+            if item_kind == "barcode" and not cached:
+                barcode_stage_stats.record_timings(result.timings_ms or {}, result.stage)
+            if result.ok:
+                break
+        item.update({"kind": item_kind, "cached": cached, **result.to_dict()})
+    except (UploadRejected, PoolError) as e:
+        item["error"] = str(e)
+    except Exception as e:
+        item["error"] = f"Batch item error: {e}"
+    
+    item["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return item
+
+@app.post("/batch/decode")
+async def batch_decode(files: List[UploadFile] = File(...), kind: str = Form("auto")):
+    """Decode many images (or zip/tar archives of images) in one request.
+
+    Items are decoded concurrently on the decode pool and streamed back as
+    NDJSON in completion order, followed by a summary line. Batch results
+    are not stored in the session.
+    """
+    if kind not in ("auto", *BATCH_DECODERS):
+        return JSONResponse(
+            status_code=400,
+            content={"error": "kind must be one of: auto, barcode, pdf417"},
         )
     
+    # Read everything up front: the uploaded files are closed once this
+    # handler returns, before the response body is streamed.
+    items = []
+    budget = ByteBudget(BATCH_MAX_TOTAL_BYTES)
+    try:
+        for upload in files:
+            content = await read_upload(upload)
+            members = expand_archive(upload.filename, content, budget=budget)
+            if members is None:
+                budget.take(len(content))
+                members = [(upload.filename, content)]
+            items.extend(members)
+            if len(items) > BATCH_MAX_ITEMS:
+                raise UploadRejected(
+                    f"Too many files: limit is {BATCH_MAX_ITEMS} per batch", status_code=413
+                )
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    
+    async def stream_results():
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(decode_batch_item(index, name, content, kind))
+            for index, (name, content) in enumerate(items)
+        ]
+        decoded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                decoded += 0 if "error" in item else 1
+                yield json.dumps(item) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        total_ms = (time.perf_counter() - started) * 1000.0
+        yield json.dumps({"summary": {
+            "items": len(items),
+            "decoded": decoded,
+            "failed": len(items) - decoded,
+            "total_ms": round(total_ms, 3),
+            "avg_item_ms": round(total_ms / len(items), 3) if items else 0.0,
+            "items_per_second": round(len(items) / (total_ms / 1000.0), 3) if total_ms else 0.0,
+        }}) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def websocket_session_id(websocket):
+    """Session ID of a WebSocket client, or None.
+    
+    Browsers cannot set headers on WebSocket requests, so besides the
+    header and cookie a ``session_id`` query parameter is accepted.
+    """
+    session_id = (
+        websocket.headers.get(SESSION_HEADER)
+        or websocket.query_params.get("session_id")
+        or websocket.cookies.get(SESSION_COOKIE)
+    )
+    return session_id if is_valid_session_id(session_id) else None
+
+# Camera frames are decoded with the first-hit pipeline; agreement comes
+# from voting across frames instead.
+FRAME_DECODERS = {
+    "barcode": BarcodeDecoder.decode_barcode,
+    "pdf417": PDF417Decoder.decode_pdf417,
+}
+
+async def decode_frame(kind, content):
+    """Decode one camera frame, or return None if it was skipped.
+    
+    Frames bypass the result cache (no two are alike) and are never queued:
+    when the decode pool is full the frame is dropped, and the next one is
+    decoded instead.
+    """
+    if len(content) > FRAME_MAX_BYTES:
+        raise UploadRejected(f"Frame too large: limit is {FRAME_MAX_BYTES} bytes", status_code=413)
+    inspect_image(content)
+    try:
+        result = await decode_pool.submit(FRAME_DECODERS[kind], content)
+    except PoolSaturatedError:
+        return None
+    if kind == "barcode":
+        barcode_stage_stats.record_timings(result.timings_ms or {}, result.stage)
+    return result
+
+def frame_consensus_result(result, voter):
+    """The agreed-on values, in the shape of the last frame's ``result``"""
+    winners = voter.winners()
+    if isinstance(result, BarcodeScan):
+        return BarcodeScan(voter.barcodes(winners), stage=result.stage, timings_ms=result.timings_ms)
+    return PDF417Scan([candidate.item for candidate in winners])
+
+@app.websocket("/ws/scan")
+async def scan_frames(websocket: WebSocket, kind: str = "pdf417", votes: int = CONSENSUS_MIN_VOTES):
+    """Decode a stream of camera frames until enough of them agree.
+    
+    The client sends frames as binary messages (PNG/JPEG). Frames arriving
+    while one is being decoded replace each other, so only the newest is
+    decoded next and latency never builds up. Reads are voted on across
+    frames (see ``consensus.ConsensusVoter``): once a value has been read
+    from ``votes`` frames and clearly outweighs any conflicting reads it is
+    stored in the session, sent as ``{"type": "result"}`` and the socket is
+    closed. Until then every decoded frame gets a ``no_match`` or
+    ``candidate`` reply.
+    """
+    await websocket.accept()
+    if kind not in FRAME_DECODERS:
+        await websocket.send_json({"type": "error", "error": "kind must be one of: barcode, pdf417"})
+        await websocket.close(code=1008)
+        return
+    
+    session_id = websocket_session_id(websocket)
+    frames = LatestValue()
+    voter = ConsensusVoter(votes, CONSENSUS_MIN_SHARE)
+    
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    frames.put(message["bytes"])
+        finally:
+            frames.close()
+    
+    receiver = asyncio.ensure_future(receive_frames())
+    skipped = 0
+    try:
+        while True:
+            content = await frames.get()
+            if content is None:
+                return
+            
+            try:
+                result = await decode_frame(kind, content)
+            except (UploadRejected, PoolError) as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+                continue
+            if result is None:
+                skipped += 1
+                continue
+            
+            voter.add(scan_reads(result) if result.ok else ())
+            progress = {"frames": voter.observations, "dropped": frames.dropped + skipped}
+            if not result.ok:
+                await websocket.send_json({"type": "no_match", **progress})
+                continue
+            if not voter.decided:
+                leader = max(voter.leaders(), key=lambda candidate: candidate.votes)
+                await websocket.send_json({
+                    "type": "candidate", "votes": leader.votes, "needed": voter.min_votes, **progress,
+                })
+                continue
+            
+            entry = ScanEntry(frame_consensus_result(result, voter), None, "camera")
+            if session_id is not None:
+                await run_in_threadpool(store_entry, session_id, kind, entry)
+            await websocket.send_json({"type": "result", "kind": kind, "data": entry.to_dict(), **progress})
+            await websocket.close()
+            return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+def select_session_items(session_data, selected_items=None):
+    """Session data limited to the selected scan types (all when None)"""
+    if selected_items is None:
+        return session_data
+    return {
+        "barcode": session_data["barcode"] if selected_items.get("barcode") else None,
+        "pdf417": session_data["pdf417"] if selected_items.get("pdf417") else None,
+        "checkbook": session_data["checkbook"] if selected_items.get("checkbook") else None,
+        "card_front": session_data["card_front"] if selected_items.get("card_front") else None,
+        "card_back": session_data["card_back"] if selected_items.get("card_back") else None,
+        "timestamps": session_data["timestamps"]
+    }
+
+REPORT_CHUNK_SIZE = 64 * 1024
+
+def content_disposition(filename):
+    """Attachment header value, with an RFC 5987 variant for non-ASCII names"""
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename*=utf-8''{quoted}"
+
+def pdf_stream_response(content, filename):
+    """Stream an in-memory PDF as a download"""
+    def chunks():
+        for start in range(0, len(content), REPORT_CHUNK_SIZE):
+            yield content[start:start + REPORT_CHUNK_SIZE]
+    
+    return StreamingResponse(
+        chunks(),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": content_disposition(filename),
+            "Content-Length": str(len(content)),
+        },
+    )
+
+async def report_download(report_data):
+    """Render a report on the report pool and stream it as a download.
+    
+    Reports are rendered into memory, never into the uploads directory.
+    With REPORT_CACHE_DIR set, a report for the same selection of the same
+    scans is served from the cache instead of being rendered again.
+    """
+    # pdf_generator (ReportLab) is imported on first use to keep startup
+    # fast; warm-up imports it in the background (see warm_up)
+    from pdf_generator import PDFReportGenerator, render_report_bytes
+    
+    filename = PDFReportGenerator.report_filename(report_data)
+    
+    key = None
+    if report_cache is not None:
+        key = ReportCache.key(session_to_json(report_data), REPORT_VERSION)
+        content = await run_in_threadpool(report_cache.get, key)
+        if content is not None:
+            return pdf_stream_response(content, filename)
+    
+    result = await report_pool.submit(render_report_bytes, report_data)
+    if "error" in result:
+        return JSONResponse(status_code=500, content=result)
+    
+    content = result["content"]
+    if key is not None:
+        await run_in_threadpool(report_cache.put, key, content)
+    return pdf_stream_response(content, filename)
+
+@app.get("/generate-pdf")
+async def generate_pdf(request: Request):
+    """Generate and download combined PDF report"""
+    try:
+        session_data = await run_in_threadpool(session_store.get, request.state.session_id)
+        return await report_download(session_data)
+    
+    except PoolError as e:
+        return pool_error_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/generate-pdf-selective")
-async def generate_pdf_selective(selected_items: dict):
+async def generate_pdf_selective(request: Request, selected_items: dict):
     """Generate PDF with only selected scan types"""
     try:
-        # Filter session data based on selected items
-        filtered_data = {
-            "barcode": session_data["barcode"] if selected_items.get("barcode") else None,
-            "pdf417": session_data["pdf417"] if selected_items.get("pdf417") else None,
-            "checkbook": session_data["checkbook"] if selected_items.get("checkbook") else None,
-            "card_front": session_data["card_front"] if selected_items.get("card_front") else None,
-            "card_back": session_data["card_back"] if selected_items.get("card_back") else None,
-            "timestamps": session_data["timestamps"]
-        }
-        
-        filename = "scan_report.pdf"
-        
-        if filtered_data.get("pdf417"):
-            pdf417_data = filtered_data["pdf417"]
-            for data in pdf417_data.get("pdf417_data", []):
-                if data.get("parsed") and data["parsed"].get("user"):
-                    user = data["parsed"]["user"]
-                    # Same filename logic for selective export
-                    first_name = user.get("first", "").strip().replace(" ", "_")
-                    last_name = user.get("last", "").strip().replace(" ", "_")
-                    
-                    if first_name and last_name:
-                        filename = f"{first_name}_{last_name}.pdf"
-                        break
-        
-        output_path = UPLOAD_DIR / filename
-        generator = PDFReportGenerator(str(output_path))
-        result = generator.generate_report(filtered_data)
-        
-        if "error" in result:
-            return JSONResponse(status_code=500, content=result)
-        
-        return FileResponse(
-            path=output_path,
-            filename=filename,
-            media_type="application/pdf"
-        )
+        session_data = await run_in_threadpool(session_store.get, request.state.session_id)
+        filtered_data = select_session_items(session_data, selected_items)
+        return await report_download(filtered_data)
     
+    except PoolError as e:
+        return pool_error_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+def load_bulk_subjects(session_ids, selected_items=None):
+    """``(session_id, report_data)`` of every listed session that has scans"""
+    subjects = []
+    for session_id in dict.fromkeys(session_ids):
+        report_data = select_session_items(session_store.get(session_id), selected_items)
+        if any(report_data.get(kind) for kind in SCAN_KINDS):
+            subjects.append((session_id, report_data))
+    return subjects
+
+def bulk_render_limit():
+    """Report renders one bulk export may run at once: all workers but one"""
+    return max(1, report_pool.workers - 1)
+
+async def render_bulk_subject(session_id, report_data):
+    """Render one subject of a bulk export; errors are returned, not raised"""
+    from pdf_generator import render_report_bytes
+    
+    try:
+        result = await report_pool.submit(render_report_bytes, report_data, wait=True)
+    except Exception as e:
+        result = {"error": str(e) or e.__class__.__name__}
+    return session_id, report_data, result
+
+async def stream_bulk_zip(subjects):
+    """Zip of per-subject reports, streamed as each report finishes.
+    
+    At most ``bulk_render_limit()`` reports are rendered at a time, which
+    leaves a report worker for interactive work (/generate-pdf, /reports,
+    thumbnails) and keeps finished reports from piling up in memory ahead
+    of the client.
+    Subjects that fail to render are listed in an ``errors.json`` member.
+    """
+    from pdf_generator import PDFReportGenerator
+    
+    archive = ZipStream()
+    remaining = iter(subjects)
+    pending = set()
+    failures = []
+    try:
+        while True:
+            for session_id, report_data in remaining:
+                pending.add(asyncio.ensure_future(render_bulk_subject(session_id, report_data)))
+                if len(pending) >= bulk_render_limit():
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                session_id, report_data, result = task.result()
+                if "error" in result:
+                    failures.append({"session_id": session_id, "error": result["error"]})
+                    continue
+                filename = PDFReportGenerator.report_filename(report_data)
+                yield archive.add(filename, result["content"])
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    if failures:
+        yield archive.add("errors.json", json.dumps(failures, indent=2).encode("utf-8"))
+    yield archive.close()
+
+def bulk_export_denied(request):
+    """Error response unless the request carries the bulk export token"""
+    if not BULK_EXPORT_TOKEN:
+        return JSONResponse(
+            status_code=403,
+            content={"error": "Bulk export is disabled; set BULK_EXPORT_TOKEN to enable it"},
+        )
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), BULK_EXPORT_TOKEN.encode()):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Bulk export requires a valid bearer token"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return None
+
+@app.post("/reports/bulk")
+async def bulk_report_export(request: Request, export: dict = Body(...)):
+    """Export reports for many sessions at once.
+    
+    Body: ``{"sessions": [session IDs], "format": "zip" | "pdf",
+    "selected": {scan types, optional}}``. ``zip`` streams one
+    Firstname_Lastname.pdf per subject, rendered in parallel on the report
+    pool; ``pdf`` returns a single merged report with a table of contents.
+    Sessions without scans are skipped. The listed sessions belong to
+    other clients, so the request must carry ``BULK_EXPORT_TOKEN``.
+    """
+    from pdf_generator import render_bulk_report_bytes
+    
+    denied = bulk_export_denied(request)
+    if denied is not None:
+        return denied
+    
+    session_ids = export.get("sessions")
+    export_format = export.get("format", "zip")
+    if not isinstance(session_ids, list) or not session_ids:
+        return JSONResponse(status_code=400, content={"error": "sessions must be a non-empty list of session IDs"})
+    if len(session_ids) > BULK_MAX_SESSIONS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Too many sessions: limit is {BULK_MAX_SESSIONS} per export"},
+        )
+    if not all(isinstance(session_id, str) and is_valid_session_id(session_id) for session_id in session_ids):
+        return JSONResponse(status_code=400, content={"error": "Invalid session ID"})
+    if export_format not in ("zip", "pdf"):
+        return JSONResponse(status_code=400, content={"error": "format must be one of: zip, pdf"})
+    
+    subjects = await run_in_threadpool(load_bulk_subjects, session_ids, export.get("selected"))
+    if not subjects:
+        return JSONResponse(status_code=404, content={"error": "No scans found for the given sessions"})
+    
+    if export_format == "zip":
+        return StreamingResponse(
+            stream_bulk_zip(subjects),
+            media_type="application/zip",
+            headers={"Content-Disposition": content_disposition("scan_reports.zip")},
+        )
+    
+    try:
+        # One job renders every subject, so it waits for a free worker
+        # rather than failing on a busy pool, and gets the bulk timeout
+        result = await report_pool.submit(
+            render_bulk_report_bytes, [report_data for _, report_data in subjects],
+            wait=True, timeout=BULK_REPORT_TIMEOUT,
+        )
+    except PoolError as e:
+        return pool_error_response(e)
+    if "error" in result:
+        return JSONResponse(status_code=500, content=result)
+    return pdf_stream_response(result["content"], "scan_reports.pdf")
+
+async def run_report_job(job, report_data):
+    """Render a queued report job and record the outcome"""
+    from pdf_generator import render_report
+    
+    try:
+        result = await report_pool.submit(render_report, job.output_path, report_data, wait=True)
+        error = result.get("error")
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+    await run_in_threadpool(report_jobs.finish, job, error)
+
+@app.post("/reports", status_code=202)
+async def create_report_job(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    selected_items: Optional[dict] = Body(None),
+):
+    """Queue report generation and return a job to poll.
+
+    The body is optional; when given it selects scan types like
+    /generate-pdf-selective.
+    """
+    session_id = request.state.session_id
+    session_data = await run_in_threadpool(session_store.get, session_id)
+    report_data = select_session_items(session_data, selected_items)
+    
+    from pdf_generator import PDFReportGenerator
+    filename = PDFReportGenerator.report_filename(report_data)
+    job = await run_in_threadpool(report_jobs.create, session_id, filename, session_upload_dir(session_id))
+    if job is None:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Too many pending report jobs, please retry shortly"},
+            headers={"Retry-After": "5"},
+        )
+    background_tasks.add_task(run_report_job, job, report_data)
+    
+    return {
+        **job.to_dict(),
+        "status_url": f"/reports/{job.id}",
+        "download_url": f"/reports/{job.id}/download",
+    }
+
+@app.get("/reports/{job_id}")
+async def get_report_job(request: Request, job_id: str):
+    """Report job status"""
+    job = await run_in_threadpool(report_jobs.get, job_id, request.state.session_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Report job not found"})
+    return job.to_dict()
+
+@app.get("/reports/{job_id}/download")
+async def download_report_job(request: Request, job_id: str):
+    """Download a finished report"""
+    job = await run_in_threadpool(report_jobs.get, job_id, request.state.session_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Report job not found"})
+    if job.status == "failed":
+        return JSONResponse(status_code=500, content={"error": job.error})
+    if job.status != "done":
+        return JSONResponse(status_code=409, content={"error": "Report is not ready yet"})
+    
+    return FileResponse(
+        path=job.output_path,
+        filename=job.filename,
+        media_type="application/pdf"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,273 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock
+per metric, so recording a value costs well under a microsecond. Each
+server process keeps its own values and exposes them on ``/metrics``.
+
+Stage timings are recorded with ``stage_timer``. Code running inside a
+worker pool job (decoders, report rendering) cannot reach the server
+process's metrics, so while a job runs its timings are collected by
+``collect_spans`` and returned with the job's result; the pool then
+records them in the server process (see ``WorkerPool.submit``). Recorded
+stage timings are also added to the current request's trace (``tracing``).
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from tracing import add_span
+
+# Upper bounds in seconds, from sub-millisecond stages to slow reports
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: a named metric with fixed label names"""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count, per label values"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """Value that goes up and down, per label values"""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, per label values"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot, key=lambda item: item[0]):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge read from existing statistics when scraped.
+
+    ``collect`` returns ``[(label_values, value), ...]``; used for state that
+    is already tracked elsewhere (pool occupancy, cache and stage counters).
+    """
+
+    def __init__(self, name, help, type, collect, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """The metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "scanner_stage_seconds",
+    "Time spent in a processing stage (upload read/write, image decode, preprocessing, pyzbar, "
+    "pdf417decoder, report build, thumbnails, session updates, barcode pipeline attempts, "
+    "worker pool waits)",
+    ("stage",),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "scanner_http_request_duration_seconds",
+    "HTTP request latency until the response starts, by route template",
+    ("method", "route", "status"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "scanner_http_requests_in_flight",
+    "HTTP requests being handled",
+))
+DECODES = REGISTRY.register(Counter(
+    "scanner_decodes_total",
+    "Decode attempts by kind and outcome (success, miss, error)",
+    ("kind", "outcome", "cached"),
+))
+
+_local = threading.local()
+
+
+def record_stage(name, seconds):
+    """Record a stage timing, or hold it for the pool job running in this thread"""
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans.append((name, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, name)
+        add_span(name, seconds)
+
+
+@contextmanager
+def stage_timer(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator recording every call of a function as stage ``name``"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def collect_spans(func, *args):
+    """Run ``func(*args)`` and return ``(result, [(stage, seconds), ...], seconds)``.
+
+    Used as the function a pool job actually runs, in whatever process or
+    thread that is. The last item is the job's own run time.
+    """
+    _local.spans = []
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        return result, _local.spans, time.perf_counter() - started
+    finally:
+        _local.spans = None
+
+
+def record_spans(spans):
+    """Record timings returned by ``collect_spans`` in this process"""
+    for name, seconds in spans:
+        STAGE_SECONDS.observe(seconds, name)
+        add_span(name, seconds)
@@ -0,0 +1,262 @@
+"""Result models for decoded scans.
+
+Decoders return these slotted objects instead of nested dicts; sessions,
+the result cache and the report generator keep them as they are. They are
+converted to the JSON shape the frontend expects only at the edges:
+``to_dict`` builds it on demand and ``to_json`` serializes once and reuses
+the bytes. Models are not modified after construction, which is what makes
+the cached JSON safe to reuse.
+
+Parsed AAMVA data is stored once, as the raw element fields; the grouped
+and formatted ``user`` views are derived from them when needed.
+"""
+
+import json
+
+from aamva import group_fields, user_data
+
+
+class ScanResult:
+    """Base class of decode results"""
+
+    __slots__ = ("_json",)
+
+    ok = True
+    error = None
+    stage = None
+    timings_ms = None
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def to_json(self):
+        """JSON encoding of ``to_dict()``, computed on first use"""
+        try:
+            return self._json
+        except AttributeError:
+            self._json = json.dumps(self.to_dict()).encode("utf-8")
+            return self._json
+
+
+class DecodeFailure(ScanResult):
+    """A decode that found nothing or failed"""
+
+    __slots__ = ("error", "timings_ms", "rois")
+
+    ok = False
+
+    def __init__(self, error, timings_ms=None, rois=None):
+        self.error = error
+        self.timings_ms = timings_ms
+        self.rois = rois
+
+    def to_dict(self):
+        data = {"error": self.error}
+        if self.timings_ms is not None:
+            data["timings_ms"] = self.timings_ms
+        if self.rois is not None:
+            data["rois"] = [list(roi) for roi in self.rois]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["error"], data.get("timings_ms"), data.get("rois"))
+
+
+class Barcode:
+    """One decoded 1D/2D barcode.
+
+    ``confidence`` is the evidence behind the read (see ``consensus``);
+    ``votes`` is set on consensus results to the number of frames or
+    variants that agreed on it.
+    """
+
+    __slots__ = ("type", "data", "quality", "confidence", "votes")
+
+    def __init__(self, type, data, quality="detected", confidence=None, votes=None):
+        self.type = type
+        self.data = data
+        self.quality = quality
+        self.confidence = confidence
+        self.votes = votes
+
+    def to_dict(self):
+        data = {"type": self.type, "data": self.data, "quality": self.quality}
+        if self.confidence is not None:
+            data["confidence"] = self.confidence
+        if self.votes is not None:
+            data["votes"] = self.votes
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("type"),
+            data.get("data"),
+            data.get("quality", "detected"),
+            data.get("confidence"),
+            data.get("votes"),
+        )
+
+
+class BarcodeScan(ScanResult):
+    """Barcodes found in one image, with the pipeline stage that found them"""
+
+    __slots__ = ("barcodes", "stage", "timings_ms", "rois")
+
+    def __init__(self, barcodes, stage=None, timings_ms=None, rois=None):
+        self.barcodes = tuple(barcodes)
+        self.stage = stage
+        self.timings_ms = timings_ms
+        self.rois = rois
+
+    def to_dict(self):
+        data = {
+            "success": True,
+            "barcodes": [barcode.to_dict() for barcode in self.barcodes],
+            "stage": self.stage,
+            "timings_ms": self.timings_ms,
+        }
+        if self.rois is not None:
+            data["rois"] = [list(roi) for roi in self.rois]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        barcodes = [Barcode.from_dict(item) for item in data.get("barcodes", [])]
+        return cls(barcodes, data.get("stage"), data.get("timings_ms"), data.get("rois"))
+
+
+class AAMVARecord:
+    """Parsed AAMVA DL/ID data: the raw element fields plus header info"""
+
+    __slots__ = ("fields", "header")
+
+    def __init__(self, fields, header=None):
+        self.fields = fields
+        self.header = header
+
+    @property
+    def user(self):
+        """Formatted fields for display (see ``aamva.user_data``)"""
+        return user_data(self.fields)
+
+    def to_dict(self):
+        data = group_fields(self.fields)
+        data["raw_fields"] = self.fields
+        data["user"] = self.user
+        if self.header is not None:
+            data["header"] = self.header
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("raw_fields", {}), data.get("header"))
+
+
+class PDF417Code:
+    """One decoded PDF417 symbol; ``parsed`` is set for AAMVA data"""
+
+    __slots__ = ("data", "parsed")
+
+    def __init__(self, data, parsed=None):
+        self.data = data
+        self.parsed = parsed
+
+    @property
+    def format(self):
+        return "AAMVA" if self.parsed is not None else "raw"
+
+    def to_dict(self):
+        data = {"data": self.data, "type": "PDF417", "format": self.format}
+        if self.parsed is not None:
+            data["parsed"] = self.parsed.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        parsed = data.get("parsed")
+        return cls(data.get("data", ""), AAMVARecord.from_dict(parsed) if parsed else None)
+
+
+class PDF417Scan(ScanResult):
+    """PDF417 symbols found in one image"""
+
+    __slots__ = ("codes",)
+
+    def __init__(self, codes):
+        self.codes = tuple(codes)
+
+    def to_dict(self):
+        return {"success": True, "pdf417_data": [code.to_dict() for code in self.codes]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([PDF417Code.from_dict(item) for item in data.get("pdf417_data", [])])
+
+
+class ImageInfo(ScanResult):
+    """Header information of a checkbook or card image"""
+
+    __slots__ = ("type", "format", "size", "mode")
+
+    def __init__(self, type, format, size, mode):
+        self.type = type
+        self.format = format
+        self.size = tuple(size)
+        self.mode = mode
+
+    def to_dict(self):
+        return {"type": self.type, "format": self.format, "size": list(self.size), "mode": self.mode}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("type"), data.get("format"), data.get("size", ()), data.get("mode"))
+
+
+def result_from_dict(data):
+    """Rebuild a result model from its ``to_dict()`` form"""
+    if "error" in data:
+        return DecodeFailure.from_dict(data)
+    if "barcodes" in data:
+        return BarcodeScan.from_dict(data)
+    if "pdf417_data" in data:
+        return PDF417Scan.from_dict(data)
+    return ImageInfo.from_dict(data)
+
+
+class ScanEntry:
+    """A scan stored in a session: the result plus where its upload went.
+
+    ``thumbnail`` is the report-resolution derivative of an image upload; it
+    may not exist yet while it is being rendered in the background.
+    """
+
+    __slots__ = ("result", "path", "filename", "thumbnail", "_json")
+
+    ok = True
+
+    def __init__(self, result, path=None, filename=None, thumbnail=None):
+        self.result = result
+        self.path = path
+        self.filename = filename
+        self.thumbnail = thumbnail
+
+    def to_dict(self):
+        data = self.result.to_dict()
+        data["path"] = self.path
+        data["filename"] = self.filename
+        if self.thumbnail is not None:
+            data["thumbnail"] = self.thumbnail
+        return data
+
+    def to_json(self):
+        try:
+            return self._json
+        except AttributeError:
+            self._json = json.dumps(self.to_dict()).encode("utf-8")
+            return self._json
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(result_from_dict(data), data.get("path"), data.get("filename"), data.get("thumbnail"))
@@ -2,18 +2,83 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
+from reportlab.platypus.tableofcontents import TableOfContents
 from reportlab.lib import colors
 from datetime import datetime
 from pathlib import Path
+from xml.sax.saxutils import escape
 import io
+from config import THUMBNAIL_MAX_DIM, THUMBNAIL_QUALITY
+from derivatives import ensure_thumbnail
+from metrics import stage_timer
 
-class PDFReportGenerator:
-    """Generate combined PDF reports"""
+# Layout of the driver license part of the report: sections of
+# (label, key in the parsed AAMVA ``user`` data)
+AAMVA_SECTIONS = (
+    ("Personal Information", (
+        ("Last Name", "last"),
+        ("First Name", "first"),
+        ("Middle Name", "middle"),
+        ("Date of Birth", "dob"),
+        ("Sex", "sex"),
+    )),
+    ("Physical Description", (
+        ("Eye Color", "eyes"),
+        ("Height", "height"),
+        ("Race/Ethnicity", "race"),
+        ("Weight", "weight"),
+    )),
+    ("Address", (
+        ("Street Address", "street"),
+        ("City", "city"),
+        ("State", "state"),
+        ("Postal Code", "postal"),
+        ("Country", "country"),
+    )),
+    ("Document Information", (
+        ("ID Number", "id"),
+        ("Restriction Codes", "restrictions"),
+        ("Endorsement Codes", "endorsements"),
+        ("Issue Date", "issued"),
+        ("Expiration Date", "expires"),
+        ("Vehicle Class", "vehicle_class"),
+        ("Vehicle Classification", "vehicle_classification"),
+        ("Card Revision Date", "card_revision"),
+    )),
+)
+
+class ReportTemplate:
+    """Styles and field layouts of the scan report, compiled once per process.
     
-    def __init__(self, output_path="report.pdf"):
-        self.output_path = output_path
+    Field lines ("<b>Label:</b> value") keep their label markup prebuilt;
+    values are escaped, so data containing markup characters is rendered
+    verbatim. The report only uses ReportLab's standard fonts, so no fonts
+    are registered.
+    """
+    
+    _shared = None
+    
+    def __init__(self):
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
+        self.page = {
+            "pagesize": letter,
+            "rightMargin": 0.75*inch,
+            "leftMargin": 0.75*inch,
+            "topMargin": 0.75*inch,
+            "bottomMargin": 0.75*inch,
+        }
+        self._field_labels = {}
+        for _, fields in AAMVA_SECTIONS:
+            for label, _ in fields:
+                self._field_label(label)
+    
+    @classmethod
+    def shared(cls):
+        """The process-wide template"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
     
     def _setup_custom_styles(self):
         """Setup custom paragraph styles"""
@@ -46,193 +111,246 @@ class PDFReportGenerator:
             spaceAfter=4
         ))
     
-    def _format_aamva_section(self, section_title, section_data):
+    def _field_label(self, label):
+        markup = self._field_labels.get(label)
+        if markup is None:
+            markup = self._field_labels[label] = f"<b>{escape(label)}:</b> "
+        return markup
+    
+    def field(self, label, value):
+        """A "Label: value" line"""
+        return Paragraph(self._field_label(label) + escape(str(value)), self.styles['Normal'])
+    
+    def text(self, text, style_name='Normal'):
+        """A paragraph of plain text, escaped into paragraph markup"""
+        return Paragraph(escape(str(text)), self.styles[style_name])
+
+class PDFReportGenerator:
+    """Generate combined PDF reports"""
+    
+    def __init__(self, output_path="report.pdf", template=None):
+        self.output_path = output_path
+        self.template = template or ReportTemplate.shared()
+        self.styles = self.template.styles
+    
+    @staticmethod
+    def report_name(session_data):
+        """Firstname_Lastname from the PDF417 data, or None if unavailable.
+
+        Uses the original casing from the PDF417, trims outer spaces and
+        replaces inner spaces with underscores.
+        """
+        entry = session_data.get("pdf417")
+        for code in getattr(entry.result, "codes", ()) if entry else ():
+            if code.parsed is None:
+                continue
+            user = code.parsed.user
+            first = (user.get("first") or "").strip().replace(" ", "_")
+            last = (user.get("last") or "").strip().replace(" ", "_")
+            if first and last:
+                return f"{first}_{last}"
+        return None
+    
+    @staticmethod
+    def report_filename(session_data):
+        """Download filename for a report: Firstname_Lastname.pdf or scan_report.pdf"""
+        name = PDFReportGenerator.report_name(session_data)
+        return f"{name}.pdf" if name else "scan_report.pdf"
+    
+    @staticmethod
+    def embeddable_image(entry):
+        """Path of the image to embed for a checkbook/card entry, or None.
+        
+        Prefers the report-resolution thumbnail, rendering it now if the
+        background job has not finished; falls back to the original upload.
+        """
+        if not entry.path or not Path(entry.path).exists():
+            return None
+        if entry.thumbnail:
+            try:
+                return ensure_thumbnail(entry.thumbnail, entry.path, THUMBNAIL_MAX_DIM, THUMBNAIL_QUALITY)
+            except Exception:
+                pass
+        return entry.path
+    
+    def _format_aamva_section(self, section_title, fields, user):
         """Format AAMVA data section"""
+        story = [Paragraph(section_title, self.styles['SectionHeader'])]
+        for label, key in fields:
+            story.append(self.template.field(label, user.get(key, "")))
+        story.append(Spacer(1, 0.15*inch))
+        return story
+    
+    def build_story(self, session_data, title_text=None):
+        """Flowables of one subject's report; the first one is its title"""
         story = []
-        story.append(Paragraph(section_title, self.styles['SectionHeader']))
         
-        if section_data:
-            for field_name, field_value in section_data.items():
+        # Title: use name from PDF417 when available so it matches the
+        # logical report name and filename pattern (Firstname_Lastname).
+        if title_text is None:
+            title_text = PDFReportGenerator.report_name(session_data) or "Scan Report"
+
+        title = self.template.text(title_text, 'CustomTitle')
+        story.append(title)
+        story.append(Spacer(1, 0.3*inch))
+
+        # Track whether we've already added at least one data section so
+        # we only insert page breaks *between* sections, not before the
+        # first one (which would create a nearly empty first page).
+        has_content_sections = False
+        
+        # Barcode section
+        if session_data.get("barcode"):
+            story.append(Paragraph("Barcode Data", self.styles['SectionHeader']))
+            barcode_scan = session_data["barcode"].result
+            for barcode in barcode_scan.barcodes:
                 story.append(Paragraph(
-                    f"<b>{field_name}:</b> {field_value}",
+                    f"<b>Type:</b> {escape(barcode.type or 'Unknown')}<br/>"
+                    f"<b>Data:</b> {escape(barcode.data or 'N/A')}",
                     self.styles['Normal']
                 ))
-        else:
-            story.append(Paragraph("No data available", self.styles['FieldLabel']))
+            story.append(Spacer(1, 0.2*inch))
+            has_content_sections = True
         
-        story.append(Spacer(1, 0.15*inch))
-        return story
-    
-    def generate_report(self, session_data):
-        """Generate PDF from session data"""
-        try:
-            doc = SimpleDocTemplate(
-                self.output_path,
-                pagesize=letter,
-                rightMargin=0.75*inch,
-                leftMargin=0.75*inch,
-                topMargin=0.75*inch,
-                bottomMargin=0.75*inch
-            )
-            
-            story = []
-            
-            # Title: use name from PDF417 when available so it matches the
-            # logical report name and filename pattern (Firstname_Lastname).
-            title_text = "Scan Report"
-            pdf417_data = session_data.get("pdf417") or {}
-            for item in pdf417_data.get("pdf417_data", []):
-                parsed = item.get("parsed") or {}
-                user = parsed.get("user") or {}
-                first = (user.get("first") or "").strip().replace(" ", "_")
-                last = (user.get("last") or "").strip().replace(" ", "_")
-                if first and last:
-                    title_text = f"{first}_{last}"
-                    break
-
-            title = Paragraph(title_text, self.styles['CustomTitle'])
-            story.append(title)
-            story.append(Spacer(1, 0.3*inch))
-
-            # Track whether we've already added at least one data section so
-            # we only insert page breaks *between* sections, not before the
-            # first one (which would create a nearly empty first page).
-            has_content_sections = False
+        # PDF417 section with formatted AAMVA data
+        if session_data.get("pdf417"):
+            if has_content_sections:
+                story.append(PageBreak())
+            story.append(Paragraph("PDF417 - Driver License Data", self.styles['SectionHeader']))
+            pdf417_scan = session_data["pdf417"].result
             
-            # Barcode section
-            if session_data.get("barcode"):
-                story.append(Paragraph("Barcode Data", self.styles['SectionHeader']))
-                barcode_data = session_data["barcode"]
-                for barcode in barcode_data.get("barcodes", []):
-                    story.append(Paragraph(
-                        f"<b>Type:</b> {barcode.get('type', 'Unknown')}<br/>"
-                        f"<b>Data:</b> {barcode.get('data', 'N/A')}",
-                        self.styles['Normal']
-                    ))
-                story.append(Spacer(1, 0.2*inch))
-                has_content_sections = True
+            for code in pdf417_scan.codes:
+                if code.parsed is not None:
+                    user = code.parsed.user
+                    for section_title, fields in AAMVA_SECTIONS:
+                        story.extend(self._format_aamva_section(section_title, fields, user))
+                else:
+                    story.append(self.template.field("Data", code.data or "N/A"))
             
-            # PDF417 section with formatted AAMVA data
-            if session_data.get("pdf417"):
-                if has_content_sections:
-                    story.append(PageBreak())
-                story.append(Paragraph("PDF417 - Driver License Data", self.styles['SectionHeader']))
-                pdf417_data = session_data["pdf417"]
-                
-                for data in pdf417_data.get("pdf417_data", []):
-                    if data.get("format") == "AAMVA" and data.get("parsed"):
-                        parsed = data["parsed"]
-                        
-                        if parsed.get("user"):
-                            user = parsed["user"]
-                            story.extend(self._format_aamva_section(
-                                "Personal Information",
-                                {
-                                    "Last Name": user.get("last", ""),
-                                    "First Name": user.get("first", ""),
-                                    "Middle Name": user.get("middle", ""),
-                                    "Date of Birth": user.get("dob", ""),
-                                    "Sex": user.get("sex", "")
-                                }
-                            ))
-                            
-                            story.extend(self._format_aamva_section(
-                                "Physical Description",
-                                {
-                                    "Eye Color": user.get("eyes", ""),
-                                    "Height": user.get("height", ""),
-                                    "Race/Ethnicity": user.get("race", ""),
-                                    "Weight": user.get("weight", "")
-                                }
-                            ))
-                            
-                            story.extend(self._format_aamva_section(
-                                "Address",
-                                {
-                                    "Street Address": user.get("street", ""),
-                                    "City": user.get("city", ""),
-                                    "State": user.get("state", ""),
-                                    "Postal Code": user.get("postal", ""),
-                                    "Country": user.get("country", "")
-                                }
-                            ))
-                            
-                            story.extend(self._format_aamva_section(
-                                "Document Information",
-                                {
-                                    "ID Number": user.get("id", ""),
-                                    "Restriction Codes": user.get("restrictions", ""),
-                                    "Endorsement Codes": user.get("endorsements", ""),
-                                    "Issue Date": user.get("issued", ""),
-                                    "Expiration Date": user.get("expires", ""),
-                                    "Vehicle Class": user.get("vehicle_class", ""),
-                                    "Vehicle Classification": user.get("vehicle_classification", ""),
-                                    "Card Revision Date": user.get("card_revision", "")
-                                }
-                            ))
-                    else:
-                        story.append(Paragraph(
-                            f"<b>Data:</b> {data.get('data', 'N/A')}",
-                            self.styles['Normal']
-                        ))
-                
-                story.append(Spacer(1, 0.2*inch))
-                has_content_sections = True
+            story.append(Spacer(1, 0.2*inch))
+            has_content_sections = True
+        
+        # Checkbook section
+        if session_data.get("checkbook"):
+            if has_content_sections:
+                story.append(PageBreak())
+            story.append(Paragraph("Checkbook Scan", self.styles['SectionHeader']))
+            checkbook_path = self.embeddable_image(session_data["checkbook"])
+            if checkbook_path:
+                try:
+                    img = Image(checkbook_path, width=5*inch, height=3*inch)
+                    story.append(img)
+                except:
+                    story.append(Paragraph("Checkbook image could not be loaded", self.styles['Normal']))
+            story.append(Spacer(1, 0.2*inch))
+        
+        # Card section
+        if session_data.get("card_front") or session_data.get("card_back"):
+            if has_content_sections:
+                story.append(PageBreak())
+            story.append(Paragraph("Card Scans", self.styles['SectionHeader']))
             
-            # Checkbook section
-            if session_data.get("checkbook"):
-                if has_content_sections:
-                    story.append(PageBreak())
-                story.append(Paragraph("Checkbook Scan", self.styles['SectionHeader']))
-                checkbook_path = session_data["checkbook"].get("path")
-                if checkbook_path and Path(checkbook_path).exists():
+            if session_data.get("card_front"):
+                story.append(Paragraph("Front:", self.styles['Normal']))
+                card_front_path = self.embeddable_image(session_data["card_front"])
+                if card_front_path:
                     try:
-                        img = Image(checkbook_path, width=5*inch, height=3*inch)
+                        img = Image(card_front_path, width=4*inch, height=2.5*inch)
                         story.append(img)
                     except:
-                        story.append(Paragraph("Checkbook image could not be loaded", self.styles['Normal']))
+                        story.append(Paragraph("Card front image could not be loaded", self.styles['Normal']))
                 story.append(Spacer(1, 0.2*inch))
             
-            # Card section
-            if session_data.get("card_front") or session_data.get("card_back"):
-                if has_content_sections:
-                    story.append(PageBreak())
-                story.append(Paragraph("Card Scans", self.styles['SectionHeader']))
-                
-                if session_data.get("card_front"):
-                    story.append(Paragraph("Front:", self.styles['Normal']))
-                    card_front_path = session_data["card_front"].get("path")
-                    if card_front_path and Path(card_front_path).exists():
-                        try:
-                            img = Image(card_front_path, width=4*inch, height=2.5*inch)
-                            story.append(img)
-                        except:
-                            story.append(Paragraph("Card front image could not be loaded", self.styles['Normal']))
-                    story.append(Spacer(1, 0.2*inch))
-                
-                if session_data.get("card_back"):
-                    story.append(Paragraph("Back:", self.styles['Normal']))
-                    card_back_path = session_data["card_back"].get("path")
-                    if card_back_path and Path(card_back_path).exists():
-                        try:
-                            img = Image(card_back_path, width=4*inch, height=2.5*inch)
-                            story.append(img)
-                        except:
-                            story.append(Paragraph("Card back image could not be loaded", self.styles['Normal']))
-                has_content_sections = True
+            if session_data.get("card_back"):
+                story.append(Paragraph("Back:", self.styles['Normal']))
+                card_back_path = self.embeddable_image(session_data["card_back"])
+                if card_back_path:
+                    try:
+                        img = Image(card_back_path, width=4*inch, height=2.5*inch)
+                        story.append(img)
+                    except:
+                        story.append(Paragraph("Card back image could not be loaded", self.styles['Normal']))
+            has_content_sections = True
 
-            # Timestamp footer: add at the end so we don't create an almost
-            # empty first page with only the generated timestamp.
-            story.append(Spacer(1, 0.3*inch))
-            timestamp = Paragraph(
-                f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                self.styles['Normal']
-            )
-            story.append(timestamp)
+        # Timestamp footer: add at the end so we don't create an almost
+        # empty first page with only the generated timestamp.
+        story.append(Spacer(1, 0.3*inch))
+        timestamp = Paragraph(
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            self.styles['Normal']
+        )
+        story.append(timestamp)
+        return story
+    
+    def generate_report(self, session_data):
+        """Generate PDF from session data"""
+        try:
+            doc = SimpleDocTemplate(self.output_path, **self.template.page)
+            story = self.build_story(session_data)
+            with stage_timer("report_build"):
+                doc.build(story)
+            return {"success": True, "path": self.output_path}
+        
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def generate_bulk_report(self, sessions):
+        """One PDF for many subjects, with a table of contents.
+        
+        Each subject starts on a new page under its Firstname_Lastname title
+        (or "Scan Report N"), which is listed and bookmarked in the contents.
+        """
+        try:
+            doc = BulkReportDocTemplate(self.output_path, **self.template.page)
+            contents = TableOfContents()
+            story = [
+                self.template.text("Scan Reports", 'CustomTitle'),
+                contents,
+            ]
+            for index, session_data in enumerate(sessions, start=1):
+                title_text = PDFReportGenerator.report_name(session_data) or f"Scan Report {index}"
+                subject_story = self.build_story(session_data, title_text)
+                subject_story[0].toc_entry = (title_text, f"subject-{index}")
+                story.append(PageBreak())
+                story.extend(subject_story)
             
-            # Build PDF
-            doc.build(story)
+            # The contents need the page numbers of a finished layout, so
+            # the document is laid out until they stop changing.
+            with stage_timer("report_build"):
+                doc.multiBuild(story)
             return {"success": True, "path": self.output_path}
         
         except Exception as e:
             return {"error": str(e)}
+
+class BulkReportDocTemplate(SimpleDocTemplate):
+    """Document that records subject titles for the table of contents"""
+    
+    def afterFlowable(self, flowable):
+        entry = getattr(flowable, "toc_entry", None)
+        if entry is None:
+            return
+        text, key = entry
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(text, key, level=0)
+        self.notify('TOCEntry', (0, text, self.page, key))
+
+def render_report(output_path, session_data):
+    """Generate a report in a worker process (module-level so it pickles)"""
+    return PDFReportGenerator(str(output_path)).generate_report(session_data)
+
+def render_report_bytes(session_data):
+    """Generate a report in memory; returns ``{"success", "content"}`` or ``{"error"}``"""
+    buffer = io.BytesIO()
+    result = PDFReportGenerator(buffer).generate_report(session_data)
+    if "error" in result:
+        return result
+    return {"success": True, "content": buffer.getvalue()}
+
+def render_bulk_report_bytes(sessions):
+    """Generate a merged multi-subject report in memory (see ``render_report_bytes``)"""
+    buffer = io.BytesIO()
+    result = PDFReportGenerator(buffer).generate_bulk_report(sessions)
+    if "error" in result:
+        return result
+    return {"success": True, "content": buffer.getvalue()}
@@ -0,0 +1,135 @@
+import time
+
+from metrics import record_stage
+
+
+class DecodeStage:
+    """One step of a decode cascade.
+
+    ``func`` receives the shared decode context and returns a (possibly
+    empty) list of decoded objects. ``cost`` is a rough estimate of the stage
+    runtime in milliseconds; it seeds the adaptive ordering until real
+    timings have been recorded.
+    """
+
+    def __init__(self, name, func, cost):
+        self.name = name
+        self.func = func
+        self.cost = cost
+
+    def __repr__(self):
+        return f"DecodeStage({self.name!r}, cost={self.cost})"
+
+
+class StageStats:
+    """Attempt/hit counters and timings for the stages of a pipeline"""
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, name, seconds, hit):
+        entry = self._stats.setdefault(name, {"attempts": 0, "hits": 0, "seconds": 0.0})
+        entry["attempts"] += 1
+        entry["hits"] += 1 if hit else 0
+        entry["seconds"] += seconds
+
+    def record_timings(self, timings_ms, hit_stage=None):
+        """Record a result's ``timings_ms`` mapping, as returned by a pipeline run"""
+        for name, ms in timings_ms.items():
+            self.record(name, ms / 1000.0, name == hit_stage)
+
+    def get(self, name):
+        return self._stats.get(name, {"attempts": 0, "hits": 0, "seconds": 0.0})
+
+    def snapshot(self):
+        snapshot = {}
+        for name, entry in self._stats.items():
+            attempts = entry["attempts"]
+            snapshot[name] = {
+                "attempts": attempts,
+                "hits": entry["hits"],
+                "hit_rate": round(entry["hits"] / attempts, 4) if attempts else 0.0,
+                "avg_ms": round(entry["seconds"] * 1000.0 / attempts, 3) if attempts else 0.0,
+            }
+        return snapshot
+
+
+class DecodePipeline:
+    """Ordered, configurable cascade of decode stages with early exit.
+
+    Stages run until one returns a result. ``order`` selects and orders the
+    enabled stages by name (anything not listed is disabled). With
+    ``adaptive`` set, stages with at least ``min_samples`` attempts are
+    re-ordered among themselves by expected cost per successful decode, so
+    the cheapest stage that is likely to succeed on the observed traffic is
+    tried first. Stages with fewer attempts keep their configured position.
+    """
+
+    def __init__(self, stages, order=None, adaptive=False, min_samples=20):
+        self.stages = {stage.name: stage for stage in stages}
+        self.adaptive = adaptive
+        self.min_samples = min_samples
+        self.stats = StageStats()
+        self.configure(order)
+
+    def configure(self, order=None):
+        """Enable and order stages by name; ``None`` keeps the declared order"""
+        if order is None:
+            self.order = list(self.stages)
+            return
+        unknown = [name for name in order if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown decode stage(s): {', '.join(unknown)}")
+        self.order = list(dict.fromkeys(order))
+
+    def _expected_cost(self, stage):
+        # Smooth the measured values with the static estimate so a stage
+        # with few samples is neither starved nor over-trusted.
+        entry = self.stats.get(stage.name)
+        prior = 2
+        avg_ms = (entry["seconds"] * 1000.0 + stage.cost * prior) / (entry["attempts"] + prior)
+        hit_rate = (entry["hits"] + 1) / (entry["attempts"] + 2)
+        return avg_ms / hit_rate
+
+    def ordered_stages(self):
+        stages = [self.stages[name] for name in self.order]
+        if not self.adaptive:
+            return stages
+        # Gate per stage: late fallbacks only run when everything before
+        # them missed, and stats are kept per worker process, so waiting for
+        # every stage to be sampled would keep the configured order forever.
+        sampled = [
+            index for index, stage in enumerate(stages)
+            if self.stats.get(stage.name)["attempts"] >= self.min_samples
+        ]
+        ranked = sorted((stages[index] for index in sampled), key=self._expected_cost)
+        for index, stage in zip(sampled, ranked):
+            stages[index] = stage
+        return stages
+
+    def iter_run(self, context):
+        """Run every stage in order, yielding ``(stage_name, objects, ms)``.
+
+        Callers that need more than the first hit (e.g. consensus voting)
+        stop iterating when they have enough; unvisited stages are not run.
+        """
+        for stage in self.ordered_stages():
+            started = time.perf_counter()
+            objects = stage.func(context)
+            elapsed = time.perf_counter() - started
+            self.stats.record(stage.name, elapsed, bool(objects))
+            record_stage(f"attempt_{stage.name}", elapsed)
+            yield stage.name, objects, round(elapsed * 1000.0, 3)
+
+    def run(self, context):
+        """Run stages until one decodes.
+
+        Returns ``(objects, stage_name, timings_ms)``; ``stage_name`` is
+        ``None`` when every stage came back empty.
+        """
+        timings_ms = {}
+        for name, objects, ms in self.iter_run(context):
+            timings_ms[name] = ms
+            if objects:
+                return objects, name, timings_ms
+        return [], None, timings_ms
@@ -0,0 +1,293 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+from models import ScanEntry
+
+SESSION_HEADER = "X-Session-ID"
+SESSION_COOKIE = "session_id"
+
+# Session IDs double as upload directory names, so only allow safe characters
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+SCAN_KINDS = ("barcode", "pdf417", "checkbook", "card_front", "card_back")
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def is_valid_session_id(session_id):
+    return bool(session_id) and SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def empty_session_data():
+    data = {kind: None for kind in SCAN_KINDS}
+    data["timestamps"] = {}
+    return data
+
+
+def session_to_dict(data):
+    """JSON-ready form of session data (entries are ``ScanEntry`` objects)"""
+    result = {}
+    for kind in SCAN_KINDS:
+        entry = data.get(kind)
+        result[kind] = entry.to_dict() if entry is not None else None
+    result["timestamps"] = dict(data["timestamps"])
+    return result
+
+
+def session_to_json(data):
+    """``session_to_dict`` encoded as JSON bytes.
+
+    Each entry serializes itself once and reuses the bytes, so polling a
+    session only encodes what changed since the last poll.
+    """
+    parts = []
+    for kind in SCAN_KINDS:
+        entry = data.get(kind)
+        parts.append(b'"%s": %s' % (kind.encode(), entry.to_json() if entry is not None else b"null"))
+    parts.append(b'"timestamps": ' + json.dumps(data["timestamps"]).encode("utf-8"))
+    return b"{" + b", ".join(parts) + b"}"
+
+
+def json_etag(body):
+    """Strong ETag for a JSON body"""
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def session_from_dict(data):
+    """Rebuild session data from ``session_to_dict`` output"""
+    session = empty_session_data()
+    for kind in SCAN_KINDS:
+        if data.get(kind) is not None:
+            session[kind] = ScanEntry.from_dict(data[kind])
+    session["timestamps"] = data.get("timestamps", {})
+    return session
+
+
+class SessionStore:
+    """Interface for per-client session storage.
+
+    Session data holds one ``ScanEntry`` (or None) per scan kind plus a
+    ``timestamps`` mapping; ``session_to_dict`` gives the JSON shape the
+    frontend expects. Sessions idle for
+    longer than ``ttl`` seconds are removed by ``purge_expired``.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+
+    def get(self, session_id):
+        """Return the session's data, or empty data for an unknown session.
+
+        Reads never store anything: a session exists once ``set_item``
+        writes to it.
+        """
+        raise NotImplementedError
+
+    def set_item(self, session_id, kind, entry):
+        """Store one scan result and its timestamp; returns the entry"""
+        raise NotImplementedError
+
+    def get_json(self, session_id):
+        """Return ``(body, etag)``: the session as JSON bytes and its ETag"""
+        body = session_to_json(self.get(session_id))
+        return body, json_etag(body)
+
+    def reset(self, session_id):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Remove idle sessions and return their IDs"""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions held in process memory; only valid with a single worker.
+
+    The JSON form of each session is kept until the session changes, so
+    repeated polls cost neither encoding nor hashing.
+    """
+
+    def __init__(self, ttl=3600):
+        super().__init__(ttl)
+        self._sessions = {}
+        self._json = {}
+
+    def _touch(self, session_id):
+        """Refresh a stored session's last use; returns its data, or None"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session[0] = time.time()
+        return session[1]
+
+    def get(self, session_id):
+        # Only writes store a session, so reads of unknown IDs cannot grow
+        # the store
+        data = self._touch(session_id)
+        return data if data is not None else empty_session_data()
+
+    def set_item(self, session_id, kind, entry):
+        data = self._touch(session_id)
+        if data is None:
+            data = empty_session_data()
+            self._sessions[session_id] = [time.time(), data]
+        data[kind] = entry
+        data["timestamps"][kind] = datetime.now().isoformat()
+        self._json.pop(session_id, None)
+        return entry
+
+    def get_json(self, session_id):
+        cached = self._json.get(session_id)
+        if cached is not None:
+            self._touch(session_id)
+            return cached
+        cached = super().get_json(session_id)
+        if session_id in self._sessions:
+            self._json[session_id] = cached
+        return cached
+
+    def reset(self, session_id):
+        self._sessions.pop(session_id, None)
+        self._json.pop(session_id, None)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [sid for sid, (last_seen, _) in self._sessions.items() if last_seen < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+            self._json.pop(session_id, None)
+        return expired
+
+    def count(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions stored in SQLite so several uvicorn workers can share them.
+
+    Each operation opens its own connection, which keeps the store safe to
+    use from forked worker processes. Updates run inside an immediate
+    transaction so concurrent uploads to the same session do not overwrite
+    each other's entries. Sessions are stored as the JSON served to clients,
+    together with its ETag, so reads are served without re-encoding.
+    """
+
+    def __init__(self, path, ttl=3600):
+        super().__init__(ttl)
+        self.path = str(path)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL, etag TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "etag" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN etag TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _load(self, conn, session_id):
+        row = conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return session_from_dict(json.loads(row[0])) if row else empty_session_data()
+
+    def _store(self, conn, session_id, data):
+        body = session_to_json(data)
+        conn.execute(
+            "INSERT INTO sessions (id, data, last_seen, etag) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, "
+            "last_seen = excluded.last_seen, etag = excluded.etag",
+            (session_id, body.decode("utf-8"), time.time(), json_etag(body)),
+        )
+
+    def get(self, session_id):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE sessions SET last_seen = ? WHERE id = ?", (time.time(), session_id))
+            return self._load(conn, session_id)
+        finally:
+            conn.close()
+
+    def get_json(self, session_id):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE sessions SET last_seen = ? WHERE id = ?", (time.time(), session_id))
+            row = conn.execute("SELECT data, etag FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return super().get_json(session_id)
+        body = row[0].encode("utf-8")
+        return body, row[1] or json_etag(body)
+
+    def set_item(self, session_id, kind, entry):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            data = self._load(conn, session_id)
+            data[kind] = entry
+            data["timestamps"][kind] = datetime.now().isoformat()
+            self._store(conn, session_id, data)
+            conn.execute("COMMIT")
+            return data[kind]
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def reset(self, session_id):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        finally:
+            conn.close()
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [
+                row[0]
+                for row in conn.execute("SELECT id FROM sessions WHERE last_seen < ?", (cutoff,))
+            ]
+            conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+            conn.execute("COMMIT")
+            return expired
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        finally:
+            conn.close()
+
+
+def create_session_store(backend, ttl, sqlite_path=None):
+    """Build the session store selected by configuration"""
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, ttl=ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,99 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from aamva import group_fields, normalize_date, parse_fields
+from benchmarks.synthetic import aamva_payload
+
+ELEMENTS = [
+    ("DAQ", "D1234567"),
+    ("DCS", "VAN DER BERG"),
+    ("DAC", "MARIE CLAIRE"),
+    ("DAG", "123 DAKOTA AVE"),
+    ("DAI", "SAN ANTONIO"),
+    ("DBB", "01021990"),
+]
+
+
+def test_parses_subfiles_and_keeps_multi_word_values():
+    payload = aamva_payload([("DL", ELEMENTS), ("ZT", [("ZTA", "LOCAL DATA")])], version=9)
+
+    fields, header = parse_fields(payload)
+
+    assert fields == dict(ELEMENTS, ZTA="LOCAL DATA")
+    assert header["version"] == 9
+    assert header["jurisdiction_version"] == 0
+    assert [subfile["type"] for subfile in header["subfiles"]] == ["DL", "ZT"]
+
+
+def test_tolerates_wrong_subfile_offsets():
+    payload = aamva_payload([("DL", ELEMENTS)])
+    # Shift the DL offset as some issuers do
+    payload = payload.replace("DL0031", "DL0029", 1)
+
+    fields, _ = parse_fields(payload)
+
+    assert fields == dict(ELEMENTS)
+
+
+def test_version_one_header_has_no_jurisdiction_version():
+    payload = aamva_payload([("DL", [("DAQ", "X1"), ("DAA", "SMITH,JOHN,A")])], version=1)
+
+    fields, header = parse_fields(payload)
+
+    assert header["version"] == 1
+    assert header["jurisdiction_version"] is None
+    assert fields == {"DAQ": "X1", "DAA": "SMITH,JOHN,A"}
+
+
+def test_payload_without_separators_falls_back_to_known_ids():
+    payload = aamva_payload([("DL", ELEMENTS)])
+    flattened = payload.replace("\n", " ").replace("\r", " ").replace("\x1e", " ")
+
+    fields, _ = parse_fields(flattened)
+
+    assert fields["DAQ"] == "D1234567"
+    assert fields["DCS"] == "VAN DER BERG"
+    assert fields["DAI"] == "SAN ANTONIO"
+
+
+def test_record_without_header():
+    fields, header = parse_fields("DLDAQ42\nDCSDOE\nDACJANE\n")
+
+    assert header is None
+    assert fields == {"DAQ": "42", "DCS": "DOE", "DAC": "JANE"}
+
+
+def test_normalize_date_handles_both_orders():
+    assert normalize_date("01021990") == "01021990"
+    assert normalize_date("19900102") == "01021990"
+    assert normalize_date("2031") == "2031"
+    assert normalize_date("") == ""
+
+
+def test_group_fields_uses_display_names_and_skips_unknown_ids():
+    groups = group_fields({"DCS": "DOE", "DAG": "1 MAIN ST", "ZTA": "LOCAL"})
+
+    assert groups["personal"] == {"Last Name": "DOE"}
+    assert groups["address"] == {"Street Address": "1 MAIN ST"}
+    assert groups["physical"] == {} and groups["document"] == {}
+
+
+def test_user_data_covers_renamed_elements_and_date_orders():
+    from decoders import PDF417Decoder
+
+    payload = aamva_payload(
+        [("DL", [("DAQ", "X1"), ("DAA", "SMITH,JOHN,A B"), ("DBB", "19900102"), ("DAR", "C")])],
+        version=1,
+    )
+
+    user = PDF417Decoder.parse_aamva_data(payload).user
+
+    assert (user["last"], user["first"], user["middle"]) == ("SMITH", "JOHN", "A B")
+    assert user["dob"] == "January 2, 1990"
+    assert user["vehicle_class"] == "C"
+    assert user["card_revision"] == ""
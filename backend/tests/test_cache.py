@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import threading
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from cache import ResultCache, content_key
+
+
+def test_content_key_depends_on_bytes_kind_and_version():
+    key = content_key(b"image", "barcode", "v1")
+    assert key == content_key(b"image", "barcode", "v1")
+    assert key != content_key(b"other", "barcode", "v1")
+    assert key != content_key(b"image", "pdf417", "v1")
+    assert key != content_key(b"image", "barcode", "v2")
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"success": True})
+    cache.put("b", {"success": True})
+    assert cache.get("a") is not None  # "a" is now most recently used
+    cache.put("c", {"success": True})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_expired_entries_are_not_served(monkeypatch):
+    cache = ResultCache(max_entries=4, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    cache.put("a", {"success": True})
+    now[0] += 11
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    ResultCache(max_entries=4, disk_dir=tmp_path).put("a", {"success": True, "barcodes": []})
+
+    cache = ResultCache(max_entries=4, disk_dir=tmp_path)
+    assert cache.get("a") == {"success": True, "barcodes": []}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_async_access_does_disk_io_off_the_event_loop_thread(tmp_path, monkeypatch):
+    cache = ResultCache(max_entries=4, disk_dir=tmp_path)
+    io_threads = []
+    for name in ("_disk_get", "_disk_put"):
+        original = getattr(cache, name)
+
+        def record(*args, _original=original):
+            io_threads.append(threading.get_ident())
+            return _original(*args)
+
+        monkeypatch.setattr(cache, name, record)
+
+    async def run():
+        await cache.put_async("a", {"success": True})
+        cache.clear()
+        from_disk = await cache.get_async("a")
+        from_memory = await cache.get_async("a")
+        missing = await cache.get_async("b")
+        return from_disk, from_memory, missing
+
+    assert asyncio.run(run()) == ({"success": True}, {"success": True}, None)
+    # One write and two disk reads; the memory hit never left the loop
+    assert len(io_threads) == 3
+    assert threading.get_ident() not in io_threads
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_report_cache_round_trips_and_prunes_least_recently_used(tmp_path):
+    from cache import ReportCache
+
+    cache = ReportCache(tmp_path, max_entries=2)
+    key = ReportCache.key(b'{"barcode": []}', "1")
+    assert key != ReportCache.key(b'{"barcode": []}', "2")
+    assert cache.get(key) is None
+
+    cache.put(key, b"%PDF-report")
+    assert cache.get(key) == b"%PDF-report"
+
+    for index in range(15):  # the 16th write prunes
+        cache.put(f"other-{index}", b"%PDF")
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,51 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from consensus import ConsensusVoter, read_weight
+from models import Barcode, PDF417Code
+
+
+def test_read_weight_grows_with_scan_lines_and_penalizes_partial_outlines():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+
+    assert read_weight(None, None) == 0.5
+    assert read_weight(1, square) < read_weight(2, square) < read_weight(4, square) == 1.0
+    assert read_weight(40, square) == 1.0
+    assert read_weight(4, [(0, 0), (10, 0)]) == 0.5
+
+
+def test_voter_accepts_a_value_once_enough_observations_agree():
+    voter = ConsensusVoter(min_votes=2, min_share=0.6)
+    voter.add([Barcode("CODE128", "ABC", confidence=1.0)])
+    assert not voter.decided
+    voter.add([])
+    voter.add([Barcode("CODE128", "ABC", confidence=0.5), Barcode("CODE128", "ABC", confidence=1.0)])
+
+    [winner] = voter.winners()
+    assert (winner.key, winner.votes, winner.weight) == (("CODE128", "ABC"), 2, 2.0)
+    assert voter.observations == 3
+    [barcode] = voter.barcodes([winner])
+    assert (barcode.quality, barcode.votes, barcode.confidence) == ("consensus", 2, 0.75)
+
+
+def test_conflicting_reads_hold_back_a_decision_until_outvoted():
+    voter = ConsensusVoter(min_votes=2, min_share=0.7)
+    for value in ("12345", "12845", "12345"):
+        voter.add([Barcode("EAN13", value, confidence=1.0)])
+    assert voter.winners() == []  # two of three reads is below a 70% share
+
+    voter.add([Barcode("EAN13", "12345", confidence=1.0)])
+    [winner] = voter.winners()
+    assert winner.item.data == "12345"
+
+
+def test_symbologies_are_decided_independently():
+    voter = ConsensusVoter(min_votes=1, min_share=0.6)
+    voter.add([Barcode("QRCODE", "A", confidence=1.0), PDF417Code("@ANSI")])
+
+    assert sorted(candidate.key for candidate in voter.winners()) == [("PDF417", "@ANSI"), ("QRCODE", "A")]
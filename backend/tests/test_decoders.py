@@ -0,0 +1,261 @@
+import io
+import os
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import decoders
+from decoders import BarcodeDecodeContext, BarcodeDecoder, decode_image
+
+
+def _stripes(theta, size=(300, 400), period=16):
+    """Smooth bars whose gradients point ``theta`` degrees from the x axis"""
+    y, x = np.mgrid[0:size[0], 0:size[1]]
+    angle = np.radians(theta)
+    position = x * np.cos(angle) + y * np.sin(angle)
+    return (125 + 100 * np.cos(2 * np.pi * position / period)).astype(np.uint8)
+
+
+def _record_scans(monkeypatch, found=None):
+    """Replace pyzbar with a recorder; returns the list of scanned images"""
+    scanned = []
+
+    def scan(image):
+        scanned.append(image)
+        return found(image) if found else []
+
+    monkeypatch.setattr(BarcodeDecoder, "_scan", staticmethod(scan))
+    return scanned
+
+
+def test_dominant_angle_finds_the_bar_orientation():
+    for theta in (0, 30, -30, 60, -75):
+        angle = BarcodeDecoder._dominant_angle(_stripes(theta))
+        assert abs(angle - theta) < 1.0, (theta, angle)
+
+
+def test_dominant_angle_is_none_without_a_clear_orientation():
+    flat = np.full((200, 200), 128, dtype=np.uint8)
+    noise = np.random.default_rng(0).integers(0, 256, (200, 200)).astype(np.uint8)
+
+    assert BarcodeDecoder._dominant_angle(flat) is None
+    assert BarcodeDecoder._dominant_angle(noise) is None
+
+
+def test_rotating_by_the_dominant_angle_straightens_the_bars():
+    image = _stripes(30)
+    rotated = BarcodeDecoder._rotate_expanded(image, BarcodeDecoder._dominant_angle(image))
+
+    # The border is replicated, so measure away from the new corners
+    h, w = rotated.shape
+    center = rotated[h // 2 - 60:h // 2 + 60, w // 2 - 60:w // 2 + 60]
+    assert abs(BarcodeDecoder._dominant_angle(center)) < 1.0
+
+
+def test_rotate_expanded_grows_the_canvas_instead_of_cropping():
+    image = np.zeros((300, 400), dtype=np.uint8)
+    for y, x in ((5, 5), (5, 385), (285, 5), (285, 385)):
+        image[y:y + 10, x:x + 10] = 255
+
+    rotated = BarcodeDecoder._rotate_expanded(image, 30)
+
+    c, s = np.cos(np.radians(30)), np.sin(np.radians(30))
+    assert rotated.shape == (int(300 * c + 400 * s), int(300 * s + 400 * c))
+    # All four corner markers survive the rotation
+    assert abs(int(rotated.sum()) - int(image.sum())) < 0.1 * int(image.sum())
+    assert BarcodeDecoder._rotate_expanded(image, 90).shape == (400, 300)
+
+
+def test_lossless_rotated_stage_transposes_the_shared_preprocessed_frame(monkeypatch):
+    image = np.arange(12 * 20, dtype=np.uint8).reshape(12, 20)
+    preprocessed = []
+
+    def preprocess(frame):
+        preprocessed.append(frame)
+        return frame[:, ::-1].copy()
+
+    monkeypatch.setattr(decoders, "ROTATION_MODE", "lossless")
+    monkeypatch.setattr(BarcodeDecoder, "_preprocess_image", staticmethod(preprocess))
+    scanned = _record_scans(monkeypatch)
+
+    ctx = BarcodeDecodeContext(image)
+    assert BarcodeDecoder._stage_rotated(ctx) == []
+
+    gray = image[:, ::-1]
+    expected = [np.rot90(gray, 1), np.rot90(gray, 2), np.rot90(gray, 3)]
+    assert len(scanned) == 3
+    for actual, wanted in zip(scanned, expected):
+        # Exact pixel copies: no interpolation and no cropping
+        assert np.array_equal(actual, wanted)
+    # Preprocessing ran once and is shared with later stages
+    assert len(preprocessed) == 1
+    BarcodeDecoder._stage_preprocessed(ctx)
+    assert len(preprocessed) == 1
+
+
+def test_lossless_rotated_stage_stops_at_the_first_hit(monkeypatch):
+    monkeypatch.setattr(decoders, "ROTATION_MODE", "lossless")
+    monkeypatch.setattr(BarcodeDecoder, "_preprocess_image", staticmethod(lambda frame: frame))
+    scanned = _record_scans(monkeypatch, found=lambda image: ["hit"] if image.shape == (20, 12) else [])
+
+    ctx = BarcodeDecodeContext(np.zeros((12, 20), dtype=np.uint8))
+    assert BarcodeDecoder._stage_rotated(ctx) == ["hit"]
+    assert len(scanned) == 1
+
+
+def test_deskewed_stage_scans_the_frame_rotated_upright(monkeypatch):
+    monkeypatch.setattr(BarcodeDecoder, "_preprocess_image", staticmethod(lambda frame: frame))
+    scanned = _record_scans(monkeypatch)
+
+    BarcodeDecoder._stage_deskewed(BarcodeDecodeContext(_stripes(30)))
+
+    assert len(scanned) == 1
+    h, w = scanned[0].shape
+    assert (h, w) != (300, 400)
+    center = scanned[0][h // 2 - 60:h // 2 + 60, w // 2 - 60:w // 2 + 60]
+    assert abs(BarcodeDecoder._dominant_angle(center)) < 1.0
+
+
+def test_deskewed_stage_skips_axis_aligned_and_textureless_frames(monkeypatch):
+    scanned = _record_scans(monkeypatch)
+
+    for image in (_stripes(0), _stripes(88), np.full((300, 400), 200, dtype=np.uint8)):
+        assert BarcodeDecoder._stage_deskewed(BarcodeDecodeContext(image)) == []
+    assert scanned == []
+
+
+def _photo_with_barcodes(size=(1500, 2000)):
+    """Plain background with a large and a small block of vertical bars"""
+    image = np.full(size, 235, dtype=np.uint8)
+    bars = np.where((np.arange(400) // 6) % 2 == 0, 20, 235).astype(np.uint8)
+    image[900:1100, 1200:1600] = np.tile(bars, (200, 1))
+    image[200:280, 300:460] = np.tile(bars[:160], (80, 1))
+    return image
+
+
+def _contains(region, box):
+    x, y, w, h = region
+    bx, by, bw, bh = box
+    return x <= bx and y <= by and x + w >= bx + bw and y + h >= by + bh
+
+
+def test_locate_regions_returns_padded_boxes_in_full_resolution_largest_first():
+    regions = BarcodeDecoder._locate_regions(_photo_with_barcodes())
+
+    assert len(regions) == 2
+    large, small = regions
+    assert _contains(large, (1200, 900, 400, 200))
+    assert _contains(small, (300, 200, 160, 80))
+    # Padding stays close to the bars
+    assert large[2] * large[3] < 2 * 400 * 200
+
+
+def test_locate_regions_handles_color_input_and_region_limit():
+    color = np.dstack([_photo_with_barcodes()] * 3)
+
+    regions = BarcodeDecoder._locate_regions(color, max_regions=1)
+
+    assert len(regions) == 1
+    assert _contains(regions[0], (1200, 900, 400, 200))
+    assert BarcodeDecoder._locate_regions(np.full((1500, 2000), 235, dtype=np.uint8)) == []
+
+
+def test_localized_stage_scans_only_candidate_crops(monkeypatch):
+    monkeypatch.setattr(decoders, "LOCALIZE_MIN_DIM", 1600)
+    monkeypatch.setattr(BarcodeDecoder, "_preprocess_image", staticmethod(lambda frame: frame))
+    scanned = _record_scans(monkeypatch)
+
+    ctx = BarcodeDecodeContext(_photo_with_barcodes())
+    assert BarcodeDecoder._stage_localized(ctx) == []
+
+    assert len(ctx.rois) == 2
+    # Each crop is scanned raw, then preprocessed
+    assert [image.shape for image in scanned] == [(h, w) for _, _, w, h in ctx.rois for _ in range(2)]
+
+    small = BarcodeDecodeContext(np.zeros((1000, 1500), dtype=np.uint8))
+    assert BarcodeDecoder._stage_localized(small) == []
+    assert small.rois is None
+
+
+def _encode(image, ext=".png"):
+    ok, buffer = cv2.imencode(ext, image)
+    assert ok
+    return buffer.tobytes()
+
+
+def _gif(size=(60, 40), value=200):
+    buffer = io.BytesIO()
+    Image.new("L", size, value).save(buffer, "GIF")
+    return buffer.getvalue()
+
+
+def test_decode_image_scales_16_bit_images_to_8_bit():
+    image = np.zeros((40, 60), dtype=np.uint16)
+    image[:, 30:] = 65535
+    data = _encode(image)
+
+    color = decode_image(data)
+    assert color.dtype == np.uint8 and color.shape == (40, 60, 3)
+    assert color[0, 0].tolist() == [0, 0, 0] and color[0, 59].tolist() == [255, 255, 255]
+
+    gray = decode_image(data, grayscale=True)
+    assert gray.dtype == np.uint8 and gray.shape == (40, 60)
+    assert gray[0, 59] == 255
+
+
+def test_decode_image_composites_alpha_onto_white_in_color_mode_only():
+    image = np.zeros((40, 60, 4), dtype=np.uint8)
+    image[:, :30, 3] = 255  # opaque black on the left, transparent black on the right
+    data = _encode(image)
+
+    color = decode_image(data)
+    assert color.shape == (40, 60, 3)
+    assert color[0, 0].tolist() == [0, 0, 0]
+    assert color[0, 59].tolist() == [255, 255, 255]
+
+    # Grayscale decodes drop the alpha channel
+    assert decode_image(data, grayscale=True)[0, 59] == 0
+
+
+def test_decode_image_falls_back_to_pillow_for_gif():
+    color = decode_image(_gif())
+    assert color.dtype == np.uint8 and color.shape == (40, 60, 3)
+    assert color[0, 0].tolist() == [200, 200, 200]
+
+    assert decode_image(_gif(), grayscale=True).shape == (40, 60)
+    # The fallback also honours the reduced scale
+    assert decode_image(_gif(size=(800, 600)), max_dim=200).shape == (150, 200, 3)
+
+
+def test_decode_image_uses_reduced_modes_for_large_images():
+    data = _encode(np.full((600, 800, 3), 100, dtype=np.uint8), ".jpg")
+
+    # Largest factor that keeps the longest side at or above max_dim
+    assert decode_image(data, max_dim=200).shape == (150, 200, 3)
+    assert decode_image(data, max_dim=300).shape == (300, 400, 3)
+    assert decode_image(data, grayscale=True, max_dim=200).shape == (150, 200)
+    assert decode_image(data, max_dim=0).shape == (600, 800, 3)
+    assert decode_image(data, max_dim=1000).shape == (600, 800, 3)
+
+
+def test_decode_image_composites_large_transparent_images_before_reducing():
+    image = np.zeros((1200, 3400, 4), dtype=np.uint8)
+    image[500:700, 1000:2400, 3] = 255  # an opaque black band on a transparent canvas
+    data = _encode(image)
+
+    color = decode_image(data, max_dim=800)
+    assert color.shape == (300, 850, 3)
+    # Transparent pixels are white, not their stored black
+    assert color[:100].mean() == 255
+    assert color[150, 425].tolist() == [0, 0, 0]
+
+    # Opaque images still take the reduced decode path
+    opaque = _encode(np.full((1200, 3400, 3), 100, dtype=np.uint8))
+    assert decode_image(opaque, max_dim=800).shape == (300, 850, 3)
@@ -0,0 +1,59 @@
+import io
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from PIL import Image
+
+from derivatives import DerivativeStore, ensure_thumbnail, render_thumbnail
+
+
+def _png(size, mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 10, 10, 0) if mode == "RGBA" else (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_thumbnail_is_a_bounded_jpeg(tmp_path):
+    output = render_thumbnail(_png((3000, 1500)), tmp_path / "thumb.jpg", max_dim=600)
+
+    with Image.open(output) as image:
+        assert image.format == "JPEG"
+        assert image.size == (600, 300)
+
+
+def test_transparent_images_are_flattened_onto_white(tmp_path):
+    output = render_thumbnail(_png((40, 40), mode="RGBA"), tmp_path / "thumb.jpg")
+
+    with Image.open(output) as image:
+        assert image.mode == "RGB"
+        assert min(image.getpixel((20, 20))) > 240
+
+
+def test_store_keys_thumbnails_by_content(tmp_path):
+    store = DerivativeStore(tmp_path, max_dim=100)
+    first, second = _png((10, 10)), _png((20, 10))
+
+    assert store.thumbnail_path(first) == store.thumbnail_path(_png((10, 10)))
+    assert store.thumbnail_path(first) != store.thumbnail_path(second)
+    assert DerivativeStore(tmp_path, max_dim=200).thumbnail_path(first) != store.thumbnail_path(first)
+
+
+def test_ensure_reuses_existing_thumbnails_and_prune_drops_stale_ones(tmp_path):
+    store = DerivativeStore(tmp_path, ttl=60)
+    content = _png((50, 50))
+    path = store.thumbnail_path(content)
+
+    ensure_thumbnail(path, content)
+    os.utime(path, (0, 0))
+    # An existing thumbnail is not re-rendered, only marked as recently used
+    assert ensure_thumbnail(path, b"not an image") == str(path)
+    assert store.prune() == 0
+
+    os.utime(path, (0, 0))
+    assert store.prune() == 1
+    assert not path.exists()
@@ -0,0 +1,27 @@
+import io
+import os
+import sys
+import zipfile
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from exports import ZipStream
+
+
+def test_zip_stream_hands_out_a_valid_archive_in_pieces():
+    archive = ZipStream()
+    pieces = [
+        archive.add("Jane_Doe.pdf", b"%PDF-first"),
+        archive.add("Jane_Doe.pdf", b"%PDF-second"),
+        archive.add("scan_report.pdf", b"%PDF-third"),
+    ]
+    assert all(pieces)
+    pieces.append(archive.close())
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(pieces))) as result:
+        assert result.testzip() is None
+        assert result.namelist() == ["Jane_Doe.pdf", "Jane_Doe_2.pdf", "scan_report.pdf"]
+        assert result.read("Jane_Doe_2.pdf") == b"%PDF-second"
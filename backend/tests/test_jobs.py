@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from jobs import ReportJobStore, SQLiteReportJobStore
+
+
+def test_store_evicts_oldest_finished_job_and_its_file(tmp_path):
+    store = ReportJobStore(max_jobs=2)
+    first = store.create("session-a", "a.pdf", tmp_path)
+    second = store.create("session-a", "b.pdf", tmp_path)
+    with open(first.output_path, "wb") as f:
+        f.write(b"%PDF")
+
+    # Both jobs pending: nothing can be evicted
+    assert store.create("session-a", "c.pdf", tmp_path) is None
+
+    store.finish(first)
+    third = store.create("session-a", "c.pdf", tmp_path)
+    assert third is not None
+    assert store.get(first.id, "session-a") is None
+    assert not os.path.exists(first.output_path)
+    assert store.get(second.id, "session-a") is second
+
+
+def test_jobs_are_only_visible_to_their_session(tmp_path):
+    store = ReportJobStore()
+    job = store.create("session-a", "a.pdf", tmp_path)
+
+    assert store.get(job.id, "session-a") is job
+    assert store.get(job.id, "session-b") is None
+
+    store.finish(job, error="boom")
+    assert job.to_dict()["status"] == "failed"
+    assert job.to_dict()["error"] == "boom"
+
+
+def test_sqlite_jobs_are_shared_between_store_instances(tmp_path):
+    # Two stores on one database stand in for two uvicorn workers
+    db_path = tmp_path / "sessions.db"
+    first_worker = SQLiteReportJobStore(db_path)
+    second_worker = SQLiteReportJobStore(db_path)
+
+    job = first_worker.create("session-a", "a.pdf", tmp_path)
+    seen = second_worker.get(job.id, "session-a")
+    assert seen.to_dict() == job.to_dict()
+    assert seen.output_path == job.output_path
+    assert second_worker.get(job.id, "session-b") is None
+
+    first_worker.finish(job, error="boom")
+    assert second_worker.get(job.id, "session-a").to_dict()["error"] == "boom"
+    assert second_worker.stats() == {"jobs": 1, "pending": 0, "max_jobs": 100}
+
+    second_worker.discard_session("session-a")
+    assert first_worker.get(job.id, "session-a") is None
+
+
+def test_sqlite_store_evicts_oldest_finished_job_and_its_file(tmp_path):
+    store = SQLiteReportJobStore(tmp_path / "sessions.db", max_jobs=2)
+    first = store.create("session-a", "a.pdf", tmp_path)
+    second = store.create("session-a", "b.pdf", tmp_path)
+    with open(first.output_path, "wb") as f:
+        f.write(b"%PDF")
+
+    assert store.create("session-a", "c.pdf", tmp_path) is None
+    assert store.stats()["pending"] == 2
+
+    store.finish(first)
+    assert store.create("session-a", "c.pdf", tmp_path) is not None
+    assert store.get(first.id, "session-a") is None
+    assert not os.path.exists(first.output_path)
+    assert store.get(second.id, "session-a") is not None
+
+
+def test_sqlite_store_fails_jobs_left_pending_by_a_dead_worker(tmp_path):
+    store = SQLiteReportJobStore(tmp_path / "sessions.db", max_jobs=2, stale_after=60)
+    abandoned = store.create("session-a", "a.pdf", tmp_path)
+    recent = store.create("session-a", "b.pdf", tmp_path)
+    conn = sqlite3.connect(store.path)
+    with conn:
+        conn.execute("UPDATE report_jobs SET created = ? WHERE id = ?", (time.time() - 120, abandoned.id))
+    conn.close()
+
+    job = store.get(abandoned.id, "session-a")
+    assert job.status == "failed"
+    assert job.error == SQLiteReportJobStore.STALE_ERROR
+    assert store.get(recent.id, "session-a").status == "pending"
+    assert store.stats()["pending"] == 1
+
+    # The failed job no longer holds a max_jobs slot
+    assert store.create("session-a", "c.pdf", tmp_path) is not None
+    assert store.get(abandoned.id, "session-a") is None
@@ -1,6 +1,9 @@
+import asyncio
 import os
 import sys
 import types
+
+import pytest
 from fastapi.testclient import TestClient
 
 # Ensure the backend package root (the folder containing main.py) is on sys.path
@@ -9,11 +12,12 @@ BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
 if BACKEND_ROOT not in sys.path:
     sys.path.insert(0, BACKEND_ROOT)
 
-# The decoders module imports OpenCV (cv2), which is failing to load due to a
-# local NumPy/OpenCV binary mismatch. Our tests only call lightweight
-# endpoints (/health, /session, /reset) that do not use cv2 at all, so we can
-# safely stub cv2 in this test context to allow FastAPI app import.
-if 'cv2' not in sys.modules:
+# OpenCV (cv2) is only used once a decode runs. Where it cannot be imported
+# (e.g. missing system libraries), stub it so the app still imports; tests
+# that need decode results use fake decoders instead.
+try:
+    import cv2  # noqa: F401
+except ImportError:
     sys.modules['cv2'] = types.ModuleType('cv2')
 
 from main import app
@@ -22,24 +26,36 @@ from main import app
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Keep uploads and report thumbnails out of the repository"""
+    import config
+    import main
+    from derivatives import DerivativeStore
+
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    thumbnails = tmp_path / "derivatives"
+    monkeypatch.setattr(config, "UPLOAD_DIR", uploads)
+    monkeypatch.setattr(config, "THUMBNAIL_DIR", str(thumbnails))
+    monkeypatch.setattr(main, "UPLOAD_DIR", uploads)
+    monkeypatch.setattr(main, "derivative_store", DerivativeStore(
+        str(thumbnails), max_dim=config.THUMBNAIL_MAX_DIM, quality=config.THUMBNAIL_QUALITY,
+        ttl=config.SESSION_TTL,
+    ))
+    return uploads
+
+
 def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
 
-def test_session_and_reset_creates_uploads_dir(tmp_path, monkeypatch):
-    # Ensure uploads dir is removed before test
-    uploads_dir = os.path.join(os.path.dirname(__file__), "..", "uploads")
-    uploads_dir = os.path.abspath(uploads_dir)
-    if os.path.exists(uploads_dir):
-        # Best-effort cleanup; tests should still pass if this fails
-        try:
-            import shutil
-
-            shutil.rmtree(uploads_dir)
-        except Exception:
-            pass
+def test_session_and_reset_creates_uploads_dir(isolated_storage):
+    # Start without an uploads dir
+    uploads_dir = str(isolated_storage)
+    os.rmdir(uploads_dir)
 
     # Call session endpoint (should return initial data structure)
     response = client.get("/session")
@@ -55,3 +71,424 @@ def test_session_and_reset_creates_uploads_dir(tmp_path, monkeypatch):
 
     # After reset, uploads dir should exist
     assert os.path.isdir(uploads_dir)
+
+
+def test_upload_rejects_non_image_content():
+    response = client.post(
+        "/upload/checkbook",
+        files={"file": ("scan.png", b"%PDF-1.4 definitely not a png", "image/png")},
+    )
+    assert response.status_code == 415
+    assert "error" in response.json()
+
+
+def test_sessions_are_isolated_per_client():
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+
+    alice = {"X-Session-ID": "alice-session"}
+    bob = {"X-Session-ID": "bob-session"}
+    response = client.post(
+        "/upload/checkbook",
+        files={"file": ("check.png", buffer.getvalue(), "image/png")},
+        headers=alice,
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Session-ID"] == "alice-session"
+
+    assert client.get("/session", headers=alice).json()["checkbook"] is not None
+    assert client.get("/session", headers=bob).json()["checkbook"] is None
+
+    # Resetting one session leaves the other untouched
+    client.post("/reset", headers=bob)
+    assert client.get("/session", headers=alice).json()["checkbook"] is not None
+    client.post("/reset", headers=alice)
+    assert client.get("/session", headers=alice).json()["checkbook"] is None
+
+
+def test_session_polls_revalidate_with_etag():
+    import io
+
+    from PIL import Image
+
+    carol = {"X-Session-ID": "carol-session"}
+    first = client.get("/session", headers=carol)
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/session", headers={**carol, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+    client.post(
+        "/upload/checkbook",
+        files={"file": ("check.png", buffer.getvalue(), "image/png")},
+        headers=carol,
+    )
+
+    changed = client.get("/session", headers={**carol, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["checkbook"]["filename"] == "check.png"
+    client.post("/reset", headers=carol)
+
+
+class _LoopCheckingStore:
+    """Session store proxy that records calls made on the event loop thread"""
+
+    def __init__(self, store):
+        self.store = store
+        self.on_loop = []
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                self.on_loop.append(name)
+            except RuntimeError:
+                pass
+            return method(*args, **kwargs)
+
+        return call
+
+
+def test_session_store_calls_stay_off_the_event_loop(monkeypatch):
+    import io
+
+    import main
+    from PIL import Image
+
+    store = _LoopCheckingStore(main.session_store)
+    monkeypatch.setattr(main, "session_store", store)
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+    response = client.post("/upload/checkbook", files={"file": ("check.png", buffer.getvalue(), "image/png")})
+    assert response.status_code == 200
+    assert client.get("/session").status_code == 200
+    assert client.get("/generate-pdf").status_code == 200
+    assert client.get("/stats").status_code == 200
+    assert client.get("/metrics").status_code == 200
+    assert client.post("/reset").status_code == 200
+
+    assert store.on_loop == []
+
+
+def test_batch_decode_streams_ndjson_items_and_summary():
+    import json
+
+    response = client.post(
+        "/batch/decode",
+        files=[
+            ("files", ("notes.txt", b"not an image", "text/plain")),
+            ("files", ("empty.png", b"", "image/png")),
+        ],
+        data={"kind": "barcode"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    items, summary = lines[:-1], lines[-1]["summary"]
+    assert sorted(item["name"] for item in items) == ["empty.png", "notes.txt"]
+    assert all("error" in item for item in items)
+    assert summary["items"] == 2
+    assert summary["failed"] == 2
+
+
+def test_batch_decode_rejects_archives_that_expand_past_the_byte_budget(monkeypatch):
+    import io
+    import zipfile
+
+    import main
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(4):
+            archive.writestr(f"scan{index}.png", bytes(1024 * 1024))
+    monkeypatch.setattr(main, "BATCH_MAX_TOTAL_BYTES", 2 * 1024 * 1024)
+
+    response = client.post(
+        "/batch/decode",
+        files=[("files", ("scans.zip", buffer.getvalue(), "application/zip"))],
+    )
+    assert response.status_code == 413
+    assert "uncompressed" in response.json()["error"]
+
+
+def _slow_batch_decoder(content):
+    import time
+    from models import Barcode, BarcodeScan
+
+    time.sleep(0.02)
+    return BarcodeScan([Barcode("CODE128", "BATCH")], stage="raw")
+
+
+def test_interactive_decodes_are_not_rejected_while_a_batch_runs(monkeypatch):
+    import asyncio
+    import io
+
+    import main
+    from models import Barcode, BarcodeScan
+    from PIL import Image
+    from workers import WorkerPool
+
+    pool = WorkerPool("decode", workers=2, max_queue=2, use_processes=False)
+    monkeypatch.setattr(main, "decode_pool", pool)
+    monkeypatch.setitem(main.BATCH_DECODERS, "barcode", _slow_batch_decoder)
+    buffer = io.BytesIO()
+    Image.new("L", (8, 8), 255).save(buffer, "PNG")
+    # Trailing bytes keep the images distinct for the result cache
+    images = [buffer.getvalue() + b"batch-%d" % index for index in range(40)]
+
+    def interactive_decoder(content):
+        return BarcodeScan([Barcode("CODE128", "UPLOAD")], stage="raw")
+
+    async def run():
+        batch = [
+            asyncio.ensure_future(main.decode_batch_item(index, f"{index}.png", content, "barcode"))
+            for index, content in enumerate(images)
+        ]
+        await asyncio.sleep(0.01)
+        uploads = []
+        for index in range(5):
+            # The path /upload/barcode takes: no waiting, 503 when full
+            result, _ = await main.cached_decode(
+                "barcode", interactive_decoder, buffer.getvalue() + b"upload-%d" % index
+            )
+            uploads.append(result)
+        assert not all(task.done() for task in batch)
+        return uploads, await asyncio.gather(*batch)
+
+    try:
+        uploads, items = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert [result.barcodes[0].data for result in uploads] == ["UPLOAD"] * 5
+    assert all(item["barcodes"][0]["data"] == "BATCH" for item in items)
+    assert pool.stats()["rejected"] == 0
+
+
+def test_generate_pdf_streams_report_without_writing_uploads():
+    from main import SESSION_HEADER, session_upload_dir
+
+    session_id = client.get("/session").headers[SESSION_HEADER]
+    response = client.get("/generate-pdf", headers={SESSION_HEADER: session_id})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"].startswith('attachment; filename="')
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.content.startswith(b"%PDF")
+    upload_dir = session_upload_dir(session_id)
+    assert not upload_dir.exists() or not list(upload_dir.glob("*.pdf"))
+
+
+def test_bulk_export_streams_a_zip_of_subject_reports(monkeypatch):
+    import io
+    import zipfile
+
+    import main
+    from main import session_store
+    from models import Barcode, BarcodeScan, ScanEntry
+    from sessions import new_session_id
+
+    monkeypatch.setattr(main, "BULK_EXPORT_TOKEN", "export-secret")
+    auth = {"Authorization": "Bearer export-secret"}
+    session_ids = [new_session_id() for _ in range(3)]
+    for session_id in session_ids:
+        session_store.set_item(session_id, "barcode", ScanEntry(BarcodeScan([Barcode("CODE128", "X1")])))
+    empty_session = new_session_id()
+
+    response = client.post("/reports/bulk", json={"sessions": session_ids + [empty_session]}, headers=auth)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["scan_report.pdf", "scan_report_2.pdf", "scan_report_3.pdf"]
+
+    merged = client.post("/reports/bulk", json={"sessions": session_ids, "format": "pdf"}, headers=auth)
+    assert merged.status_code == 200
+    assert merged.content.startswith(b"%PDF")
+
+    assert client.post("/reports/bulk", json={"sessions": [empty_session]}, headers=auth).status_code == 404
+    assert client.post("/reports/bulk", json={"sessions": ["../etc"]}, headers=auth).status_code == 400
+
+
+def test_bulk_export_leaves_a_report_worker_free(monkeypatch):
+    import threading
+    import time
+
+    import main
+    import pdf_generator
+    from main import session_store
+    from models import Barcode, BarcodeScan, ScanEntry
+    from sessions import new_session_id
+    from workers import WorkerPool
+
+    running = [0, 0]  # current, peak
+    lock = threading.Lock()
+
+    def render(report_data):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return {"content": b"%PDF-1.4 fake"}
+
+    pool = WorkerPool("report", workers=3, max_queue=2, use_processes=False)
+    monkeypatch.setattr(main, "report_pool", pool)
+    monkeypatch.setattr(pdf_generator, "render_report_bytes", render)
+    monkeypatch.setattr(main, "BULK_EXPORT_TOKEN", "export-secret")
+    session_ids = [new_session_id() for _ in range(6)]
+    for session_id in session_ids:
+        session_store.set_item(session_id, "barcode", ScanEntry(BarcodeScan([Barcode("CODE128", "X1")])))
+
+    try:
+        response = client.post(
+            "/reports/bulk", json={"sessions": session_ids},
+            headers={"Authorization": "Bearer export-secret"},
+        )
+    finally:
+        pool.shutdown()
+    assert response.status_code == 200
+    assert running[1] == 2
+
+
+def test_bulk_export_requires_the_export_token(monkeypatch):
+    import main
+    from main import session_store
+    from models import Barcode, BarcodeScan, ScanEntry
+    from sessions import new_session_id
+
+    victim = new_session_id()
+    session_store.set_item(victim, "barcode", ScanEntry(BarcodeScan([Barcode("CODE128", "PII")])))
+    body = {"sessions": [victim], "format": "pdf"}
+
+    monkeypatch.setattr(main, "BULK_EXPORT_TOKEN", "")
+    assert client.post("/reports/bulk", json=body).status_code == 403
+
+    monkeypatch.setattr(main, "BULK_EXPORT_TOKEN", "export-secret")
+    assert client.post("/reports/bulk", json=body).status_code == 401
+    wrong = client.post("/reports/bulk", json=body, headers={"Authorization": "Bearer guess"})
+    assert wrong.status_code == 401
+    assert wrong.headers["www-authenticate"] == "Bearer"
+
+
+def _fake_frame_decoder(content):
+    from models import Barcode, BarcodeScan, DecodeFailure
+
+    if content.endswith(b"\x00miss"):
+        return DecodeFailure("No barcode detected")
+    return BarcodeScan([Barcode("CODE128", "FRAME-42")], stage="raw")
+
+
+def test_frame_scan_websocket_returns_the_value_frames_agree_on(monkeypatch):
+    import io
+    import main
+    from PIL import Image
+    from sessions import new_session_id
+    from workers import WorkerPool
+
+    monkeypatch.setattr(main, "decode_pool", WorkerPool("decode", workers=1, use_processes=False))
+    monkeypatch.setitem(main.FRAME_DECODERS, "barcode", _fake_frame_decoder)
+    buffer = io.BytesIO()
+    Image.new("L", (32, 32), 255).save(buffer, "PNG")
+    frame = buffer.getvalue()
+    session_id = new_session_id()
+
+    with client.websocket_connect(f"/ws/scan?kind=barcode&session_id={session_id}") as websocket:
+        websocket.send_bytes(b"not an image")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_bytes(frame + b"\x00miss")
+        assert websocket.receive_json()["type"] == "no_match"
+        websocket.send_bytes(frame)
+        candidate = websocket.receive_json()
+        websocket.send_bytes(frame)
+        message = websocket.receive_json()
+
+    assert candidate == {"type": "candidate", "votes": 1, "needed": 2, "frames": 2, "dropped": 0}
+    assert message["type"] == "result"
+    barcode = message["data"]["barcodes"][0]
+    assert (barcode["data"], barcode["quality"], barcode["votes"]) == ("FRAME-42", "consensus", 2)
+    assert message["frames"] == 3
+    assert main.session_store.get(session_id)["barcode"].result.barcodes[0].data == "FRAME-42"
+
+
+def test_metrics_endpoint_reports_request_latency_by_route():
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'scanner_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert "# TYPE scanner_stage_seconds histogram" in body
+    assert 'scanner_pool_jobs{pool="decode",state="in_flight"}' in body
+    assert "scanner_sessions_active" in body
+
+
+def test_requests_get_trace_id_server_timing_and_slow_trace_lookup(monkeypatch):
+    import io
+    import main
+    from PIL import Image
+    from tracing import TraceBuffer
+
+    monkeypatch.setattr(main, "slow_traces", TraceBuffer(max_entries=10, slow_ms=0))
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+    dave = {"X-Session-ID": "dave-session", "X-Trace-ID": "dave-trace-0001"}
+    response = client.post(
+        "/upload/checkbook",
+        files={"file": ("check.png", buffer.getvalue(), "image/png")},
+        headers=dave,
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Trace-ID"] == "dave-trace-0001"
+    timing = response.headers["Server-Timing"]
+    for phase in ("upload_read", "upload_write", "session_update", "total"):
+        assert f"{phase};dur=" in timing
+
+    trace = client.get("/traces/dave-trace-0001").json()
+    assert trace["path"] == "/upload/checkbook"
+    assert trace["status"] == 200
+    assert "session_update" in [phase["name"] for phase in trace["phases"]]
+    assert client.get("/traces").json()["traces"][0]["trace_id"] != ""
+    assert client.get("/traces/unknown-trace").status_code == 404
+
+    # Invalid client IDs are replaced
+    assert client.get("/health", headers={"X-Trace-ID": "bad id"}).headers["X-Trace-ID"] != "bad id"
+    client.post("/reset", headers=dave)
+
+
+def test_ready_reports_ready_only_after_warm_up(monkeypatch):
+    import asyncio
+    import main
+    from workers import WorkerPool
+
+    started = []
+    monkeypatch.setattr(main, "warmup", {"status": "pending", "seconds": None, "error": None})
+    monkeypatch.setattr(main, "decode_pool", WorkerPool(
+        "decode", workers=2, use_processes=False, initializer=lambda: started.append("decode")
+    ))
+    monkeypatch.setattr(main, "report_pool", WorkerPool(
+        "report", workers=1, use_processes=False, initializer=lambda: started.append("report")
+    ))
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "pending"
+    assert client.get("/health").status_code == 200
+
+    asyncio.run(main.warm_up())
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert sorted(started) == ["decode", "decode", "report"]
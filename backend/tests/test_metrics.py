@@ -0,0 +1,48 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import metrics
+from metrics import Counter, Histogram, Registry, collect_spans, stage_timer
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("job_seconds", "Job time", ("kind",), buckets=(0.1, 1.0)))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.1, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5.0, "a")
+    counter = registry.register(Counter("jobs_total", "Jobs", ("kind",)))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE job_seconds histogram" in lines
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 2' in lines
+    assert 'job_seconds_bucket{kind="a",le="1"} 3' in lines
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 4' in lines
+    assert 'job_seconds_sum{kind="a"} 5.65' in lines
+    assert 'job_seconds_count{kind="a"} 4' in lines
+    assert 'jobs_total{kind="a"} 3' in lines
+
+
+def test_spans_are_collected_inside_jobs_and_recorded_later():
+    def job():
+        with stage_timer("test_stage"):
+            return "done"
+
+    before = metrics.STAGE_SECONDS.count("test_stage")
+    result, spans, seconds = collect_spans(job)
+    assert result == "done"
+    assert seconds >= spans[0][1]
+    assert [name for name, _ in spans] == ["test_stage"]
+    # Held for the caller instead of recorded in the job's process
+    assert metrics.STAGE_SECONDS.count("test_stage") == before
+
+    metrics.record_spans(spans)
+    assert metrics.STAGE_SECONDS.count("test_stage") == before + 1
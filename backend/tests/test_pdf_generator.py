@@ -0,0 +1,61 @@
+import io
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from models import AAMVARecord, Barcode, BarcodeScan, PDF417Code, PDF417Scan, ScanEntry
+from pdf_generator import PDFReportGenerator, ReportTemplate
+from sessions import empty_session_data
+
+
+def test_generators_share_one_compiled_template():
+    first, second = PDFReportGenerator(io.BytesIO()), PDFReportGenerator(io.BytesIO())
+
+    assert first.template is second.template is ReportTemplate.shared()
+    assert "SectionHeader" in first.styles
+
+
+def test_field_values_are_filled_in_verbatim():
+    paragraph = ReportTemplate.shared().field("Street Address", "1 <Main> & Co")
+
+    assert "".join(frag.text for frag in paragraph.frags) == "Street Address: 1 <Main> & Co"
+    assert paragraph.frags[0].text == "Street Address:" and paragraph.frags[0].bold
+    assert not any(frag.bold for frag in paragraph.frags[1:])
+
+
+def test_report_renders_markup_characters_in_data():
+    data = empty_session_data()
+    data["barcode"] = ScanEntry(BarcodeScan([Barcode("CODE128", "A&B<C>")]))
+    data["pdf417"] = ScanEntry(PDF417Scan([
+        PDF417Code("@...", AAMVARecord({"DCS": "O'NEIL & SONS", "DAC": "<JO>"})),
+    ]))
+    output = io.BytesIO()
+
+    result = PDFReportGenerator(output).generate_report(data)
+
+    assert result.get("success"), result
+    assert output.getvalue().startswith(b"%PDF")
+
+
+def test_bulk_report_lists_each_subject_in_contents():
+    subjects = []
+    for first, last in (("JANE", "DOE"), ("JOHN", "ROE")):
+        data = empty_session_data()
+        data["pdf417"] = ScanEntry(PDF417Scan([
+            PDF417Code("@...", AAMVARecord({"DAC": first, "DCS": last})),
+        ]))
+        subjects.append(data)
+    subjects.append(empty_session_data())
+    output = io.BytesIO()
+
+    result = PDFReportGenerator(output).generate_bulk_report(subjects)
+
+    assert result.get("success"), result
+    pdf = output.getvalue()
+    assert pdf.startswith(b"%PDF")
+    for title in (b"JANE_DOE", b"JOHN_ROE", b"Scan Report 3"):
+        assert b"/Title (" + title in pdf.replace(b"\\376\\377", b"")
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from pipeline import DecodeStage, DecodePipeline
+
+
+def _stages(calls, hits):
+    def make(name):
+        def func(ctx):
+            calls.append(name)
+            return ["code"] if name in hits else []
+        return func
+
+    return [
+        DecodeStage("cheap", make("cheap"), cost=1),
+        DecodeStage("medium", make("medium"), cost=10),
+        DecodeStage("expensive", make("expensive"), cost=100),
+    ]
+
+
+def test_pipeline_stops_at_first_successful_stage():
+    calls = []
+    pipeline = DecodePipeline(_stages(calls, hits={"medium", "expensive"}))
+
+    objects, stage, timings = pipeline.run(None)
+
+    assert objects == ["code"]
+    assert stage == "medium"
+    assert calls == ["cheap", "medium"]
+    assert set(timings) == {"cheap", "medium"}
+
+
+def test_pipeline_order_can_reorder_and_disable_stages():
+    calls = []
+    pipeline = DecodePipeline(_stages(calls, hits=set()), order=["expensive", "cheap"])
+
+    objects, stage, _ = pipeline.run(None)
+
+    assert objects == [] and stage is None
+    assert calls == ["expensive", "cheap"]
+
+    with pytest.raises(ValueError):
+        pipeline.configure(["missing"])
+
+
+def test_adaptive_pipeline_prefers_stages_that_hit():
+    calls = []
+    pipeline = DecodePipeline(_stages(calls, hits={"expensive"}), adaptive=True, min_samples=3)
+    for _ in range(13):
+        pipeline.run(None)
+
+    # "medium" never hits, so the always-successful expensive stage is now
+    # cheaper per decode; "cheap" stays first because trying it costs little.
+    assert [stage.name for stage in pipeline.ordered_stages()] == ["cheap", "expensive", "medium"]
+
+
+def test_adaptive_ordering_starts_before_rarely_run_fallbacks_are_sampled():
+    # Stage names and costs of the barcode pipeline; each image is read by
+    # exactly one stage, with hit rates like real uploads
+    costs = {"localized": 40, "raw": 15, "preprocessed": 60, "upscaled": 250, "rotated": 30, "deskewed": 25}
+
+    def make(name):
+        return DecodeStage(name, lambda readable_by: ["code"] if readable_by == name else [], cost=costs[name])
+
+    pipeline = DecodePipeline([make(name) for name in costs], adaptive=True, min_samples=20)
+    traffic = ["raw"] * 12 + ["preprocessed"] * 5 + ["localized"] * 2 + ["deskewed"]
+    for _ in range(5):
+        for readable_by in traffic:
+            pipeline.run(readable_by)
+
+    # The fallbacks ran only 5 times each, too few to be ranked, so they keep
+    # their slots while the stages that did run are re-ordered
+    assert pipeline.stats.get("deskewed")["attempts"] == 5
+    assert [stage.name for stage in pipeline.ordered_stages()] == [
+        "raw", "preprocessed", "localized", "upscaled", "rotated", "deskewed",
+    ]
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from preprocessing import ImageQuality, analyze_image, plan_preprocessing
+
+
+def _bars(low=0, high=255, size=(300, 400), bar=4):
+    """Vertical bars, small enough that analysis needs no downscaling"""
+    row = np.where((np.arange(size[1]) // bar) % 2 == 0, low, high)
+    return np.tile(row, (size[0], 1)).astype(np.uint8)
+
+
+def test_noise_estimate_ignores_bar_edges():
+    clean = _bars(40, 200)
+    rng = np.random.default_rng(0)
+    noisy = np.clip(clean + rng.normal(0, 12, clean.shape), 0, 255).astype(np.uint8)
+
+    assert analyze_image(clean).noise < 1.0
+    assert 8.0 < analyze_image(noisy).noise < 16.0
+
+
+def test_contrast_and_sharpness_are_measured_relative_to_the_range():
+    full, dim = analyze_image(_bars(0, 255)), analyze_image(_bars(110, 150))
+
+    assert full.contrast == 1.0
+    assert dim.contrast < 0.2
+    assert abs(full.sharpness - dim.sharpness) < 1e-6
+
+
+def test_plan_only_adds_the_operations_a_frame_needs():
+    clean = plan_preprocessing(ImageQuality(sharpness=0.2, contrast=0.8, noise=1.0), (1200, 1600))
+    assert (clean.scale, clean.denoise, clean.equalize) == (1.0, 0, False)
+
+    poor = plan_preprocessing(ImageQuality(sharpness=0.2, contrast=0.1, noise=15.0), (1200, 1600))
+    assert (poor.scale, poor.denoise, poor.equalize) == (1.0, 5, True)
+
+    blurred = plan_preprocessing(ImageQuality(sharpness=0.01, contrast=0.8, noise=1.0), (1200, 1600))
+    assert blurred.scale == 0.5
+    small_blurred = plan_preprocessing(ImageQuality(sharpness=0.01, contrast=0.8, noise=1.0), (480, 640))
+    assert small_blurred.scale == 1.0
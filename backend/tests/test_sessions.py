@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from models import Barcode, BarcodeScan, PDF417Scan, ScanEntry
+from sessions import MemorySessionStore, SQLiteSessionStore, is_valid_session_id, session_to_dict, session_to_json
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(ttl=60)
+    return SQLiteSessionStore(tmp_path / "sessions.db", ttl=60)
+
+
+def test_store_keeps_sessions_separate(store):
+    store.set_item("session-a", "barcode", ScanEntry(BarcodeScan([Barcode("CODE128", "123")]), None, "a.png"))
+
+    entry = store.get("session-a")["barcode"]
+    assert entry.result.barcodes[0].data == "123"
+    assert entry.filename == "a.png"
+    assert "barcode" in store.get("session-a")["timestamps"]
+    assert store.get("session-b")["barcode"] is None
+
+    store.reset("session-a")
+    assert store.get("session-a")["barcode"] is None
+
+
+def test_store_purges_idle_sessions(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("sessions.time.time", lambda: now[0])
+    store.set_item("old-session", "pdf417", ScanEntry(PDF417Scan([])))
+    now[0] += 30
+    store.set_item("new-session", "pdf417", ScanEntry(PDF417Scan([])))
+    now[0] += 40
+
+    assert store.purge_expired() == ["old-session"]
+    assert store.count() == 1
+
+
+def test_session_json_matches_dict_form(store):
+    store.set_item("session-a", "barcode", ScanEntry(BarcodeScan([Barcode("EAN13", "4006381333931")], stage="raw")))
+    data = store.get("session-a")
+
+    assert json.loads(session_to_json(data)) == session_to_dict(data)
+    assert session_to_dict(data)["barcode"]["barcodes"] == [
+        {"type": "EAN13", "data": "4006381333931", "quality": "detected"}
+    ]
+
+
+def test_session_json_etag_changes_only_on_update(store):
+    body, etag = store.get_json("session-a")
+    assert store.get_json("session-a") == (body, etag)
+
+    store.set_item("session-a", "barcode", ScanEntry(BarcodeScan([Barcode("QRCODE", "hello")])))
+    updated_body, updated_etag = store.get_json("session-a")
+
+    assert updated_etag != etag
+    assert json.loads(updated_body)["barcode"]["barcodes"][0]["data"] == "hello"
+    assert store.get_json("session-a") == (updated_body, updated_etag)
+
+
+def test_reading_unknown_sessions_does_not_store_them(store):
+    assert store.get("unknown-session") == {
+        "barcode": None, "pdf417": None, "checkbook": None, "card_front": None, "card_back": None,
+        "timestamps": {},
+    }
+    body, _ = store.get_json("unknown-session")
+    assert json.loads(body)["barcode"] is None
+    assert store.count() == 0
+
+    store.set_item("unknown-session", "pdf417", ScanEntry(PDF417Scan([])))
+    assert store.count() == 1
+    assert json.loads(store.get_json("unknown-session")[0])["pdf417"] is not None
+
+
+def test_session_ids_must_be_safe_directory_names():
+    assert is_valid_session_id("0123456789abcdef")
+    assert not is_valid_session_id("../../etc")
+    assert not is_valid_session_id("short")
+    assert not is_valid_session_id(None)
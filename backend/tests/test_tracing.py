@@ -0,0 +1,54 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from metrics import stage_timer
+from tracing import Trace, TraceBuffer, current_trace, end_trace, is_valid_trace_id, start_trace
+
+
+def test_trace_sums_repeated_phases_into_server_timing():
+    trace, token = start_trace("trace-0001", "POST", "/upload/barcode")
+    try:
+        assert current_trace() is trace
+        with stage_timer("upload_read"):
+            pass
+        trace.add("pyzbar", 0.002)
+        trace.add("pyzbar", 0.003)
+    finally:
+        end_trace(token)
+    assert current_trace() is None
+    trace.finish(200)
+
+    phases = trace.phases()
+    assert list(phases) == ["upload_read", "pyzbar"]
+    assert phases["pyzbar"] == (5.0, 2)
+    header = trace.server_timing()
+    assert 'pyzbar;dur=5.00;desc="2x"' in header
+    assert header.startswith("upload_read;dur=")
+    assert header.split(", ")[-1].startswith("total;dur=")
+
+
+def test_buffer_keeps_only_recent_slow_traces():
+    buffer = TraceBuffer(max_entries=2, slow_ms=100)
+    traces = []
+    for n, seconds in enumerate((0.05, 0.2, 0.3, 0.4)):
+        trace = Trace(f"trace-{n:04d}", "GET", "/session")
+        trace.duration = seconds
+        traces.append(trace)
+        buffer.add(trace)
+
+    assert [trace.trace_id for trace in buffer.recent()] == ["trace-0003", "trace-0002"]
+    assert buffer.get("trace-0003") is traces[3]
+    assert buffer.get("trace-0000") is None
+    assert buffer.get("trace-0001") is None
+
+
+def test_trace_ids_are_validated():
+    assert is_valid_trace_id("0123abcd-ef")
+    assert not is_valid_trace_id("short")
+    assert not is_valid_trace_id("bad id with spaces")
+    assert not is_valid_trace_id(None)
@@ -0,0 +1,172 @@
+import asyncio
+import io
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import uploads
+from uploads import (
+    BodySizeLimit,
+    ByteBudget,
+    UploadRejected,
+    expand_archive,
+    inspect_image,
+    read_upload,
+    sniff_image_type,
+)
+
+
+class FakeUpload:
+    """Minimal async stand-in for starlette's UploadFile"""
+
+    def __init__(self, content):
+        self._stream = io.BytesIO(content)
+        self.size = None
+
+    async def read(self, size=-1):
+        return self._stream.read(size)
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new("L", (width, height)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_sniff_image_type_uses_magic_bytes_not_names():
+    assert sniff_image_type(_png(2, 2)) == ".png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0rest") == ".jpg"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ".webp"
+    assert sniff_image_type(b"%PDF-1.4") is None
+
+
+def test_inspect_image_rejects_unsupported_types():
+    with pytest.raises(UploadRejected) as excinfo:
+        inspect_image(b"%PDF-1.4 not an image")
+    assert excinfo.value.status_code == 415
+
+
+def test_inspect_image_rejects_too_many_pixels(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_IMAGE_PIXELS", 100)
+    assert inspect_image(_png(10, 10)) == (".png", (10, 10))
+    with pytest.raises(UploadRejected) as excinfo:
+        inspect_image(_png(20, 10))
+    assert excinfo.value.status_code == 413
+
+
+def test_read_upload_stops_at_size_limit(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+    assert asyncio.run(read_upload(FakeUpload(b"12345678"), max_size=8)) == b"12345678"
+    with pytest.raises(UploadRejected) as excinfo:
+        asyncio.run(read_upload(FakeUpload(b"123456789"), max_size=8))
+    assert excinfo.value.status_code == 413
+
+
+def _zip_of_zeros(members, size):
+    """Small zip that inflates to ``members * size`` bytes"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(members):
+            archive.writestr(f"zeros{index}.png", bytes(size))
+    return buffer.getvalue()
+
+
+def test_expand_archive_shares_one_budget_across_members_and_archives():
+    content = _zip_of_zeros(3, 1024 * 1024)
+    assert len(content) < 20 * 1024
+
+    budget = ByteBudget(8 * 1024 * 1024)
+    members = expand_archive("first.zip", content, budget=budget)
+    assert [name for name, _ in members] == [f"first.zip/zeros{i}.png" for i in range(3)]
+    assert budget.used == 3 * 1024 * 1024
+
+    # A second archive in the same batch draws on what is left
+    with pytest.raises(UploadRejected) as excinfo:
+        expand_archive("second.zip", _zip_of_zeros(6, 1024 * 1024), budget=budget)
+    assert excinfo.value.status_code == 413
+
+
+def test_expand_archive_stops_inflating_a_member_once_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 64 * 1024)
+    # One 40MB member, under MAX_FILE_SIZE, compressed to about 40KB
+    content = _zip_of_zeros(1, 40 * 1024 * 1024)
+    assert len(content) < 64 * 1024
+
+    budget = ByteBudget(1024 * 1024)
+    with pytest.raises(UploadRejected) as excinfo:
+        expand_archive("bomb.zip", content, budget=budget)
+    assert excinfo.value.status_code == 413
+    # Rejected within one chunk of the limit, not after inflating 40MB
+    assert budget.used <= budget.limit + 64 * 1024
+
+
+def test_expand_archive_charges_tar_members_too():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        info = tarfile.TarInfo("zeros.png")
+        info.size = 2 * 1024 * 1024
+        archive.addfile(info, io.BytesIO(bytes(info.size)))
+
+    with pytest.raises(UploadRejected):
+        expand_archive("scans.tar.gz", buffer.getvalue(), budget=ByteBudget(1024 * 1024))
+
+
+def _limited_app(calls):
+    from fastapi import FastAPI, File, UploadFile
+
+    app = FastAPI()
+    app.add_middleware(BodySizeLimit, max_size=1024, limits={"/big": 4096})
+
+    @app.post("/upload")
+    @app.post("/big")
+    async def upload(file: UploadFile = File(...)):
+        calls.append(file.filename)
+        return {"size": len(await file.read())}
+
+    return app
+
+
+def test_body_size_limit_rejects_declared_length_before_parsing():
+    from fastapi.testclient import TestClient
+
+    calls = []
+    client = TestClient(_limited_app(calls))
+
+    assert client.post("/upload", files={"file": ("a.bin", b"x" * 500)}).json() == {"size": 500}
+    response = client.post("/upload", files={"file": ("a.bin", b"x" * 2000)})
+    assert response.status_code == 413
+    assert "limit" in response.json()["error"]
+    # Per-path limits
+    assert client.post("/big", files={"file": ("a.bin", b"x" * 2000)}).json() == {"size": 2000}
+    assert calls == ["a.bin", "a.bin"]
+
+
+def test_body_size_limit_cuts_off_chunked_bodies():
+    from fastapi.testclient import TestClient
+
+    calls = []
+    client = TestClient(_limited_app(calls))
+    boundary = "limit-test"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.bin\"\r\n\r\n"
+    ).encode() + b"x" * 5000 + f"\r\n--{boundary}--\r\n".encode()
+
+    def chunks():
+        for start in range(0, len(body), 512):
+            yield body[start:start + 512]
+
+    # A generator body is sent chunked, without a Content-Length
+    response = client.post(
+        "/upload", content=chunks(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert calls == []
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from workers import LatestValue, WorkerPool, PoolSaturatedError, PoolTimeoutError
+
+
+def _block(event):
+    event.wait(5)
+    return "done"
+
+
+def test_pool_runs_jobs_and_reports_stats():
+    pool = WorkerPool("test", workers=2, max_queue=0, use_processes=False)
+
+    async def run():
+        return await asyncio.gather(*(pool.submit(pow, 2, n) for n in range(2)))
+
+    assert asyncio.run(run()) == [1, 2]
+    stats = pool.stats()
+    assert stats["submitted"] == 2
+    assert stats["completed"] == 2
+    assert stats["in_flight"] == 0
+    pool.shutdown()
+
+
+def test_pool_rejects_when_queue_is_full():
+    pool = WorkerPool("test", workers=1, max_queue=1, use_processes=False)
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(pool.submit(_block, release))
+        queued = asyncio.ensure_future(pool.submit(_block, release))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturatedError):
+            await pool.submit(_block, release)
+        # Waiting submissions get a slot once one frees up.
+        waiting = asyncio.ensure_future(pool.submit(pow, 3, 2, wait=True))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(running, queued, waiting)
+
+    assert asyncio.run(run()) == ["done", "done", 9]
+    assert pool.stats()["rejected"] == 1
+    pool.shutdown()
+
+
+def test_waiting_jobs_leave_queue_slots_to_interactive_jobs():
+    pool = WorkerPool("test", workers=2, max_queue=2, use_processes=False)
+    release = threading.Event()
+
+    async def run():
+        batch = [asyncio.ensure_future(pool.submit(_block, release, wait=True)) for _ in range(40)]
+        await asyncio.sleep(0)
+        assert pool.stats()["in_flight"] == 2
+        # Both queue slots are still free for jobs that must not wait
+        interactive = [asyncio.ensure_future(pool.submit(pow, 2, n)) for n in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*interactive), await asyncio.gather(*batch)
+
+    interactive, batch = asyncio.run(run())
+    assert interactive == [1, 2]
+    assert batch == ["done"] * 40
+    assert pool.stats()["rejected"] == 0
+    pool.shutdown()
+
+
+def test_pool_timeout_keeps_slot_until_job_finishes():
+    pool = WorkerPool("test", workers=1, max_queue=0, timeout=0.05, use_processes=False)
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(PoolTimeoutError):
+            await pool.submit(_block, release)
+        assert pool.stats()["in_flight"] == 1
+        release.set()
+        while pool.stats()["in_flight"]:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert pool.stats()["timed_out"] == 1
+    pool.shutdown()
+
+
+def test_pool_timeout_can_be_raised_per_job():
+    pool = WorkerPool("test", workers=1, max_queue=0, timeout=0.05, use_processes=False)
+    release = threading.Event()
+
+    async def run():
+        job = asyncio.ensure_future(pool.submit(_block, release, timeout=5))
+        await asyncio.sleep(0.1)
+        release.set()
+        return await job
+
+    assert asyncio.run(run()) == "done"
+    assert pool.stats()["timed_out"] == 0
+    pool.shutdown()
+
+
+def test_latest_value_keeps_only_the_newest_unread_value():
+    async def run():
+        slot = LatestValue()
+        slot.put("frame-1")
+        slot.put("frame-2")
+        slot.put("frame-3")
+        newest = await slot.get()
+
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        slot.put("frame-4")
+        next_value = await waiter
+
+        slot.close()
+        return newest, next_value, await slot.get(), slot.dropped
+
+    assert asyncio.run(run()) == ("frame-3", "frame-4", None, 2)
+
+
+def test_warm_up_starts_every_worker_through_the_initializer():
+    started = []
+    pool = WorkerPool(
+        "test", workers=3, use_processes=False,
+        initializer=lambda: started.append(threading.current_thread().name),
+    )
+    asyncio.run(pool.warm_up())
+    assert len(set(started)) == 3
+    assert pool.stats()["completed"] == 3
+    pool.shutdown()
+
+
+def test_warm_up_starts_every_worker_process():
+    pool = WorkerPool("test", workers=3, use_processes=True)
+    asyncio.run(pool.warm_up())
+    assert len(pool._executor._processes) == 3
+    assert pool.stats()["completed"] == 3
+    pool.shutdown()
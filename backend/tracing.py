@@ -0,0 +1,153 @@
+"""Per-request traces: a trace ID and the time spent in each phase.
+
+Every HTTP request gets a ``Trace`` (see the middleware in ``main.py``),
+held in a context variable so stage timers anywhere in the request's task,
+or in threads it starts, add their phases to it (``metrics.record_stage``).
+Phases measured inside worker pool jobs are added when the job's result
+comes back.
+
+The phases are returned in a ``Server-Timing`` header. Traces slower than
+a threshold are kept in a bounded ``TraceBuffer`` so a slow request
+reported by a user can be looked up by its trace ID afterwards.
+"""
+
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+
+TRACE_HEADER = "X-Trace-ID"
+
+# Client-supplied trace IDs are echoed into headers and logs, so only
+# accept short IDs of safe characters
+TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+_current = ContextVar("trace", default=None)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def is_valid_trace_id(trace_id):
+    return bool(trace_id) and TRACE_ID_PATTERN.match(trace_id) is not None
+
+
+class Trace:
+    """Phases of one request, in the order they finished"""
+
+    __slots__ = ("trace_id", "method", "path", "status", "started_at", "_started", "duration", "spans")
+
+    def __init__(self, trace_id, method, path):
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        # (name, seconds) pairs; list.append is atomic, so threads started
+        # by the request can add to it directly
+        self.spans = []
+
+    def add(self, name, seconds):
+        self.spans.append((name, seconds))
+
+    def finish(self, status):
+        self.status = status
+        self.duration = time.perf_counter() - self._started
+
+    def phases(self):
+        """``{name: (total_ms, count)}`` in first-seen order.
+
+        Repeated phases (pyzbar runs once per decode attempt) are summed.
+        Phases may nest: ``pyzbar`` time is also part of the ``attempt_*``
+        phase that ran it.
+        """
+        phases = {}
+        for name, seconds in self.spans:
+            total, count = phases.get(name, (0.0, 0))
+            phases[name] = (total + seconds * 1000.0, count + 1)
+        return phases
+
+    def server_timing(self):
+        """``Server-Timing`` header value, ending with the total so far"""
+        entries = []
+        for name, (ms, count) in self.phases().items():
+            entry = f"{name};dur={ms:.2f}"
+            if count > 1:
+                entry += f';desc="{count}x"'
+            entries.append(entry)
+        total = self.duration if self.duration is not None else time.perf_counter() - self._started
+        entries.append(f"total;dur={total * 1000.0:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000.0, 3) if self.duration is not None else None,
+            "phases": [
+                {"name": name, "ms": round(ms, 3), "count": count}
+                for name, (ms, count) in self.phases().items()
+            ],
+        }
+
+
+class TraceBuffer:
+    """Ring of the most recent traces that took at least ``slow_ms``"""
+
+    def __init__(self, max_entries=100, slow_ms=1000.0):
+        self.slow_ms = slow_ms
+        self._traces = deque(maxlen=max(1, int(max_entries)))
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        """Keep ``trace`` if it was slow; returns whether it was kept"""
+        if trace.duration is None or trace.duration * 1000.0 < self.slow_ms:
+            return False
+        with self._lock:
+            self._traces.append(trace)
+        return True
+
+    def recent(self, limit=None):
+        """Kept traces, newest first"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return traces[:limit] if limit is not None else traces
+
+    def get(self, trace_id):
+        with self._lock:
+            for trace in reversed(self._traces):
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+    def __len__(self):
+        return len(self._traces)
+
+
+def start_trace(trace_id, method, path):
+    """Make a new trace current; returns ``(trace, token)`` for ``end_trace``"""
+    trace = Trace(trace_id, method, path)
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+def current_trace():
+    return _current.get()
+
+
+def add_span(name, seconds):
+    """Add a phase to the current request's trace, if there is one"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
@@ -0,0 +1,267 @@
+import io
+import tarfile
+import zipfile
+
+from PIL import Image
+from starlette.requests import ClientDisconnect
+from starlette.responses import JSONResponse
+
+from config import (
+    MAX_FILE_SIZE,
+    ALLOWED_EXTENSIONS,
+    MAX_IMAGE_PIXELS,
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_TOTAL_BYTES,
+)
+from metrics import stage_timer
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Room for multipart boundaries, part headers and form fields on top of the
+# file bytes themselves
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Leading bytes of each supported image format
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tiff"),
+    (b"MM\x00*", ".tiff"),
+]
+
+
+class UploadRejected(Exception):
+    """Raised when an upload fails validation; carries the HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_image_type(content):
+    """Return the file extension matching the image's magic bytes, or None"""
+    head = bytes(content[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _too_large(what, max_size):
+    return UploadRejected(f"{what} too large: limit is {max_size // (1024 * 1024)}MB", status_code=413)
+
+
+class BodySizeLimit:
+    """ASGI middleware that rejects oversized request bodies with 413.
+
+    Starlette receives the whole multipart body, spooling files to disk,
+    before an endpoint runs, so the per-file checks in ``read_upload`` come
+    too late to save that work. This middleware sits in front of it: a
+    ``Content-Length`` over the limit is rejected before any of the body is
+    read, and bodies without one (chunked) are counted as they arrive and
+    cut off once they pass the limit. ``limits`` maps paths to their own
+    limits; other requests get ``max_size``.
+    """
+
+    def __init__(self, app, max_size, limits=None):
+        self.app = app
+        self.max_size = max_size
+        self.limits = limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        max_size = self.limits.get(scope["path"], self.max_size)
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > max_size:
+            await self._reject(scope, receive, send, max_size)
+            return
+        
+        received = 0
+        rejected = False
+        response_started = False
+        
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # The endpoint sees a disconnect and stops parsing; its
+                    # error response is dropped in favour of the 413.
+                    rejected = True
+                    if not response_started:
+                        await self._reject(scope, receive, send, max_size)
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except ClientDisconnect:
+            # Raised by our own cut-off; the 413 has already been sent
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(scope, receive, send, max_size):
+        response = JSONResponse(status_code=413, content={"error": str(_too_large("Request", max_size))})
+        await response(scope, receive, send)
+
+
+async def read_upload(upload, max_size=MAX_FILE_SIZE):
+    """Read an upload in chunks, failing once it exceeds ``max_size``.
+
+    By the time an endpoint runs Starlette has already received the whole
+    request body, so this bounds the memory used for one file, not the
+    upload itself; ``BodySizeLimit`` caps the request before it is parsed.
+    """
+    if upload.size is not None and upload.size > max_size:
+        raise _too_large("File", max_size)
+    
+    buffer = bytearray()
+    with stage_timer("upload_read"):
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(buffer) + len(chunk) > max_size:
+                raise _too_large("File", max_size)
+            buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def inspect_image(content):
+    """Validate image bytes without decoding pixel data.
+
+    Checks the real format against ALLOWED_EXTENSIONS and the pixel count
+    from the image header against MAX_IMAGE_PIXELS. Returns
+    ``(extension, (width, height))``.
+    """
+    if not content:
+        raise UploadRejected("Empty file")
+    
+    extension = sniff_image_type(content)
+    if extension is None or extension not in ALLOWED_EXTENSIONS:
+        allowed = ", ".join(sorted(ALLOWED_EXTENSIONS))
+        raise UploadRejected(f"Unsupported image type (allowed: {allowed})", status_code=415)
+    
+    try:
+        # Image.open only parses the header; pixel data is never loaded.
+        with Image.open(io.BytesIO(content)) as image:
+            width, height = image.size
+    except Exception as e:
+        raise UploadRejected(f"Unreadable image: {e}")
+    
+    if width * height > MAX_IMAGE_PIXELS:
+        raise UploadRejected(
+            f"Image too large: {width}x{height} exceeds {MAX_IMAGE_PIXELS} pixels",
+            status_code=413,
+        )
+    return extension, (width, height)
+
+
+async def ingest_upload(upload):
+    """Read and validate an image upload, returning ``(content, extension)``"""
+    content = await read_upload(upload)
+    extension, _ = inspect_image(content)
+    return content, extension
+
+
+def _too_many_items():
+    return UploadRejected(f"Too many files: limit is {BATCH_MAX_ITEMS} per batch", status_code=413)
+
+
+class ByteBudget:
+    """Uncompressed bytes one batch request may still read.
+
+    Shared by every file and archive member of the request, so a small,
+    highly compressed archive cannot expand into gigabytes in memory.
+    """
+
+    def __init__(self, limit=BATCH_MAX_TOTAL_BYTES):
+        self.limit = limit
+        self.used = 0
+
+    def take(self, size):
+        """Account for ``size`` more bytes, raising 413 past the limit"""
+        self.used += size
+        if self.used > self.limit:
+            raise UploadRejected(
+                f"Batch too large: limit is {self.limit // (1024 * 1024)}MB uncompressed",
+                status_code=413,
+            )
+
+
+def _read_member(stream, budget):
+    # Charge the budget chunk by chunk, so extraction stops as soon as it
+    # runs out instead of after a whole member has been inflated.
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return bytes(buffer)
+        budget.take(len(chunk))
+        buffer.extend(chunk)
+
+
+def expand_archive(name, content, max_items=BATCH_MAX_ITEMS, budget=None):
+    """Return ``[(member_name, bytes_or_None), ...]`` for a zip or tar upload.
+
+    Returns None when ``content`` is not an archive. Members larger than
+    MAX_FILE_SIZE are listed with ``None`` content instead of being
+    extracted. Extracted bytes are charged to ``budget`` (a fresh
+    ``ByteBudget`` by default) as they are read; running out raises
+    ``UploadRejected`` with 413.
+    """
+    if budget is None:
+        budget = ByteBudget()
+    buffer = io.BytesIO(content)
+    members = []
+    try:
+        if zipfile.is_zipfile(buffer):
+            with zipfile.ZipFile(buffer) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    if len(members) >= max_items:
+                        raise _too_many_items()
+                    member_name = f"{name}/{info.filename}"
+                    if info.file_size > MAX_FILE_SIZE:
+                        members.append((member_name, None))
+                    else:
+                        with archive.open(info) as stream:
+                            members.append((member_name, _read_member(stream, budget)))
+            return members
+        
+        if content[257:262] == b"ustar" or content[:2] == b"\x1f\x8b":
+            buffer.seek(0)
+            with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    if len(members) >= max_items:
+                        raise _too_many_items()
+                    member_name = f"{name}/{info.name}"
+                    if info.size > MAX_FILE_SIZE:
+                        members.append((member_name, None))
+                    else:
+                        members.append((member_name, _read_member(archive.extractfile(info), budget)))
+            return members
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise UploadRejected(f"Unreadable archive {name}: {e}")
+    return None
@@ -0,0 +1,91 @@
+"""Worker warm-up, so the first requests after a deploy are not the slowest.
+
+OpenCV, NumPy, pyzbar (libzbar) and pdf417decoder are imported on first
+use rather than at server startup, and ReportLab only by report workers.
+Each decode or report worker instead runs one of the initializers below
+when it starts, before taking jobs: it imports those libraries and runs one
+tiny decode per decoder (or renders one empty report), which also loads the
+native libraries and fills their internal caches.
+
+This module is imported by ``main`` at startup, so it must stay light:
+every heavy import happens inside the functions.
+"""
+
+import io
+import time
+
+from metrics import collect_spans
+
+# Side of the blank image decoded during warm-up
+WARMUP_IMAGE_DIM = 64
+
+
+def _blank_png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("L", (WARMUP_IMAGE_DIM, WARMUP_IMAGE_DIM), 255).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _timed(timings, name, func, *args):
+    started = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        timings[f"{name}_error"] = str(e)
+    timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+
+
+def _import_decoder_libraries():
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+    from pyzbar import pyzbar  # noqa: F401
+    from pdf417decoder.Decoder import PDF417Decoder  # noqa: F401
+
+
+def warm_decoders():
+    """Import the decoder libraries and run one decode per decoder.
+
+    Returns timings (and any errors) by step. Decoding a blank image finds
+    nothing, but runs every library the real decodes use.
+    """
+    from decoders import BarcodeDecoder, PDF417Decoder
+
+    timings = {}
+    _timed(timings, "imports", _import_decoder_libraries)
+    image = _blank_png()
+    _timed(timings, "barcode", BarcodeDecoder.decode_barcode, image)
+    _timed(timings, "pdf417", PDF417Decoder.decode_pdf417, image)
+    return timings
+
+
+def warm_reports():
+    """Import ReportLab and render one empty report"""
+    from pdf_generator import render_report_bytes
+    from sessions import empty_session_data
+
+    timings = {}
+    _timed(timings, "report", render_report_bytes, empty_session_data())
+    return timings
+
+
+def _initialize(warm):
+    # An initializer that raises breaks the whole process pool, so a failed
+    # warm-up is ignored: the request that needs the library reports the
+    # error instead. Stage timings are collected and dropped so warm-up
+    # decodes do not show up in the metrics.
+    try:
+        collect_spans(warm)
+    except Exception:
+        pass
+
+
+def init_decode_worker():
+    """``WorkerPool`` initializer for decode workers"""
+    _initialize(warm_decoders)
+
+
+def init_report_worker():
+    """``WorkerPool`` initializer for report workers"""
+    _initialize(warm_reports)
@@ -0,0 +1,273 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import collect_spans, record_spans, record_stage
+
+
+def _wait_for_all(barrier):
+    try:
+        barrier.wait(timeout=5)
+    except threading.BrokenBarrierError:
+        pass
+
+
+class PoolError(Exception):
+    """Base class for errors that map directly onto an HTTP response"""
+
+    status_code = 503
+    headers = None
+
+
+class PoolSaturatedError(PoolError):
+    """Raised when a job is submitted while every worker and queue slot is taken"""
+
+    status_code = 503
+    headers = {"Retry-After": "1"}
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when a job does not finish within the pool timeout"""
+
+    status_code = 504
+
+
+class LatestValue:
+    """Single-slot mailbox in which a newer value replaces an unread one.
+
+    Producers never wait. The consumer always gets the most recent value,
+    so work that falls behind skips stale input instead of queueing it;
+    replaced values are counted in ``dropped``.
+    """
+
+    def __init__(self):
+        self._value = None
+        self._has_value = False
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, value):
+        if self._has_value:
+            self.dropped += 1
+        self._value = value
+        self._has_value = True
+        self._event.set()
+
+    def close(self):
+        """Wake the consumer; ``get`` returns None once the slot is empty"""
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """Wait for and take the latest value, or None after ``close``"""
+        while not self._has_value:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        value = self._value
+        self._value = None
+        self._has_value = False
+        return value
+
+
+class WorkerPool:
+    """Bounded executor that async handlers can submit blocking work to.
+
+    CPU-heavy work (OpenCV preprocessing, pyzbar, pdf417decoder) runs in a
+    process pool so a slow decode never stalls the event loop. Admission is
+    bounded: at most ``workers + max_queue`` jobs may be in flight, anything
+    beyond that is rejected with ``PoolSaturatedError``. Jobs submitted with
+    ``wait=True`` (batches, background reports) wait instead, and only ever
+    take a slot while fewer than ``workers`` jobs are in flight: the queue
+    slots stay reserved for interactive requests, which would otherwise be
+    rejected for as long as a large batch keeps handing slots to its own
+    waiting jobs. A slot is only released once the underlying job has
+    actually finished, so a job that timed out still counts against the queue
+    until its worker is free again.
+
+    ``initializer`` runs once in every worker process (or thread) before it
+    takes jobs, including workers started after a crash; it must not raise.
+    """
+
+    def __init__(self, name, workers=1, max_queue=0, timeout=None, use_processes=True, initializer=None):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.use_processes = use_processes
+        self.initializer = initializer
+
+        self._executor = None
+        self._in_flight = 0
+        self._waiters = deque()
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix=f"{self.name}-pool",
+                    initializer=self.initializer,
+                )
+        return self._executor
+
+    async def _acquire(self, wait):
+        if self._in_flight < (self.workers if wait else self.capacity):
+            self._in_flight += 1
+            return
+
+        if not wait:
+            self._rejected += 1
+            raise PoolSaturatedError(
+                f"Server is busy: {self.name} queue is full, please retry shortly"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over directly by _release, so _in_flight is
+            # already accounted for when the waiter resolves.
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        # A waiting job only takes over the slot if that keeps the jobs in
+        # flight within the workers, leaving the queue to interactive jobs
+        while self._waiters and self._in_flight <= self.workers:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def _job_finished(self, future, started):
+        elapsed = time.perf_counter() - started
+        self._total_seconds += elapsed
+        self._max_seconds = max(self._max_seconds, elapsed)
+        if future.cancelled() or future.exception() is not None:
+            self._failed += 1
+        else:
+            self._completed += 1
+        self._release()
+
+    async def submit(self, func, *args, wait=False, timeout=None):
+        """Run ``func(*args)`` in the pool and return its result.
+
+        Raises ``PoolSaturatedError`` when the pool is full (unless ``wait``
+        is set) and ``PoolTimeoutError`` when the job exceeds ``timeout``
+        seconds (the pool's timeout by default).
+        """
+        if timeout is None:
+            timeout = self.timeout
+        requested = time.perf_counter()
+        await self._acquire(wait)
+        loop = asyncio.get_running_loop()
+
+        try:
+            future = self._get_executor().submit(collect_spans, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. segfault inside a native decoder). Drop the
+            # broken executor so the next job gets a fresh pool.
+            self._executor = None
+            self._release()
+            raise
+        except BaseException:
+            self._release()
+            raise
+
+        self._submitted += 1
+        started = time.perf_counter()
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._job_finished, f, started)
+        )
+
+        try:
+            # shield() keeps a timeout from cancelling the job itself; the
+            # worker finishes in the background and releases its slot then.
+            result, spans, run_seconds = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout
+            )
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            future.cancel()
+            raise PoolTimeoutError(
+                f"{self.name.capitalize()} job timed out after {timeout:g}s"
+            )
+        except BrokenProcessPool:
+            self._executor = None
+            raise
+
+        # Stage timings recorded inside the job (see metrics.collect_spans),
+        # and the time spent waiting for a slot and a worker
+        record_spans(spans)
+        record_stage(f"{self.name}_wait", max(0.0, time.perf_counter() - requested - run_seconds))
+        return result
+
+    async def warm_up(self):
+        """Start every worker, running the initializer, before real jobs arrive.
+
+        One job per worker is submitted at once, and each job waits until
+        every worker has one: an idle worker would otherwise take the next
+        job instead of a new worker starting. Process workers share the
+        barrier through a ``multiprocessing.Manager``.
+        """
+        if not self.use_processes:
+            barrier = threading.Barrier(self.workers)
+            await asyncio.gather(*(self.submit(_wait_for_all, barrier, wait=True) for _ in range(self.workers)))
+            return
+        manager = await asyncio.to_thread(multiprocessing.Manager)
+        try:
+            barrier = manager.Barrier(self.workers)
+            await asyncio.gather(*(self.submit(_wait_for_all, barrier, wait=True) for _ in range(self.workers)))
+        finally:
+            await asyncio.to_thread(manager.shutdown)
+
+    def stats(self):
+        """Snapshot of pool configuration and counters"""
+        finished = self._completed + self._failed
+        return {
+            "name": self.name,
+            "mode": "process" if self.use_processes else "thread",
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "in_flight": self._in_flight,
+            "running": min(self._in_flight, self.workers),
+            "queued": max(0, self._in_flight - self.workers),
+            "waiting": sum(1 for w in self._waiters if not w.done()),
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "avg_job_seconds": round(self._total_seconds / finished, 6) if finished else 0.0,
+            "max_job_seconds": round(self._max_seconds, 6),
+        }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -6,6 +6,7 @@ import PDF417Scanner from "./components/PDF417Scanner"
 import CheckbookScanner from "./components/CheckbookScanner"
 import CardScanner from "./components/CardScanner"
 import ReportSection from "./components/ReportSection"
+import { sessionHeaders } from "./session"
 import "./App.css"
 
 const apiUrl = import.meta.env.VITE_API_URL || "http://localhost:8000"
@@ -22,7 +23,7 @@ function App() {
 
   const fetchSessionData = async () => {
     try {
-      const response = await fetch(`${apiUrl}/session`)
+      const response = await fetch(`${apiUrl}/session`, { headers: sessionHeaders() })
       if (response.ok) {
         const data = await response.json()
         setSessionData(data)
@@ -46,6 +47,7 @@ function App() {
       setLoading(true)
       const response = await fetch(`${apiUrl}/reset`, {
         method: "POST",
+        headers: sessionHeaders(),
       })
       if (response.ok) {
         setSessionData(null)
@@ -1,8 +1,12 @@
 import React from "react"
 import ReactDOM from "react-dom/client"
+import axios from "axios"
 import App from "./App.jsx"
+import { sessionHeaders } from "./session"
 import "./index.css"
 
+Object.assign(axios.defaults.headers.common, sessionHeaders())
+
 ReactDOM.createRoot(document.getElementById("root")).render(
   <React.StrictMode>
     <App />
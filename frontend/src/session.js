@@ -0,0 +1,16 @@
+// Each browser tab keeps its own backend session so concurrent users (and
+// tabs) don't overwrite each other's scans.
+const STORAGE_KEY = "scannerSessionId"
+
+export function getSessionId() {
+  let sessionId = sessionStorage.getItem(STORAGE_KEY)
+  if (!sessionId) {
+    sessionId = crypto.randomUUID().replace(/-/g, "")
+    sessionStorage.setItem(STORAGE_KEY, sessionId)
+  }
+  return sessionId
+}
+
+export function sessionHeaders() {
+  return { "X-Session-ID": getSessionId() }
+}